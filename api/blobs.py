@@ -0,0 +1,136 @@
+import os
+import sys
+import uuid
+import shutil
+from datetime import datetime, timedelta
+from api.common_urldb import db
+from api.uploads import inspect_upload, save_upload
+from api.images import derived_dir
+
+# ==================================================
+# CONTENT-ADDRESSED BLOB STORE
+# media/blobs/<aa>/<bb>/<sha256>.<ext>, one file per distinct content.
+# blobs: {_id: sha256, path, kind, ext, size, refs, created_at, updated_at}
+# Shops, offers and profile images store the blob path; every stored path
+# holds one ref. release() only decrements, sweep_blobs() deletes files
+# whose refs stayed at 0 for SWEEP_GRACE (moved aside before the doc goes,
+# so an upload racing the sweep always ends up with its file on disk).
+# ==================================================
+BLOB_ROOT = "media/blobs"
+SWEEP_GRACE = timedelta(hours=1)
+
+col_blobs = db["blobs"]
+
+
+def blob_path(sha256: str, ext: str) -> str:
+    return f"{BLOB_ROOT}/{sha256[:2]}/{sha256[2:4]}/{sha256}.{ext}"
+
+
+def is_blob_path(path) -> bool:
+    return isinstance(path, str) and path.startswith(BLOB_ROOT + "/")
+
+
+def _sha_of(path: str) -> str:
+    return os.path.basename(path).split(".")[0]
+
+
+# ---------------- STORE ----------------
+def store_upload(upload, allowed=("image", "video"), refs: int = 1) -> dict:
+    """
+    Put an UploadFile in the store and take `refs` references on it.
+    Content already stored costs a read pass and no disk write.
+    Returns {"path", "filename", "kind", "ext", "size", "sha256"};
+    raises UploadRejected (api/uploads.py).
+    """
+    info = inspect_upload(upload, allowed)
+    sha, ext = info["sha256"], info["ext"]
+    path = blob_path(sha, ext)
+
+    # Ref first: a blob with refs > 0 and a fresh updated_at is never swept
+    now = datetime.utcnow()
+    res = col_blobs.update_one(
+        {"_id": sha},
+        {
+            "$inc": {"refs": refs},
+            "$set": {"updated_at": now},
+            "$setOnInsert": {"path": path, "kind": info["kind"], "ext": ext,
+                             "size": info["size"], "created_at": now}
+        },
+        upsert=True
+    )
+
+    # A fresh doc always writes: the file on disk may belong to a blob the
+    # sweeper has just deleted. Same name for the same bytes, so concurrent
+    # writers just replace each other's identical file.
+    if res.upserted_id is not None or not os.path.exists(path):
+        try:
+            save_upload(upload, os.path.dirname(path), name=sha, allowed=(info["kind"],))
+        except BaseException:
+            release(path, refs)
+            raise
+    return {**info, "path": path, "filename": os.path.basename(path)}
+
+
+def acquire(path, refs: int = 1):
+    if is_blob_path(path):
+        col_blobs.update_one({"_id": _sha_of(path)},
+                             {"$inc": {"refs": refs}, "$set": {"updated_at": datetime.utcnow()}})
+
+
+def release(path, refs: int = 1):
+    """
+    Drop references to a stored path. Files from before the blob store
+    (private per-shop copies) are removed directly.
+    """
+    if not path:
+        return
+    if is_blob_path(path):
+        col_blobs.update_one({"_id": _sha_of(path)},
+                             {"$inc": {"refs": -refs}, "$set": {"updated_at": datetime.utcnow()}})
+        return
+    try:
+        if os.path.exists(path):
+            os.remove(path)
+    except OSError:
+        pass
+
+
+def release_many(paths):
+    for path in paths:
+        release(path)
+
+
+# ---------------- SWEEP ----------------
+def sweep_blobs(grace: timedelta = SWEEP_GRACE):
+    """Delete blobs nobody referenced for `grace`. Safe to run anywhere, any time."""
+    cutoff = datetime.utcnow() - grace
+    removed = 0
+
+    for blob in col_blobs.find({"refs": {"$lte": 0}, "updated_at": {"$lt": cutoff}}):
+        # File out of the way first (store_upload rewrites a missing file),
+        # then the conditional delete: a new upload may have taken a ref
+        path = blob["path"]
+        tomb = f"{path}.sweep-{uuid.uuid4().hex[:8]}"
+        try:
+            os.rename(path, tomb)
+        except OSError:
+            tomb = None
+
+        if col_blobs.delete_one({"_id": blob["_id"], "refs": {"$lte": 0},
+                                 "updated_at": blob["updated_at"]}).deleted_count:
+            if tomb:
+                os.remove(tomb)
+            shutil.rmtree(derived_dir(blob["_id"]), ignore_errors=True)
+            removed += 1
+        elif tomb:
+            # Still in use: put it back (a writer may have restored the same bytes)
+            os.replace(tomb, path)
+    return removed
+
+
+if __name__ == "__main__":
+    # python -m api.blobs sweep
+    if sys.argv[1:2] == ["sweep"]:
+        print("✅ Blobs removed:", sweep_blobs())
+    else:
+        print("usage: python -m api.blobs sweep")
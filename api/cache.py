@@ -1,7 +1,192 @@
-cache = {}
+import os
+import json
+import time
+import threading
+import redis
+from cachetools import LRUCache
 
-def get_cached(text: str):
-    return cache.get(text)
+# ==================================================
+# TWO-TIER CACHE
+# tier 1: small in-process LRU (per worker)
+# tier 2: shared Redis with TTL (whole cluster)
+# ==================================================
+REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379/0")
 
-def set_cache(text: str, value: str):
-    cache[text] = value
+LOCAL_MAXSIZE = 5000
+DEFAULT_TTL = 60 * 60 * 24 * 30       # 30 days
+REDIS_RETRY_AFTER = 30                # seconds to skip Redis after an error
+
+# LRUCache is not thread-safe and the threadpool workers share it: every
+# access goes through _local_lock (a read reorders the LRU too)
+local = LRUCache(maxsize=LOCAL_MAXSIZE)
+_local_lock = threading.Lock()
+_MISS = object()
+
+r = redis.Redis.from_url(
+    REDIS_URL,
+    decode_responses=True,
+    socket_timeout=0.2,
+    socket_connect_timeout=0.2
+)
+
+stats = {"local_hits": 0, "redis_hits": 0, "misses": 0, "redis_errors": 0}
+_redis_down_until = 0.0
+
+
+def _redis_ok():
+    return time.monotonic() >= _redis_down_until
+
+
+def _redis_failed(e):
+    global _redis_down_until
+    stats["redis_errors"] += 1
+    _redis_down_until = time.monotonic() + REDIS_RETRY_AFTER
+    print("❌ Redis cache error:", e)
+
+
+def _local_get(key):
+    with _local_lock:
+        return local.get(key, _MISS)
+
+
+def _local_set(items: dict):
+    with _local_lock:
+        local.update(items)
+
+
+def get_cached(key: str):
+    value = _local_get(key)
+    if value is not _MISS:
+        stats["local_hits"] += 1
+        return value
+
+    if _redis_ok():
+        try:
+            raw = r.get(key)
+        except Exception as e:
+            _redis_failed(e)
+            raw = None
+
+        if raw is not None:
+            value = json.loads(raw)
+            _local_set({key: value})
+            stats["redis_hits"] += 1
+            return value
+
+    stats["misses"] += 1
+    return None
+
+
+def set_cache(key: str, value, ttl: int = DEFAULT_TTL):
+    _local_set({key: value})
+
+    if _redis_ok():
+        try:
+            r.set(key, json.dumps(value), ex=ttl)
+        except Exception as e:
+            _redis_failed(e)
+
+
+def get_many(keys: list) -> dict:
+    """
+    Batched get_cached: local tier first, then one Redis MGET for the rest.
+    Returns only the keys that were found.
+    """
+    found = {}
+    remote = []
+    with _local_lock:
+        for key in keys:
+            value = local.get(key, _MISS)
+            if value is not _MISS:
+                found[key] = value
+            else:
+                remote.append(key)
+    stats["local_hits"] += len(found)
+
+    if remote and _redis_ok():
+        try:
+            raws = r.mget(remote)
+        except Exception as e:
+            _redis_failed(e)
+            raws = [None] * len(remote)
+
+        fetched = {key: json.loads(raw) for key, raw in zip(remote, raws) if raw is not None}
+        _local_set(fetched)
+        found.update(fetched)
+        stats["redis_hits"] += len(fetched)
+
+    stats["misses"] += len(keys) - len(found)
+    return found
+
+
+def set_many(items: dict, ttl: int = DEFAULT_TTL):
+    _local_set(items)
+
+    if items and _redis_ok():
+        try:
+            pipe = r.pipeline(transaction=False)
+            for key, value in items.items():
+                pipe.set(key, json.dumps(value), ex=ttl)
+            pipe.execute()
+        except Exception as e:
+            _redis_failed(e)
+
+
+def cache_stats():
+    lookups = stats["local_hits"] + stats["redis_hits"] + stats["misses"]
+    hits = stats["local_hits"] + stats["redis_hits"]
+    return {
+        **stats,
+        "local_size": len(local),
+        "hit_ratio": round(hits / lookups, 3) if lookups else 0
+    }
+
+
+# ---------------- VERSIONED KEYS ----------------
+# Invalidation across workers: the version lives in Redis only (never in
+# the local tier) and is part of the cache key, so bumping it orphans every
+# worker's copy at once. None means Redis is unavailable: don't cache.
+def get_version(name: str):
+    if not _redis_ok():
+        return None
+    try:
+        return int(r.get(f"ver:{name}") or 0)
+    except Exception as e:
+        _redis_failed(e)
+        return None
+
+
+def bump_version(name: str):
+    if not _redis_ok():
+        return
+    try:
+        r.incr(f"ver:{name}")
+    except Exception as e:
+        _redis_failed(e)
+
+
+# ---------------- TRANSLATION KEYS ----------------
+# direction is "ta_en" or "en_ta"
+def translation_key(direction: str, text: str) -> str:
+    return f"tr:{direction}:{text.strip().lower()}"
+
+
+def get_translation(direction: str, text: str):
+    return get_cached(translation_key(direction, text))
+
+
+def set_translation(direction: str, text: str, value: str):
+    set_cache(translation_key(direction, text), value)
+
+
+def get_translations(direction: str, texts: list) -> dict:
+    """{text: translation} for every text already cached."""
+    keys = {}
+    for t in texts:
+        keys.setdefault(translation_key(direction, t), []).append(t)
+    found = get_many(list(keys))
+    return {t: v for k, v in found.items() if v for t in keys[k]}
+
+
+def set_translations(direction: str, pairs: dict):
+    set_many({translation_key(direction, t): v for t, v in pairs.items()})
@@ -0,0 +1,193 @@
+import re
+import time
+import threading
+from bson import ObjectId
+from pymongo.errors import PyMongoError
+from api.common_urldb import db
+
+# ==================================================
+# REFERENCE CATALOGUE (category + city)
+# Both collections are small and read-mostly, so every worker keeps them in
+# memory keyed by id and lowercase name. A change stream (or polling a
+# count / max _id / max updated_at marker when change streams are not
+# available, e.g. a standalone mongod) reloads a collection after writes.
+# ==================================================
+col_city = db["city"]
+col_category = db["category"]
+
+COLLECTIONS = {"city": ("city_name", col_city), "category": ("name", col_category)}
+POLL_INTERVAL = 30      # seconds, polling fallback
+
+_lock = threading.Lock()
+_maps = {
+    name: {"by_id": {}, "by_name": {}, "docs": [], "missing": set(), "marker": None}
+    for name in COLLECTIONS
+}
+_versions = {name: 0 for name in COLLECTIONS}
+_loaded = False
+_watcher = None
+
+
+# ---------------- LOADING ----------------
+def _marker(col):
+    last = col.find_one({}, {"_id": 1, "updated_at": 1}, sort=[("_id", -1)])
+    newest = col.find_one({"updated_at": {"$exists": True}}, {"updated_at": 1}, sort=[("updated_at", -1)])
+    return (
+        col.estimated_document_count(),
+        last["_id"] if last else None,
+        newest.get("updated_at") if newest else None,
+    )
+
+
+def reload(name: str):
+    name_field, col = COLLECTIONS[name]
+    marker = _marker(col)
+    docs = list(col.find())
+
+    by_id, by_name = {}, {}
+    for d in docs:
+        by_id[str(d["_id"])] = d
+        key = str(d.get(name_field) or "").strip().lower()
+        if key:
+            by_name.setdefault(key, []).append(d)
+
+    with _lock:
+        _maps[name] = {"by_id": by_id, "by_name": by_name, "docs": docs, "missing": set(), "marker": marker}
+        _versions[name] += 1
+
+
+def load_catalog():
+    global _loaded
+    for name in COLLECTIONS:
+        reload(name)
+    _loaded = True
+
+
+def _get(name):
+    if not _loaded:
+        load_catalog()
+    return _maps[name]
+
+
+# ---------------- REFRESH ----------------
+def _watch_changes():
+    pipeline = [{"$match": {"ns.coll": {"$in": list(COLLECTIONS)}}}]
+    with db.watch(pipeline) as stream:
+        for change in stream:
+            reload(change["ns"]["coll"])
+
+
+def _poll_changes():
+    while True:
+        time.sleep(POLL_INTERVAL)
+        for name, (_, col) in COLLECTIONS.items():
+            try:
+                if _marker(col) != _maps[name]["marker"]:
+                    reload(name)
+            except PyMongoError as e:
+                print("❌ Catalog poll error:", e)
+
+
+def _refresh_loop():
+    try:
+        _watch_changes()
+    except PyMongoError as e:
+        print("ℹ️ Catalog change stream unavailable, polling instead:", e)
+    _poll_changes()
+
+
+def start_catalog():
+    """Load both collections and start the background refresher (once)."""
+    global _watcher
+    load_catalog()
+    if _watcher is None:
+        _watcher = threading.Thread(target=_refresh_loop, name="catalog-refresh", daemon=True)
+        _watcher.start()
+
+
+# ---------------- LOOKUPS ----------------
+# Callers mutate what they get back (safe(), project_ta), so hand out copies.
+def _by_id(name, doc_id):
+    key = str(doc_id).strip() if doc_id is not None else ""
+    if not key:
+        return None
+
+    m = _get(name)
+    doc = m["by_id"].get(key)
+    if doc is None and key not in m["missing"] and ObjectId.is_valid(key):
+        # Written after the last refresh: one point read, then remembered
+        _, col = COLLECTIONS[name]
+        doc = col.find_one({"_id": ObjectId(key)})
+        with _lock:
+            if doc:
+                m["by_id"][key] = doc
+            else:
+                m["missing"].add(key)
+    return dict(doc) if doc else None
+
+
+def _by_name(name, value):
+    return [dict(d) for d in _get(name)["by_name"].get(str(value or "").strip().lower(), [])]
+
+
+def _search(name, pattern, limit=None):
+    name_field, _ = COLLECTIONS[name]
+    try:
+        rx = re.compile(pattern, re.I)
+        match = lambda v: rx.search(v) is not None
+    except re.error:
+        match = lambda v: pattern.lower() in v.lower()
+
+    out = []
+    for d in _get(name)["docs"]:
+        if match(str(d.get(name_field) or "")):
+            out.append(dict(d))
+            if limit and len(out) >= limit:
+                break
+    return out
+
+
+def get_city(city_id):
+    return _by_id("city", city_id)
+
+
+def get_category(category_id):
+    return _by_id("category", category_id)
+
+
+def cities_by_name(city_name: str):
+    return _by_name("city", city_name)
+
+
+def category_by_name(category_name: str):
+    found = _by_name("category", category_name)
+    return found[0] if found else None
+
+
+def search_cities(pattern: str, limit: int | None = None):
+    return _search("city", pattern, limit)
+
+
+def search_categories(pattern: str, limit: int | None = None):
+    return _search("category", pattern, limit)
+
+
+def all_cities():
+    return [dict(d) for d in _get("city")["docs"]]
+
+
+def catalog_version(name: str) -> int:
+    """Bumped on every reload; lets derived structures know when to rebuild."""
+    _get(name)
+    return _versions[name]
+
+
+def all_categories():
+    return [dict(d) for d in _get("category")["docs"]]
+
+
+def resolve_category(value):
+    """Shops store category ids (string / ObjectId) or, in old data, names."""
+    if ObjectId.is_valid(str(value)):
+        return get_category(value)
+    return category_by_name(value)
@@ -0,0 +1,116 @@
+from datetime import datetime
+from bson import ObjectId
+from api.common_urldb import db
+from api.offer_items import approved_items_for_shops
+
+# ==================================================
+# CITY SLIDES READ MODEL
+# city_slides: {_id: city_id, slides: [...], built_at}
+# One document per city holding its first SLIDES_MAX approved offers with
+# the shop snapshot already embedded (English + stored *_ta fields), so
+# /offers/{city}/ is a single _id read and never writes. Rebuilt by the
+# shop / offer write endpoints, and periodically by the city_slides_warm
+# job (api/scheduler.py) so offers approved outside the API show up.
+# ==================================================
+SLIDES_MAX = 20
+
+SLIDE_PROJECTION = {"shop_id": 1, "offer_id": 1, "title": 1, "title_ta": 1,
+                    "percentage": 1, "media_type": 1, "media_path": 1, "media_variants": 1}
+
+col_city_slides = db["city_slides"]
+col_shop = db["shop"]
+
+
+def _shop_snapshot(shop):
+    snap = {k: (str(v) if isinstance(v, ObjectId) else v) for k, v in shop.items()}
+    # Rating internals are not part of the slide payload
+    snap.pop("rating_hist", None)
+    return snap
+
+
+# ---------------- BUILD ----------------
+def rebuild_city(city_id):
+    """Recompute one city's slides from shop + offer_items and store them."""
+    city_id = str(city_id or "").strip()
+    if not city_id:
+        return []
+
+    shops = list(col_shop.find({"city_id": city_id}))
+    slides = []
+
+    if shops:
+        # offer_items: one (shop_id, status, uploaded_at) scan for all shops
+        items = approved_items_for_shops([s["_id"] for s in shops], SLIDE_PROJECTION)
+
+        for shop in shops:
+            offers = items.get(str(shop["_id"]))
+            if not offers: continue
+
+            snap = _shop_snapshot(shop)
+            for off in offers:
+                if not off.get("media_path") or not off.get("media_type"): continue
+
+                slides.append({
+                    "shop_id": snap["_id"],
+                    "shop": snap,
+                    "offer_id": off.get("offer_id"),
+                    "title": off.get("title"),
+                    "title_ta": off.get("title_ta"),
+                    "percentage": off.get("percentage"),
+                    "type": off.get("media_type"),
+                    "path": off.get("media_path"),
+                    "variants": off.get("media_variants")
+                })
+                if len(slides) == SLIDES_MAX: break
+            if len(slides) == SLIDES_MAX: break
+
+    col_city_slides.replace_one(
+        {"_id": city_id},
+        {"_id": city_id, "slides": slides, "built_at": datetime.utcnow()},
+        upsert=True
+    )
+    return slides
+
+
+def refresh_cities(*city_ids):
+    for city_id in {str(c) for c in city_ids if c}:
+        try:
+            rebuild_city(city_id)
+        except Exception as e:
+            print("❌ City slides rebuild error:", e)
+
+
+def refresh_shops(*shop_ids):
+    """Rebuild the cities of the given shops (after an offer / shop write)."""
+    oids = [ObjectId(s) for s in shop_ids if ObjectId.is_valid(str(s))]
+    cities = [s.get("city_id") for s in col_shop.find({"_id": {"$in": oids}}, {"city_id": 1})]
+    refresh_cities(*cities)
+
+
+# ---------------- READ ----------------
+def read_city_slides(city_id, limit: int = 3):
+    """A city not built yet has no slides (the warmer builds it)."""
+    doc = col_city_slides.find_one({"_id": str(city_id)}, {"slides": {"$slice": limit}})
+    return doc.get("slides", []) if doc else []
+
+
+def read_slides_for_cities(city_ids, limit: int = 3) -> dict:
+    """{city_id: slides} for the cities that have any, in one $in read."""
+    ids = [str(c) for c in city_ids]
+    docs = col_city_slides.find({"_id": {"$in": ids}, "slides.0": {"$exists": True}},
+                                {"slides": {"$slice": limit}})
+    return {d["_id"]: d["slides"] for d in docs}
+
+
+def rebuild_all():
+    count = 0
+    for city_id in col_shop.distinct("city_id"):
+        if city_id:
+            rebuild_city(city_id)
+            count += 1
+    return count
+
+
+if __name__ == "__main__":
+    # python -m api.city_slides
+    print("✅ City slides rebuilt:", rebuild_all())
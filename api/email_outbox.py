@@ -0,0 +1,246 @@
+import os
+import sys
+import time
+import uuid
+import threading
+from datetime import datetime, timedelta
+import requests
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
+from api.common_urldb import db
+from api.mail_settings import EMAILADDRESS
+
+# ==================================================
+# EMAIL OUTBOX
+# Request paths only insert into email_outbox; a dispatcher thread sends.
+# email_outbox: {_id, to, subject, html, substitutions, status, attempts,
+#                due_at, lease_until, claim, created_at, sent_at, error,
+#                retryable, on_sent}
+# status: pending -> sending -> sent | failed (rejected, or out of attempts)
+# Mails with the same subject + html (a template whose per-recipient parts
+# are "-key-" tags filled from `substitutions`) go out as one SendGrid
+# request with one personalization per recipient, over one HTTP session,
+# paced to MAIL_RATE mails per second per process. A request rejected
+# outright (4xx) is split in halves down to single mails, so one bad
+# address fails alone. `on_sent` ({collection, _id, set}) is applied once
+# the mail is accepted, e.g. a reminder's "sent" flag.
+# SENDGRID_API_URL can point at a local stand-in (tests/sendgrid_stub.py).
+# ==================================================
+SENDGRID_API_URL = os.getenv("SENDGRID_API_URL", "https://api.sendgrid.com/v3/mail/send")
+FROM_EMAIL = EMAILADDRESS
+
+BATCH_SIZE = 500            # mails claimed per round
+MAX_PERSONALIZATIONS = 1000     # SendGrid's per-request limit
+POLL_INTERVAL = 10          # seconds; enqueue wakes the dispatcher at once
+LEASE = timedelta(minutes=5)
+MAX_ATTEMPTS = 6
+RETRY_BASE = 30             # seconds, doubled per attempt
+HTTP_TIMEOUT = 15
+MAIL_RATE = float(os.getenv("MAIL_RATE", "10"))    # mails per second, 0 = no cap
+
+col_outbox = db["email_outbox"]
+
+_session = requests.Session()
+_wake = threading.Event()
+_dispatcher = None
+_pace_lock = threading.Lock()
+_next_send = 0.0
+
+
+# ---------------- ENQUEUE ----------------
+def _outbox_doc(to, subject, html, substitutions=None, key=None, on_sent=None):
+    now = datetime.utcnow()
+    doc = {"to": to, "subject": subject, "html": html, "substitutions": substitutions or {},
+           "status": "pending", "attempts": 0, "due_at": now, "created_at": now}
+    if key:
+        doc["_id"] = key
+    if on_sent:
+        doc["on_sent"] = on_sent
+    return doc
+
+
+def enqueue_mail(to: str, subject: str, html: str, substitutions: dict = None):
+    """One insert; the dispatcher sends it."""
+    col_outbox.insert_one(_outbox_doc(to, subject, html, substitutions))
+    _wake.set()
+
+
+def enqueue_many(mails) -> int:
+    """
+    mails: iterable of (to, subject, html, substitutions[, key, on_sent]).
+    A keyed mail already in the outbox is not queued twice; one that failed
+    on retryable errors only is put back. Returns how many were queued.
+    """
+    docs = [_outbox_doc(*m) for m in mails]
+    if not docs:
+        return 0
+    keys = [d["_id"] for d in docs if "_id" in d]
+
+    try:
+        queued = len(col_outbox.insert_many(docs, ordered=False).inserted_ids)
+    except BulkWriteError as e:
+        if any(err["code"] != 11000 for err in e.details["writeErrors"]):
+            raise
+        queued = e.details["nInserted"]
+    if keys:
+        queued += col_outbox.update_many(
+            {"_id": {"$in": keys}, "status": "failed", "retryable": True},
+            {"$set": {"status": "pending", "attempts": 0, "due_at": datetime.utcnow(), "error": None}}
+        ).modified_count
+
+    if queued:
+        _wake.set()
+    return queued
+
+
+# ---------------- SEND ----------------
+def _post(subject, html, mails):
+    """One SendGrid request. Returns None on success, else (retryable, error)."""
+    body = {
+        "from": {"email": FROM_EMAIL},
+        "subject": subject,
+        "content": [{"type": "text/html", "value": html}],
+        "personalizations": [
+            {"to": [{"email": m["to"]}], **({"substitutions": m["substitutions"]} if m.get("substitutions") else {})}
+            for m in mails
+        ],
+    }
+    try:
+        res = _session.post(SENDGRID_API_URL, json=body, timeout=HTTP_TIMEOUT,
+                            headers={"Authorization": f"Bearer {os.getenv('SENDGRID_API_KEY', '')}"})
+    except requests.RequestException as e:
+        return True, repr(e)
+    if res.status_code < 300:
+        return None
+    return res.status_code == 429 or res.status_code >= 500, f"{res.status_code} {res.text[:300]}"
+
+
+def _claim(now, token):
+    ids = [d["_id"] for d in col_outbox.find(
+        {"$or": [{"status": "pending", "due_at": {"$lte": now}},
+                 {"status": "sending", "lease_until": {"$lt": now}}]},
+        {"_id": 1}
+    ).sort("due_at", 1).limit(BATCH_SIZE)]
+    if not ids:
+        return []
+    # Conditional again: another dispatcher may have claimed some of these
+    col_outbox.update_many(
+        {"_id": {"$in": ids}, "$or": [{"status": "pending"}, {"status": "sending", "lease_until": {"$lt": now}}]},
+        {"$set": {"status": "sending", "claim": token, "lease_until": now + LEASE}, "$inc": {"attempts": 1}}
+    )
+    return list(col_outbox.find({"claim": token}))
+
+
+def _pace(n: int):
+    """Hold the caller so sends average at most MAIL_RATE mails per second."""
+    global _next_send
+    if MAIL_RATE <= 0:
+        return
+    with _pace_lock:
+        now = time.monotonic()
+        start = max(now, _next_send)
+        _next_send = start + n / MAIL_RATE
+    time.sleep(start - now)
+
+
+def _deliver(subject, html, mails, summary) -> list:
+    """
+    Send `mails` as one request; a non-retryable rejection of several mails
+    is retried in halves (unpaced: those are rare and keep the round inside
+    its lease). Returns [(mails, outcome)] per request that ended it.
+    """
+    summary["requests"] += 1
+    outcome = _post(subject, html, mails)
+    if outcome is None or outcome[0] or len(mails) == 1:
+        return [(mails, outcome)]
+    mid = len(mails) // 2
+    return _deliver(subject, html, mails[:mid], summary) + _deliver(subject, html, mails[mid:], summary)
+
+
+def _mark_sent(mails):
+    col_outbox.update_many({"_id": {"$in": [m["_id"] for m in mails]}},
+                           {"$set": {"status": "sent", "sent_at": datetime.utcnow(), "error": None}})
+    flags = {}
+    for m in mails:
+        hook = m.get("on_sent")
+        if hook:
+            key = (hook["collection"], tuple(sorted(hook["set"].items())))
+            flags.setdefault(key, []).append(hook["_id"])
+    for (collection, fields), ids in flags.items():
+        db[collection].update_many({"_id": {"$in": ids}}, {"$set": dict(fields)})
+
+
+def _mark_unsent(mails, retryable, error, summary):
+    """Back off per mail on its own attempt count; failed once rejected or out of attempts."""
+    now = datetime.utcnow()
+    ops = []
+    for m in mails:
+        if retryable and m["attempts"] < MAX_ATTEMPTS:
+            ops.append(UpdateOne({"_id": m["_id"]}, {"$set": {
+                "status": "pending", "error": error,
+                "due_at": now + timedelta(seconds=RETRY_BASE * 2 ** (m["attempts"] - 1)),
+            }}))
+            summary["retry"] += 1
+        else:
+            ops.append(UpdateOne({"_id": m["_id"]}, {"$set": {
+                "status": "failed", "error": error, "retryable": retryable}}))
+            summary["failed"] += 1
+    col_outbox.bulk_write(ops, ordered=False)
+
+
+def dispatch() -> dict:
+    """One round: claim due mail, send it grouped, record the outcome."""
+    token = uuid.uuid4().hex
+    mails = _claim(datetime.utcnow(), token)
+    summary = {"claimed": len(mails), "sent": 0, "retry": 0, "failed": 0, "requests": 0}
+
+    groups = {}
+    for m in mails:
+        groups.setdefault((m["subject"], m["html"]), []).append(m)
+
+    for (subject, html), group in groups.items():
+        for i in range(0, len(group), MAX_PERSONALIZATIONS):
+            chunk = group[i:i + MAX_PERSONALIZATIONS]
+            _pace(len(chunk))
+            for sent, outcome in _deliver(subject, html, chunk, summary):
+                if outcome is None:
+                    _mark_sent(sent)
+                    summary["sent"] += len(sent)
+                    continue
+                retryable, error = outcome
+                print("❌ Outbox send error:", subject, len(sent), error)
+                _mark_unsent(sent, retryable, error, summary)
+    return summary
+
+
+def _dispatch_loop():
+    while True:
+        _wake.wait(POLL_INTERVAL)
+        _wake.clear()
+        try:
+            while dispatch()["claimed"] == BATCH_SIZE:
+                pass
+        except Exception as e:
+            # Claimed mail comes back when its lease runs out
+            print("❌ Outbox dispatch error:", repr(e))
+
+
+def start_email_dispatcher():
+    global _dispatcher
+    if _dispatcher is None:
+        _dispatcher = threading.Thread(target=_dispatch_loop, name="email-outbox", daemon=True)
+        _dispatcher.start()
+
+
+def outbox_stats():
+    return {row["_id"]: row["n"] for row in col_outbox.aggregate([
+        {"$group": {"_id": "$status", "n": {"$sum": 1}}}
+    ])}
+
+
+if __name__ == "__main__":
+    # python -m api.email_outbox dispatch
+    if sys.argv[1:2] == ["dispatch"]:
+        print("✅ Outbox round:", dispatch())
+    else:
+        print("usage: python -m api.email_outbox dispatch")
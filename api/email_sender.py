@@ -1,29 +1,7 @@
-import os
-from sendgrid import SendGridAPIClient
-from sendgrid.helpers.mail import Mail
-from api.mail_settings import EMAILADDRESS
-FROM_EMAIL = EMAILADDRESS          
+from api.email_outbox import enqueue_mail
 
 
 def send_email(to_email, subject, body):
-    SENDGRID_API_KEY = os.getenv("SENDGRID_API_KEY")
-    if not SENDGRID_API_KEY:
-        raise RuntimeError("SENDGRID_API_KEY missing")
-
-    if not FROM_EMAIL:
-        raise RuntimeError("EMAILADDRESS missing")
-
-    message = Mail(
-        from_email=FROM_EMAIL,   # ADMIN mail
-        to_emails=to_email,      # USER mail
-        subject=subject,
-        html_content=body
-    )
-
-    try:
-        sg = SendGridAPIClient(SENDGRID_API_KEY)
-        response = sg.send(message)
-        print("✅ Mail accepted by SendGrid:", response.status_code)  # 202 = success
-    except Exception as e:
-        print("❌ SendGrid mail error:", repr(e))
-        raise
+    # Queued; the outbox dispatcher sends it through SendGrid (api/email_outbox.py)
+    enqueue_mail(to_email, subject, body)
+    print("✅ Mail queued:", subject)
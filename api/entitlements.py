@@ -0,0 +1,178 @@
+import sys
+import time
+from datetime import datetime
+from fastapi import HTTPException
+from pymongo import ReturnDocument
+from bson import ObjectId
+from api.common_urldb import db
+from api.plan_config import PLAN_CONFIG
+from api.cache import get_cached, set_cache, get_version, bump_version
+
+# ==================================================
+# PLAN ENTITLEMENTS
+# entitlements: {_id: user_id, plan, expiry_date, shops_limit, offers_limit,
+#                shops_used, offers_used, updated_at}
+# Counts are taken once (rebuild_entitlement) and then kept by $inc on the
+# create / delete paths. A limit check is one conditional increment, so two
+# concurrent creates can never both take the last slot.
+# offers_used counts offers documents (one per shop that has offers), as
+# /my-plan/ always has: a slot is taken when a shop gets its offers
+# document and given back when that document is deleted.
+# ==================================================
+CACHE_TTL = 300     # seconds
+DATE_FIELDS = ("expiry_date", "updated_at")
+
+col_entitlements = db["entitlements"]
+col_payments = db["payments"]
+col_shop = db["shop"]
+col_offers = db["offers"]
+
+
+def _owner_forms(user_id):
+    return [user_id, ObjectId(user_id)] if ObjectId.is_valid(str(user_id)) else [user_id]
+
+
+def _active_payment(user_id):
+    """The success payment that runs longest; a newer, shorter one never cuts it short."""
+    return col_payments.find_one(
+        {"user_id": user_id, "status": "success", "expiry_date": {"$gt": datetime.utcnow()}},
+        sort=[("expiry_date", -1)]
+    )
+
+
+def _plan_fields(plan, expiry_date):
+    limits = PLAN_CONFIG.get(plan, {})
+    return {
+        "plan": plan if limits else None,
+        "expiry_date": expiry_date,
+        "shops_limit": limits.get("shops", 0),
+        "offers_limit": limits.get("offers", 0),
+    }
+
+
+def _invalidate(user_id):
+    bump_version(f"ent:{user_id}")
+
+
+# ---------------- BUILD ----------------
+def rebuild_entitlement(user_id):
+    """Recount usage and re-read the active plan (first use / repair)."""
+    user_id = str(user_id)
+    payment = _active_payment(user_id)
+
+    doc = {
+        **_plan_fields(payment and payment.get("plan_name"), payment and payment.get("expiry_date")),
+        "shops_used": col_shop.count_documents({"user_id": {"$in": _owner_forms(user_id)}}),
+        "offers_used": col_offers.count_documents({"user_id": {"$in": _owner_forms(user_id)}}),
+        "updated_at": datetime.utcnow(),
+    }
+    col_entitlements.update_one({"_id": user_id}, {"$set": doc}, upsert=True)
+    _invalidate(user_id)
+    return {"_id": user_id, **doc}
+
+
+def refresh_plan(user_id):
+    """Payment saved / captured / renewed: re-read the active plan, usage kept."""
+    user_id = str(user_id)
+    payment = _active_payment(user_id)
+    res = col_entitlements.update_one(
+        {"_id": user_id},
+        {"$set": {**_plan_fields(payment and payment.get("plan_name"), payment and payment.get("expiry_date")),
+                  "updated_at": datetime.utcnow()}}
+    )
+    if res.matched_count == 0:
+        rebuild_entitlement(user_id)
+        return
+    _invalidate(user_id)
+
+
+# ---------------- READ ----------------
+def get_entitlement(user_id):
+    """
+    Cached (api/cache.py), keyed by a version that every change bumps.
+    Dates come back as datetime either way (the cache holds them as ISO text).
+    """
+    user_id = str(user_id)
+    version = get_version(f"ent:{user_id}")
+    key = f"ent:{user_id}:{version}" if version is not None else None
+
+    cached = get_cached(key) if key else None
+    if cached and time.time() - cached["at"] < CACHE_TTL:
+        return {k: (datetime.fromisoformat(v) if k in DATE_FIELDS and v else v)
+                for k, v in cached["doc"].items()}
+
+    doc = col_entitlements.find_one({"_id": user_id}) or rebuild_entitlement(user_id)
+    if key:
+        stored = {k: (v.isoformat() if isinstance(v, datetime) else v) for k, v in doc.items()}
+        set_cache(key, {"at": time.time(), "doc": stored}, ttl=CACHE_TTL)
+    return doc
+
+
+# ---------------- RESERVE / RELEASE ----------------
+def _expired(ent) -> bool:
+    return not ent.get("plan") or not ent.get("expiry_date") or ent["expiry_date"] <= datetime.utcnow()
+
+
+def reserve(user_id, kind: str, n: int = 1):
+    """
+    Take `n` units of `kind` ("shops" / "offers") or raise HTTPException 403.
+    Callers release() them again if the create does not happen. n=0 takes
+    nothing but still needs one free unit (an offer going into existing
+    offers documents, gated like the old count check).
+    """
+    user_id = str(user_id)
+    used, limit = f"{kind}_used", f"{kind}_limit"
+    query = {
+        "_id": user_id,
+        "expiry_date": {"$gt": datetime.utcnow()},
+        "$expr": {"$lte": [{"$add": [f"${used}", max(n, 1)]}, f"${limit}"]}
+    }
+
+    reread = False
+    for _ in range(2):
+        doc = col_entitlements.find_one_and_update(
+            query, {"$inc": {used: n}, "$set": {"updated_at": datetime.utcnow()}},
+            return_document=ReturnDocument.AFTER
+        )
+        if doc:
+            _invalidate(user_id)
+            return doc
+
+        current = col_entitlements.find_one({"_id": user_id})
+        if current and (reread or not _expired(current)):
+            break
+        if current:
+            refresh_plan(user_id)        # plan snapshot expired: a renewal may not be in it yet
+        else:
+            rebuild_entitlement(user_id)     # first use: count once, then retry
+        reread = True
+
+    if not current or _expired(current):
+        raise HTTPException(403, f"Please subscribe to add {kind}")
+    raise HTTPException(403, f"{current['plan'].capitalize()} plan allows only {current[limit]} {kind}")
+
+
+def release(user_id, kind: str, n: int = 1):
+    if not user_id or n <= 0:
+        return
+    used = f"{kind}_used"
+    col_entitlements.update_one(
+        {"_id": str(user_id)},
+        [{"$set": {used: {"$max": [0, {"$subtract": [f"${used}", n]}]}, "updated_at": "$$NOW"}}]
+    )
+    _invalidate(user_id)
+
+
+def rebuild_all() -> int:
+    user_ids = {str(u) for u in col_shop.distinct("user_id") + col_payments.distinct("user_id") if u}
+    for user_id in user_ids:
+        rebuild_entitlement(user_id)
+    return len(user_ids)
+
+
+if __name__ == "__main__":
+    # python -m api.entitlements rebuild
+    if sys.argv[1:2] == ["rebuild"]:
+        print("✅ Entitlements rebuilt:", rebuild_all())
+    else:
+        print("usage: python -m api.entitlements rebuild")
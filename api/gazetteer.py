@@ -0,0 +1,309 @@
+import os
+import sys
+import csv
+import mmap
+import bisect
+import unicodedata
+from datetime import datetime, timedelta
+import numpy as np
+import requests
+from api.common_urldb import db
+from api.translator import has_tamil
+
+# ==================================================
+# OFFLINE GAZETTEER (Tamil Nadu towns / villages)
+# Built once by `python -m api.gazetteer build ...` into GAZETTEER_DIR:
+#   strings.bin -> UTF-8 blob (normalised keys + display strings)
+#   places.npy  -> one row per place: lat, lng, (offset, length) of
+#                  name / name_ta / district in strings.bin
+#   keys.npy    -> every normalised name variant (English + Tamil),
+#                  sorted by bytes, pointing at its place row
+# All three are memory-mapped, so every worker shares the same pages and
+# a lookup is a binary search over keys.npy.
+# The data is not bundled with the repo: until it is built, geocode() goes
+# straight to the Nominatim fallback.
+# ==================================================
+GAZETTEER_DIR = os.getenv(
+    "GAZETTEER_DIR",
+    os.path.join(os.path.dirname(__file__), "data", "gazetteer")
+)
+
+PLACE_DTYPE = np.dtype([
+    ("lat", "f8"), ("lng", "f8"),
+    ("name", "i8", (2,)), ("name_ta", "i8", (2,)), ("district", "i8", (2,))
+])
+KEY_DTYPE = np.dtype([("off", "i8"), ("len", "i4"), ("place", "i4")])
+
+# Network geocoding is only a last resort for names the gazetteer lacks
+NOMINATIM_FALLBACK = os.getenv("NOMINATIM_FALLBACK", "1") == "1"
+NOMINATIM_URL = "https://nominatim.openstreetmap.org/search"
+NEGATIVE_TTL_DAYS = 30
+
+col_geocode = db["geocode_cache"]
+
+_data = {"loaded": False, "strings": None, "places": None, "keys": None}
+
+
+# ---------------- NORMALISE ----------------
+def normalise(name) -> str:
+    """
+    Case/space/punctuation-insensitive key. Only punctuation, separators,
+    symbols and control characters become spaces: Tamil vowel signs and
+    the virama (categories Mn / Mc, not matched by \\w) are kept.
+    """
+    text = unicodedata.normalize("NFC", str(name or "")).casefold()
+    text = "".join(" " if unicodedata.category(c)[0] in "PZSC" else c for c in text)
+    return " ".join(text.split())
+
+
+# ---------------- LOAD ----------------
+def _load():
+    if _data["loaded"]:
+        return _data["keys"] is not None
+    _data["loaded"] = True
+
+    try:
+        with open(os.path.join(GAZETTEER_DIR, "strings.bin"), "rb") as f:
+            strings = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        _data.update({
+            "strings": strings,
+            "places": np.load(os.path.join(GAZETTEER_DIR, "places.npy"), mmap_mode="r"),
+            "keys": np.load(os.path.join(GAZETTEER_DIR, "keys.npy"), mmap_mode="r"),
+        })
+        return True
+    except (OSError, ValueError) as e:
+        print("ℹ️ Gazetteer not available:", e)
+        return False
+
+
+def _string(off, length) -> bytes:
+    return _data["strings"][int(off):int(off) + int(length)]
+
+
+class _KeyView:
+    """Sequence of key bytes for bisect over the memory-mapped index."""
+
+    def __len__(self):
+        return len(_data["keys"])
+
+    def __getitem__(self, i):
+        k = _data["keys"][i]
+        return _string(k["off"], k["len"])
+
+
+def _place(i) -> dict:
+    p = _data["places"][i]
+    return {
+        "name": _string(*p["name"]).decode(),
+        "name_ta": _string(*p["name_ta"]).decode(),
+        "district": _string(*p["district"]).decode(),
+        "lat": float(p["lat"]),
+        "lng": float(p["lng"]),
+    }
+
+
+# ---------------- LOOKUPS ----------------
+def lookup(name):
+    """Exact (normalised) match on any English or Tamil name variant."""
+    key = normalise(name).encode()
+    if not key or not _load():
+        return None
+
+    keys = _KeyView()
+    i = bisect.bisect_left(keys, key)
+    if i < len(keys) and keys[i] == key:
+        return _place(_data["keys"][i]["place"])
+    return None
+
+
+def search_prefix(prefix, limit: int = 10):
+    """Places with a name variant starting with `prefix`, in key order."""
+    key = normalise(prefix).encode()
+    if not key or not _load():
+        return []
+
+    keys = _KeyView()
+    out, seen = [], set()
+    i = bisect.bisect_left(keys, key)
+    while i < len(keys) and len(out) < limit and keys[i].startswith(key):
+        place = int(_data["keys"][i]["place"])
+        if place not in seen:
+            seen.add(place)
+            out.append(_place(place))
+        i += 1
+    return out
+
+
+# ---------------- LAST RESORT: NOMINATIM ----------------
+def _nominatim(name):
+    try:
+        params = {"q": f"{name}, Tamil Nadu", "format": "json", "limit": 1}
+        headers = {"User-Agent": "MyLocalApp/1.0"}
+        data = requests.get(NOMINATIM_URL, params=params, headers=headers, timeout=3).json()
+        if data:
+            return float(data[0]["lat"]), float(data[0]["lon"])
+    except Exception as e:
+        print("❌ Nominatim error:", e)
+        raise
+    return None, None
+
+
+def _remote_coordinates(name):
+    """Nominatim behind a persistent Mongo cache; misses are remembered too."""
+    key = normalise(name)
+    if not key:
+        return None, None
+
+    cached = col_geocode.find_one({"_id": key})
+    if cached:
+        return cached.get("lat"), cached.get("lng")
+    if not NOMINATIM_FALLBACK:
+        return None, None
+
+    try:
+        lat, lng = _nominatim(name)
+    except Exception:
+        # Network trouble is not an answer; try again next time
+        return None, None
+
+    doc = {"lat": lat, "lng": lng, "checked_at": datetime.utcnow()}
+    if lat is None:
+        # Negative entry, dropped by the TTL index (api/indexes.py)
+        doc["expires_at"] = datetime.utcnow() + timedelta(days=NEGATIVE_TTL_DAYS)
+    col_geocode.update_one({"_id": key}, {"$set": doc}, upsert=True)
+    return lat, lng
+
+
+def geocode(*names):
+    """
+    (lat, lng) for the first name the gazetteer knows; the network call is
+    only made when none of them are in it.
+    """
+    names = [n for n in names if n]
+    for name in names:
+        place = lookup(name)
+        if place:
+            return place["lat"], place["lng"]
+
+    for name in names:
+        if not has_tamil(name):
+            return _remote_coordinates(name)
+    return None, None
+
+
+# ==================================================
+# BUILD (loader command)
+# rows: {"name", "name_ta", "district", "lat", "lng", "alt_names": [...]}
+# ==================================================
+def _rows_from_csv(path):
+    """CSV with columns name, name_ta, alt_names (|-separated), district, lat, lng."""
+    with open(path, newline="", encoding="utf-8") as f:
+        for r in csv.DictReader(f):
+            yield {
+                "name": r.get("name", ""),
+                "name_ta": r.get("name_ta", ""),
+                "district": r.get("district", ""),
+                "lat": r.get("lat"),
+                "lng": r.get("lng"),
+                "alt_names": [a for a in (r.get("alt_names") or "").split("|") if a],
+            }
+
+
+def _rows_from_geonames(path):
+    """GeoNames IN.txt dump: populated places (class P) in Tamil Nadu (admin1 25)."""
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            cols = line.rstrip("\n").split("\t")
+            if len(cols) < 11 or cols[6] != "P" or cols[10] != "25":
+                continue
+            alt = [a for a in cols[3].split(",") if a]
+            yield {
+                "name": cols[1],
+                "name_ta": next((a for a in alt if has_tamil(a)), ""),
+                "district": "",
+                "lat": cols[4],
+                "lng": cols[5],
+                "alt_names": [cols[2]] + alt,
+            }
+
+
+def _rows_from_db():
+    """The city collection, so every city the app knows is also in the gazetteer."""
+    for c in db["city"].find({"lat": {"$exists": True}, "lng": {"$exists": True}}):
+        yield {
+            "name": c.get("city_name", ""),
+            "name_ta": c.get("city_name_ta", ""),
+            "district": c.get("district", ""),
+            "lat": c.get("lat"),
+            "lng": c.get("lng"),
+            "alt_names": [],
+        }
+
+
+def build_gazetteer(rows, out_dir=GAZETTEER_DIR):
+    os.makedirs(out_dir, exist_ok=True)
+
+    blob = bytearray()
+    interned = {}
+
+    def put(text):
+        raw = str(text or "").encode()
+        if raw not in interned:
+            interned[raw] = (len(blob), len(raw))
+            blob.extend(raw)
+        return interned[raw]
+
+    places, keys = [], {}
+    for row in rows:
+        try:
+            lat, lng = float(row["lat"]), float(row["lng"])
+        except (TypeError, ValueError):
+            continue
+
+        place = len(places)
+        places.append((lat, lng, put(row["name"]), put(row["name_ta"]), put(row["district"])))
+
+        for variant in [row["name"], row["name_ta"], *row.get("alt_names", [])]:
+            key = normalise(variant).encode()
+            # First source wins for a shared variant (pass the preferred source first)
+            if key and key not in keys:
+                keys[key] = place
+
+    key_rows = []
+    for key in sorted(keys):
+        off, length = put(key.decode())
+        key_rows.append((off, length, keys[key]))
+
+    with open(os.path.join(out_dir, "strings.bin"), "wb") as f:
+        f.write(blob)
+    np.save(os.path.join(out_dir, "places.npy"), np.array(places, dtype=PLACE_DTYPE))
+    np.save(os.path.join(out_dir, "keys.npy"), np.array(key_rows, dtype=KEY_DTYPE))
+    return {"places": len(places), "keys": len(key_rows)}
+
+
+if __name__ == "__main__":
+    # python -m api.gazetteer build [--db] [--csv FILE] [--geonames FILE]
+    # python -m api.gazetteer lookup NAME
+    args = sys.argv[1:]
+
+    if args[:1] == ["build"]:
+        sources = []
+        if "--db" in args:
+            sources.append(_rows_from_db())
+        for flag, reader in (("--csv", _rows_from_csv), ("--geonames", _rows_from_geonames)):
+            if flag in args:
+                sources.append(reader(args[args.index(flag) + 1]))
+
+        def all_rows():
+            for src in sources:
+                yield from src
+
+        print("✅ Gazetteer built:", build_gazetteer(all_rows()))
+
+    elif args[:1] == ["lookup"] and len(args) > 1:
+        name = " ".join(args[1:])
+        print(lookup(name) or search_prefix(name))
+
+    else:
+        print("usage: python -m api.gazetteer build [--db] [--csv FILE] [--geonames FILE]")
+        print("       python -m api.gazetteer lookup NAME")
@@ -0,0 +1,116 @@
+import os
+import threading
+import numpy as np
+from pymongo import UpdateOne
+from api.common_urldb import db
+from api.catalog import all_cities, catalog_version
+
+# ==================================================
+# NEAREST CITY LOOKUP
+# "geo"    -> one $geoNear query on city.location (2dsphere, api/indexes.py);
+#             cities with lat/lng but no location yet (added outside the
+#             API after the last backfill) come from the NumPy pass below
+# "memory" -> vectorised haversine over NumPy arrays built from the
+#             reference catalogue (api/catalog.py)
+# ==================================================
+NEARBY_MODE = os.getenv("NEARBY_MODE", "geo")
+NEARBY_MAX_KM = 25.0
+EARTH_RADIUS_KM = 6371.0
+
+col_city = db["city"]
+
+
+def geo_point(lat, lng):
+    return {"type": "Point", "coordinates": [float(lng), float(lat)]}
+
+
+# ---------------- $geoNear ----------------
+def nearest_cities_geo(lat, lng, max_km=NEARBY_MAX_KM, limit=50):
+    """[(distance_km, city_doc)] nearest first, from the 2dsphere index."""
+    rows = col_city.aggregate([
+        {"$geoNear": {
+            "near": geo_point(lat, lng),
+            "key": "location",
+            "distanceField": "distance_m",
+            "maxDistance": max_km * 1000,
+            "spherical": True
+        }},
+        {"$limit": limit},
+        {"$project": {"location": 0}}
+    ])
+    return [(row.pop("distance_m") / 1000, row) for row in rows]
+
+
+# ---------------- NumPy ----------------
+_arrays = {"version": None, "all": None, "unindexed": None}
+_arrays_lock = threading.Lock()
+
+
+def _build_arrays(docs):
+    docs = [{k: v for k, v in c.items() if k != "location"} for c in docs]
+    return {
+        "lat": np.radians(np.array([float(c["lat"]) for c in docs])),
+        "lng": np.radians(np.array([float(c["lng"]) for c in docs])),
+        "docs": docs
+    }
+
+
+def _city_arrays():
+    """{"all": arrays over every city with lat/lng, "unindexed": those without location}"""
+    version = catalog_version("city")
+    if _arrays["version"] != version:
+        with _arrays_lock:
+            if _arrays["version"] != version:
+                docs = [c for c in all_cities() if "lat" in c and "lng" in c]
+                _arrays.update({
+                    "version": version,
+                    "all": _build_arrays(docs),
+                    "unindexed": _build_arrays([c for c in docs if not c.get("location")]),
+                })
+    return _arrays
+
+
+def nearest_cities_memory(lat, lng, max_km=NEARBY_MAX_KM, limit=50, subset="all"):
+    """[(distance_km, city_doc)] nearest first, one vector op over all cities."""
+    arrays = _city_arrays()[subset]
+    if not arrays["docs"]:
+        return []
+
+    lat1, lng1 = np.radians(float(lat)), np.radians(float(lng))
+    dlat = arrays["lat"] - lat1
+    dlng = arrays["lng"] - lng1
+    a = np.sin(dlat / 2) ** 2 + np.cos(lat1) * np.cos(arrays["lat"]) * np.sin(dlng / 2) ** 2
+    dist = 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
+
+    within = np.nonzero(dist <= max_km)[0]
+    order = within[np.argsort(dist[within])][:limit]
+    return [(float(dist[i]), dict(arrays["docs"][i])) for i in order]
+
+
+def nearest_cities(lat, lng, max_km=NEARBY_MAX_KM, limit=50):
+    if NEARBY_MODE == "memory":
+        return nearest_cities_memory(lat, lng, max_km, limit)
+    found = nearest_cities_geo(lat, lng, max_km, limit)
+    missing = nearest_cities_memory(lat, lng, max_km, limit, subset="unindexed")
+    if not missing:
+        return found
+    return sorted(found + missing, key=lambda row: row[0])[:limit]
+
+
+# ---------------- BACKFILL ----------------
+def backfill_city_locations():
+    """Store lat/lng as a GeoJSON `location` point on every city."""
+    ops = []
+    for c in col_city.find({"lat": {"$exists": True}, "lng": {"$exists": True}}, {"lat": 1, "lng": 1}):
+        try:
+            ops.append(UpdateOne({"_id": c["_id"]}, {"$set": {"location": geo_point(c["lat"], c["lng"])}}))
+        except (TypeError, ValueError):
+            continue
+    if ops:
+        col_city.bulk_write(ops, ordered=False)
+    return len(ops)
+
+
+if __name__ == "__main__":
+    # python -m api.geo
+    print("✅ City locations written:", backfill_city_locations())
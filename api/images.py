@@ -0,0 +1,130 @@
+import os
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from api.common_urldb import db
+
+# ==================================================
+# IMAGE DERIVATIVES
+# Every stored image (api/blobs.py) gets resized copies:
+#   media/derived/<aa>/<bb>/<sha256>/<size>.<webp|jpg>
+# rendered on a process pool (EXIF applied then stripped) and recorded on
+# the owning document as {size: {"webp": path, "jpg": path}}. Derived
+# paths depend only on the content, so an image shared by several shops or
+# uploaded again is rendered once. Responses carry the webp path; the
+# media route hands out the jpg twin to clients without webp support
+# (api/media_serving.py).
+# ==================================================
+DERIVED_ROOT = "media/derived"
+SIZES = {"thumb": 160, "card": 480, "full": 1280}     # longest edge, px
+FORMATS = {"webp": ("WEBP", {"quality": 80, "method": 4}),
+           "jpg": ("JPEG", {"quality": 82, "optimize": True, "progressive": True})}
+IMAGE_WORKERS = int(os.getenv("IMAGE_WORKERS", "2"))
+
+_pool = None
+
+
+def derived_dir(sha256: str) -> str:
+    return f"{DERIVED_ROOT}/{sha256[:2]}/{sha256[2:4]}/{sha256}"
+
+
+def derivative_paths(src_path: str) -> dict:
+    sha = os.path.basename(src_path).split(".")[0]
+    base = derived_dir(sha)
+    return {size: {fmt: f"{base}/{size}.{fmt}" for fmt in FORMATS} for size in SIZES}
+
+
+# ---------------- WORKER (runs in the pool) ----------------
+def _render(src_path: str, variants: dict) -> dict:
+    from PIL import Image, ImageOps
+
+    with Image.open(src_path) as im:
+        im = ImageOps.exif_transpose(im)
+        if im.mode not in ("RGB", "RGBA"):
+            im = im.convert("RGBA" if "transparency" in im.info else "RGB")
+
+        for size, edge in SIZES.items():
+            resized = im.copy()
+            resized.thumbnail((edge, edge), Image.LANCZOS)
+            for fmt, (pil_format, options) in FORMATS.items():
+                out = variants[size][fmt]
+                os.makedirs(os.path.dirname(out), exist_ok=True)
+                img = resized.convert("RGB") if pil_format == "JPEG" else resized
+                # No exif= argument: metadata is not carried over
+                tmp = f"{out}.{os.getpid()}.part"
+                img.save(tmp, pil_format, **options)
+                os.replace(tmp, out)
+    return variants
+
+
+def _get_pool():
+    global _pool
+    if _pool is None:
+        # spawn: workers never inherit the parent's Mongo sockets / threads
+        _pool = ProcessPoolExecutor(max_workers=IMAGE_WORKERS,
+                                    mp_context=multiprocessing.get_context("spawn"))
+    return _pool
+
+
+# ---------------- ENQUEUE ----------------
+def image_target(collection: str, query: dict, field: str, array_filters=None, then=None) -> dict:
+    """
+    Where to record the variants: $set `field` on db[collection] matched by
+    query / array_filters. `then` runs after the write (e.g. refresh a read
+    model).
+    """
+    return {"collection": collection, "query": query, "field": field,
+            "array_filters": array_filters, "then": then}
+
+
+def _record(targets, variants: dict):
+    for t in targets:
+        db[t["collection"]].update_one(t["query"], {"$set": {t["field"]: variants}},
+                                       array_filters=t["array_filters"])
+        if t["then"]:
+            t["then"]()
+
+
+def enqueue_derivatives(src_path, *targets):
+    """Render src_path's derivatives in the background, then record them on every target."""
+    if not src_path or not src_path.startswith("media/blobs/"):
+        return
+
+    variants = derivative_paths(src_path)
+
+    if all(os.path.exists(p) for v in variants.values() for p in v.values()):
+        _record(targets, variants)
+        return
+
+    def done(future):
+        try:
+            _record(targets, future.result())
+        except Exception as e:
+            print("❌ Image derivative error:", src_path, e)
+
+    _get_pool().submit(_render, src_path, variants).add_done_callback(done)
+
+
+# ---------------- READ ----------------
+def sized(path, variants, size: str, fmt: str = "webp"):
+    """The `size` variant of an image path, or the path itself if there is none yet."""
+    try:
+        return variants[size][fmt]
+    except (KeyError, TypeError):
+        return path
+
+
+def present_shop_images(shop: dict, main_size: str, media_size: str):
+    """Swap main_image / image media paths for a size variant (response docs only)."""
+    if not shop:
+        return shop
+    shop["main_image"] = sized(shop.get("main_image"), shop.pop("main_image_variants", None), main_size)
+    media = []
+    for m in shop.get("media", []) or []:
+        m = dict(m)
+        variants = m.pop("variants", None)
+        if m.get("type") == "image":
+            m["path"] = sized(m.get("path"), variants, media_size)
+        media.append(m)
+    if "media" in shop:
+        shop["media"] = media
+    return shop
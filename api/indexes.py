@@ -0,0 +1,143 @@
+import sys
+from pymongo import IndexModel, ASCENDING, DESCENDING, GEOSPHERE
+from api.common_urldb import db
+
+# ==================================================
+# INDEX REGISTRY
+# collection -> [(keys, options)]
+# Every hot-path query in the routers should be covered here.
+# ==================================================
+INDEXES = {
+    "shop": [
+        ([("status", ASCENDING)], {}),
+        ([("city_id", ASCENDING)], {}),
+        ([("user_id", ASCENDING)], {}),
+        # /shop/search/ keyset sort (api/search_shops.py)
+        ([("status", ASCENDING), ("avg_rating", DESCENDING),
+          ("rating_count", DESCENDING), ("_id", ASCENDING)], {}),
+    ],
+    "reviews": [
+        ([("shop_id", ASCENDING)], {}),
+    ],
+    "offers": [
+        ([("shop_id", ASCENDING)], {}),
+        ([("offers.offer_id", ASCENDING)], {}),
+        ([("user_id", ASCENDING)], {}),
+    ],
+    # One document per (shop, offer) (api/offer_items.py)
+    "offer_items": [
+        ([("offer_id", ASCENDING)], {}),
+        ([("shop_id", ASCENDING), ("status", ASCENDING), ("uploaded_at", ASCENDING)], {}),
+        ([("offers_doc_id", ASCENDING)], {}),
+    ],
+    # Content-addressed media; sweep_blobs() scans refs <= 0 (api/blobs.py)
+    "blobs": [
+        ([("refs", ASCENDING), ("updated_at", ASCENDING)], {}),
+    ],
+    "user": [
+        ([("email", ASCENDING)], {}),
+        ([("phonenumber", ASCENDING)], {}),
+    ],
+    "notifications": [
+        ([("user_id", ASCENDING), ("created_at", DESCENDING)], {}),
+    ],
+    "payments": [
+        ([("user_id", ASCENDING), ("status", ASCENDING), ("expiry_date", DESCENDING)], {}),
+        # Expiry reminder sweep: day windows on expiry_date (api/plan_expiry_mail.py)
+        ([("status", ASCENDING), ("expiry_date", ASCENDING)], {}),
+        ([("payment_id", ASCENDING)], {}),
+        ([("subscription_id", ASCENDING)], {}),
+    ],
+    "jobs": [
+        ([("created_at", DESCENDING)], {}),
+        ([("user_id", ASCENDING), ("created_at", DESCENDING)], {}),
+    ],
+    "shop_view_logs": [
+        ([("shop_id", ASCENDING), ("user_id", ASCENDING),
+          ("month", ASCENDING), ("year", ASCENDING)], {}),
+    ],
+    # UNIQUE: one document per shop per month (api/shop_views.py)
+    "shopviews": [
+        ([("shop_id", ASCENDING), ("year", ASCENDING), ("month", ASCENDING)], {"unique": True}),
+    ],
+    "category": [
+        ([("name", ASCENDING)], {}),
+    ],
+    "city": [
+        ([("city_name", ASCENDING)], {}),
+        # $geoNear for the /offers/{city}/ nearby fallback (api/geo.py)
+        ([("location", GEOSPHERE)], {}),
+    ],
+    # Razorpay event inbox (api/webhook_inbox.py); _id is the event id, so
+    # redeliveries are duplicates. Applied events are kept 30 days.
+    "webhook_inbox": [
+        ([("status", ASCENDING), ("due_at", ASCENDING)], {}),
+        ([("status", ASCENDING), ("lease_until", ASCENDING)], {}),
+        ([("processed_at", ASCENDING)], {"expireAfterSeconds": 30 * 24 * 3600}),
+    ],
+    # Outgoing mail (api/email_outbox.py); sent mail is kept 7 days
+    "email_outbox": [
+        ([("status", ASCENDING), ("due_at", ASCENDING)], {}),
+        ([("claim", ASCENDING)], {}),
+        ([("sent_at", ASCENDING)], {"expireAfterSeconds": 7 * 24 * 3600}),
+    ],
+    # Periodic job leases (api/scheduler.py); a crashed holder's lease expires
+    "scheduler_leases": [
+        ([("expires_at", ASCENDING)], {"expireAfterSeconds": 0}),
+    ],
+    # Nominatim fallback cache; negative entries carry expires_at (api/gazetteer.py)
+    "geocode_cache": [
+        ([("expires_at", ASCENDING)], {"expireAfterSeconds": 0}),
+    ],
+}
+
+
+def ensure_indexes():
+    """
+    Idempotent: create_indexes is a no-op for indexes that already exist
+    with the same keys and options.
+    """
+    for name, specs in INDEXES.items():
+        models = [IndexModel(keys, **opts) for keys, opts in specs]
+        try:
+            db[name].create_indexes(models)
+        except Exception as e:
+            print(f"❌ Index error on {name}:", e)
+
+
+def index_report():
+    """
+    Size (collStats.indexSizes) and usage ($indexStats) for every index
+    of every registered collection.
+    """
+    report = []
+    for name in INDEXES:
+        try:
+            sizes = db.command("collStats", name).get("indexSizes", {})
+        except Exception:
+            sizes = {}
+
+        for stat in db[name].aggregate([{"$indexStats": {}}]):
+            report.append({
+                "collection": name,
+                "index": stat["name"],
+                "key": dict(stat.get("key", {})),
+                "size_bytes": sizes.get(stat["name"], 0),
+                "ops": stat.get("accesses", {}).get("ops", 0),
+                "since": stat.get("accesses", {}).get("since")
+            })
+    return report
+
+
+if __name__ == "__main__":
+    # python -m api.indexes            -> ensure indexes
+    # python -m api.indexes --report   -> ensure + print size / usage
+    ensure_indexes()
+    print("✅ Indexes ensured")
+
+    if "--report" in sys.argv:
+        for row in index_report():
+            print(
+                f"{row['collection']:<16} {row['index']:<50} "
+                f"{row['size_bytes']:>10} B  {row['ops']:>8} ops"
+            )
@@ -4,7 +4,7 @@ from datetime import datetime
 from api.common_urldb import db
 
 from api.translator import ta_to_en, en_to_ta
-from api.cache import get_cached, set_cache
+from api.tamil_fields import project_ta, JOB_TA_FIELDS
 
 router = APIRouter()
 col_jobs = db["jobs"]
@@ -20,16 +20,12 @@ def safe(doc):
     return doc
 
 
+# ta_to_en / en_to_ta are backed by the shared two-tier cache (api/cache.py)
 def to_en(text):
     if not text:
         return text
-    cached = get_cached(f"ta_en:{text}")
-    if cached:
-        return cached
     try:
-        res = ta_to_en(text)
-        set_cache(f"ta_en:{text}", res)
-        return res
+        return ta_to_en(text)
     except:
         return text
 
@@ -37,13 +33,8 @@ def to_en(text):
 def to_ta(text):
     if not text:
         return text
-    cached = get_cached(f"en_ta:{text}")
-    if cached:
-        return cached
     try:
-        res = en_to_ta(text)
-        set_cache(f"en_ta:{text}", res)
-        return res
+        return en_to_ta(text)
     except:
         return text
 
@@ -67,7 +58,8 @@ def get_jobs(
 
     output = []
     for job in jobs:
-        job = safe(job)
+        # Stored Tamil renditions first; to_ta only pays for the rest
+        job = project_ta(safe(job), JOB_TA_FIELDS, lang)
 
         if lang == "ta":
             job["job_title"] = to_ta(job.get("job_title"))
@@ -99,7 +91,7 @@ def get_job_by_id(job_id: str, lang: str = Query("en")):
     if not job:
         return {"status": False, "message": "Job not found"}
 
-    job = safe(job)
+    job = project_ta(safe(job), JOB_TA_FIELDS, lang)
 
     if lang == "ta":
         job["job_title"] = to_ta(job.get("job_title"))
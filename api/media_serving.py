@@ -0,0 +1,212 @@
+import os
+import re
+import sys
+import gzip
+import shutil
+import hashlib
+import mimetypes
+from fastapi import APIRouter, Request, HTTPException
+from fastapi.responses import Response, StreamingResponse
+from cachetools import LRUCache
+
+# ==================================================
+# MEDIA SERVING (/media/...)
+# - content-addressed paths (media/blobs, media/derived: the file name is
+#   the content hash) are immutable: cached for a year
+# - strong ETag on everything, If-None-Match -> 304 (weak comparison,
+#   "*" matches any file that exists)
+# - single byte ranges (offer videos): 206 / 416, If-Range honoured
+# - pre-compressed "<file>.br" / "<file>.gz" sidecars for compressible types
+# - derived .webp images come as the sibling .jpg to clients whose Accept
+#   header does not list image/webp (no Accept header: webp, as the apps
+#   all decode it)
+# ==================================================
+MEDIA_DIR = "media"
+IMMUTABLE_PREFIXES = ("blobs/", "derived/")
+COMPRESSIBLE = (".svg", ".json", ".txt", ".css", ".js", ".html", ".csv")
+SIDECARS = (("br", ".br"), ("gzip", ".gz"))
+
+CACHE_IMMUTABLE = "public, max-age=31536000, immutable"
+CACHE_REVALIDATE = "public, max-age=0, must-revalidate"
+CHUNK_SIZE = 256 * 1024
+
+router = APIRouter()
+
+_etags = LRUCache(maxsize=10000)
+
+# entity-tag = [ W/ ] DQUOTE *etagc DQUOTE; the opaque tag may contain commas
+_ENTITY_TAG = re.compile(r'(?:W/)?("[^"]*")')
+
+
+# ---------------- HELPERS ----------------
+def _resolve(rel_path: str) -> str:
+    root = os.path.realpath(MEDIA_DIR)
+    full = os.path.realpath(os.path.join(root, rel_path))
+    if not full.startswith(root + os.sep) or not os.path.isfile(full):
+        raise HTTPException(status_code=404, detail="Not found")
+    return full
+
+
+def _is_content_addressed(rel_path: str) -> bool:
+    return rel_path.startswith(IMMUTABLE_PREFIXES)
+
+
+def _negotiate_image(rel_path: str, accept: str | None) -> str:
+    """The .jpg twin of a derived .webp for clients that don't take webp."""
+    if accept and "image/webp" not in accept:
+        jpg = rel_path[:-len(".webp")] + ".jpg"
+        if os.path.isfile(os.path.join(MEDIA_DIR, jpg)):
+            return jpg
+    return rel_path
+
+
+def file_etag(full: str, st) -> str:
+    """SHA-256 based, computed once per (path, mtime, size)."""
+    key = (full, st.st_mtime_ns, st.st_size)
+    if key not in _etags:
+        digest = hashlib.sha256()
+        with open(full, "rb") as f:
+            for chunk in iter(lambda: f.read(CHUNK_SIZE), b""):
+                digest.update(chunk)
+        _etags[key] = f'"{digest.hexdigest()[:32]}"'
+    return _etags[key]
+
+
+def _etag(rel_path: str, full: str, st) -> str:
+    if _is_content_addressed(rel_path):
+        # media/blobs/../<sha>.<ext>, media/derived/../<sha>/<size>.<fmt>
+        return f'"{rel_path.replace("/", "-")}"'
+    return file_etag(full, st)
+
+
+def _none_match(header: str | None, etag: str) -> bool:
+    """If-None-Match (RFC 9110 13.1.2): "*" or a list of entity tags, compared weakly."""
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    opaque = etag.removeprefix("W/")
+    return any(tag == opaque for tag in _ENTITY_TAG.findall(header))
+
+
+def _parse_range(header: str, size: int):
+    """(start, end) inclusive for one satisfiable range; None = serve whole; False = 416."""
+    if not header or not header.startswith("bytes=") or "," in header:
+        return None
+    start_s, _, end_s = header[6:].strip().partition("-")
+    try:
+        if start_s == "":
+            length = int(end_s)
+            if length <= 0:
+                return False
+            return max(0, size - length), size - 1
+        start = int(start_s)
+        end = int(end_s) if end_s else size - 1
+    except ValueError:
+        return None
+    if start >= size or end < start:
+        return False
+    return start, min(end, size - 1)
+
+
+def _iter_file(full: str, start: int, length: int):
+    with open(full, "rb") as f:
+        f.seek(start)
+        while length > 0:
+            chunk = f.read(min(CHUNK_SIZE, length))
+            if not chunk:
+                break
+            length -= len(chunk)
+            yield chunk
+
+
+# ---------------- ROUTE ----------------
+@router.api_route("/media/{rel_path:path}", methods=["GET", "HEAD"], include_in_schema=False)
+def serve_media(rel_path: str, request: Request):
+    negotiated = rel_path.startswith("derived/") and rel_path.endswith(".webp")
+    if negotiated:
+        rel_path = _negotiate_image(rel_path, request.headers.get("accept"))
+
+    full = _resolve(rel_path)
+    st = os.stat(full)
+    etag = _etag(rel_path, full, st)
+
+    headers = {
+        "Cache-Control": CACHE_IMMUTABLE if _is_content_addressed(rel_path) else CACHE_REVALIDATE,
+        "Accept-Ranges": "bytes",
+    }
+    if negotiated:
+        headers["Vary"] = "Accept"
+    media_type = mimetypes.guess_type(full)[0] or "application/octet-stream"
+
+    # Pre-compressed sidecar (whole-file responses only); each encoding
+    # is its own representation, so it gets its own ETag
+    if full.endswith(COMPRESSIBLE):
+        headers["Vary"] = "Accept-Encoding"
+        accepted = request.headers.get("accept-encoding", "")
+        if "range" not in request.headers:
+            for encoding, suffix in SIDECARS:
+                if encoding in accepted and os.path.isfile(full + suffix):
+                    full, st = full + suffix, os.stat(full + suffix)
+                    headers["Content-Encoding"] = encoding
+                    etag = f'{etag[:-1]}-{encoding}"'
+                    break
+    headers["ETag"] = etag
+
+    if _none_match(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+
+    size = st.st_size
+    byte_range = _parse_range(request.headers.get("range"), size)
+    if_range = request.headers.get("if-range")
+    if if_range and if_range != etag:
+        byte_range = None
+
+    if byte_range is False:
+        return Response(status_code=416, headers={**headers, "Content-Range": f"bytes */{size}"})
+
+    if byte_range:
+        start, end = byte_range
+        status, length = 206, end - start + 1
+        headers["Content-Range"] = f"bytes {start}-{end}/{size}"
+    else:
+        status, start, length = 200, 0, size
+    headers["Content-Length"] = str(length)
+
+    if request.method == "HEAD":
+        return Response(status_code=status, headers=headers, media_type=media_type)
+    return StreamingResponse(_iter_file(full, start, length), status_code=status,
+                             headers=headers, media_type=media_type)
+
+
+# ---------------- SIDECARS ----------------
+def precompress(root: str = MEDIA_DIR) -> int:
+    """Write .gz (and .br when the brotli package is installed) next to compressible files."""
+    try:
+        import brotli
+    except ImportError:
+        brotli = None
+
+    written = 0
+    for dirpath, _, files in os.walk(root):
+        for name in files:
+            if not name.endswith(COMPRESSIBLE):
+                continue
+            src = os.path.join(dirpath, name)
+            if not os.path.exists(src + ".gz"):
+                with open(src, "rb") as f_in, gzip.open(src + ".gz", "wb", compresslevel=9) as f_out:
+                    shutil.copyfileobj(f_in, f_out)
+                written += 1
+            if brotli and not os.path.exists(src + ".br"):
+                with open(src, "rb") as f_in, open(src + ".br", "wb") as f_out:
+                    f_out.write(brotli.compress(f_in.read()))
+                written += 1
+    return written
+
+
+if __name__ == "__main__":
+    # python -m api.media_serving precompress
+    if sys.argv[1:2] == ["precompress"]:
+        print("✅ Sidecars written:", precompress())
+    else:
+        print("usage: python -m api.media_serving precompress")
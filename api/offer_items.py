@@ -0,0 +1,130 @@
+from bson import ObjectId
+from pymongo import ReplaceOne, ASCENDING
+from pymongo.errors import PyMongoError
+from api.common_urldb import db
+from api.cache import bump_version
+
+# ==================================================
+# OFFER ITEMS READ MODEL
+# offers keeps one document per shop with an embedded `offers` array (the
+# write model). offer_items holds one document per (shop, offer):
+#   {_id: "<shop_id>:<offer_id>", shop_id, offer_id, offers_doc_id, ...offer}
+# indexed by offer_id and (shop_id, status, uploaded_at) (api/indexes.py).
+# The offer endpoints sync it after each write; the offer_items_resync job
+# (api/scheduler.py, one process at a time) picks up edits made outside the
+# API, e.g. admins approving offers.
+# ==================================================
+RESYNC_INTERVAL = 300     # seconds
+ITEM_ORDER = [("uploaded_at", ASCENDING)]
+
+col_offers = db["offers"]
+col_offer_items = db["offer_items"]
+
+
+def item_id(shop_id, offer_id) -> str:
+    # offer_id alone is not unique: "ALL" offers share one id across shops
+    return f"{shop_id}:{offer_id}"
+
+
+def _item(doc, offer):
+    shop_id = str(doc.get("shop_id"))
+    return {
+        **offer,
+        "_id": item_id(shop_id, offer.get("offer_id")),
+        "shop_id": shop_id,
+        "user_id": str(doc.get("user_id")) if doc.get("user_id") else None,
+        "offers_doc_id": doc["_id"],
+    }
+
+
+# ---------------- SYNC ----------------
+def _oid_form(shop_id):
+    return [ObjectId(str(shop_id))] if ObjectId.is_valid(str(shop_id)) else []
+
+
+def shop_id_match(shop_id) -> dict:
+    """offers documents keep shop_id as a string, older data as ObjectId."""
+    return {"$in": [str(shop_id), *_oid_form(shop_id)]}
+
+
+def sync_offers_doc(doc) -> int:
+    """Make offer_items match one offers document. Returns how many items changed."""
+    items = [_item(doc, o) for o in doc.get("offers", []) if o.get("offer_id")]
+    changed = 0
+    if items:
+        res = col_offer_items.bulk_write([ReplaceOne({"_id": i["_id"]}, i, upsert=True) for i in items],
+                                         ordered=False)
+        changed += res.modified_count + res.upserted_count
+    changed += col_offer_items.delete_many(
+        {"offers_doc_id": doc["_id"], "_id": {"$nin": [i["_id"] for i in items]}}).deleted_count
+    return changed
+
+
+def sync_shop(shop_id):
+    """Resync every item of a shop from its offers document(s)."""
+    try:
+        for doc in col_offers.find({"shop_id": shop_id_match(shop_id)}):
+            sync_offers_doc(doc)
+    except PyMongoError as e:
+        print("❌ Offer items sync error:", e)
+
+
+def sync_offer(shop_id, offer_id):
+    """Resync one item; reads just that array element ($elemMatch projection)."""
+    try:
+        doc = col_offers.find_one(
+            {"shop_id": shop_id_match(shop_id), "offers.offer_id": offer_id},
+            {"shop_id": 1, "user_id": 1, "offers": {"$elemMatch": {"offer_id": offer_id}}}
+        )
+        if doc:
+            item = _item(doc, doc["offers"][0])
+            col_offer_items.replace_one({"_id": item["_id"]}, item, upsert=True)
+        else:
+            col_offer_items.delete_one({"_id": item_id(shop_id, offer_id)})
+    except PyMongoError as e:
+        print("❌ Offer items sync error:", e)
+
+
+def remove_offers_doc(doc_id):
+    col_offer_items.delete_many({"offers_doc_id": doc_id})
+
+
+def backfill_offer_items():
+    count = 0
+    for doc in col_offers.find():
+        # Changed here means edited outside the API (e.g. an admin approval):
+        # the owner's cached /myshop/ (api/shop_owner_details.py) is stale
+        if sync_offers_doc(doc) and doc.get("user_id"):
+            bump_version(f"dash:{doc['user_id']}")
+        count += 1
+    # Items whose offers document is gone
+    col_offer_items.delete_many({"offers_doc_id": {"$nin": col_offers.distinct("_id")}})
+    return count
+
+
+# ---------------- READS ----------------
+def get_offer_item(offer_id, shop_id=None):
+    if shop_id:
+        return col_offer_items.find_one({"_id": item_id(shop_id, offer_id)})
+    return col_offer_items.find_one({"offer_id": offer_id})
+
+
+def shop_offer_items(shop_id, status=None, projection=None):
+    query = {"shop_id": str(shop_id)}
+    if status:
+        query["status"] = status
+    return list(col_offer_items.find(query, projection).sort(ITEM_ORDER))
+
+
+def approved_items_for_shops(shop_ids, projection=None):
+    """{shop_id: [approved items]} for many shops in one range scan each."""
+    out = {}
+    query = {"shop_id": {"$in": [str(s) for s in shop_ids]}, "status": "approved"}
+    for item in col_offer_items.find(query, projection).sort(ITEM_ORDER):
+        out.setdefault(item["shop_id"], []).append(item)
+    return out
+
+
+if __name__ == "__main__":
+    # python -m api.offer_items
+    print("✅ Offer documents synced:", backfill_offer_items())
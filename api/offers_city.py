@@ -1,10 +1,13 @@
-import math
-import requests
 from fastapi import APIRouter, Query
 from bson import ObjectId
 from api.common_urldb import db
 from api.translator import ta_to_en, en_to_ta
-from api.cache import get_cached, set_cache
+from api.catalog import cities_by_name
+from api.geo import nearest_cities, NEARBY_MAX_KM
+from api.gazetteer import geocode
+from api.city_slides import read_city_slides, read_slides_for_cities, SLIDES_MAX
+from api.images import sized, present_shop_images
+from api.tamil_fields import project_ta, stored_ta, SHOP_TA_FIELDS, CITY_TA_FIELDS
 
 router = APIRouter()
 
@@ -24,114 +27,69 @@ def safe(doc):
 
 
 # ---------------- TRANSLATION HELPERS ----------------
+# ta_to_en / en_to_ta are backed by the shared two-tier cache (api/cache.py)
 def translate_to_en_logic(text: str):
     if not text: return text
-    cached = get_cached(f"ta_en:{text}")
-    if cached: return cached
     try:
-        translated = ta_to_en(text)
-        set_cache(f"ta_en:{text}", translated)
-        return translated
+        return ta_to_en(text)
     except:
         return text
 
 
 def translate_to_ta_logic(text: str):
     if not text: return text
-    cached = get_cached(f"en_ta:{text}")
-    if cached: return cached
     try:
-        translated = en_to_ta(text)
-        set_cache(f"en_ta:{text}", translated)
-        return translated
+        return en_to_ta(text)
     except:
         return text
 
 
-# ---------------- NEW HELPERS: GEO & DISTANCE ----------------
-def get_coordinates_from_osm(city_name):
-    # Check cache first
-    cache_key = f"geo_coords:{city_name.lower()}"
-    cached = get_cached(cache_key)
-    if cached: return cached["lat"], cached["lng"]
-
-    try:
-        url = "https://nominatim.openstreetmap.org/search"
-        params = {"q": f"{city_name}, Tamil Nadu", "format": "json", "limit": 1}
-        headers = {"User-Agent": "MyLocalApp/1.0"}
-        resp = requests.get(url, params=params, headers=headers, timeout=3)
-        data = resp.json()
-        if data:
-            lat, lng = float(data[0]["lat"]), float(data[0]["lon"])
-            set_cache(cache_key, {"lat": lat, "lng": lng})
-            return lat, lng
-    except:
-        return None, None
-    return None, None
-
-
-def calculate_distance(lat1, lon1, lat2, lon2):
-    R = 6371.0  # Earth radius in km
-    dlat = math.radians(lat2 - lat1)
-    dlon = math.radians(lon2 - lon1)
-    a = (math.sin(dlat / 2) * math.sin(dlat / 2) +
-         math.cos(math.radians(lat1)) * math.cos(math.radians(lat2)) *
-         math.sin(dlon / 2) * math.sin(dlon / 2))
-    c = 2 * math.atan2(math.sqrt(a), math.sqrt(1 - a))
-    return R * c
-
-
 # ---------------- HELPER: GET SLIDES (Reuse Logic) ----------------
-def get_slides_logic(city_doc, lang):
+def get_slides_logic(city_doc, lang, limit=3, city_slides=None):
     """
     Extracts offers/slides for a given city document.
     Returns (slides_list, safe_city_doc)
+    Slides come from the city_slides read model (api/city_slides.py);
+    callers that already read them pass city_slides.
     """
     if not city_doc: return [], None
 
     city_id = str(city_doc["_id"])
-    final_city_safe = safe(city_doc)
+    # Stored Tamil renditions first; translate_to_ta_logic only pays for the rest
+    city_stored = stored_ta(city_doc, CITY_TA_FIELDS)
+    final_city_safe = project_ta(safe(city_doc), CITY_TA_FIELDS, lang)
+    final_city_safe.pop("location", None)     # internal GeoJSON (api/geo.py)
 
-    if lang == "ta":
+    if lang == "ta" and "city_name" not in city_stored:
         final_city_safe["city_name"] = translate_to_ta_logic(final_city_safe.get("city_name", ""))
 
-    shops = list(col_shop.find({"city_id": city_id}))
-    if not shops: return [], final_city_safe
-
     local_slides = []
-
-    for shop in shops:
-        shop_id = str(shop["_id"])
-        shop_safe = safe(shop)
-
-        if lang == "ta":
-            shop_safe["shop_name"] = translate_to_ta_logic(shop_safe.get("shop_name", ""))
-            shop_safe["description"] = translate_to_ta_logic(shop_safe.get("description", ""))
-            shop_safe["address"] = translate_to_ta_logic(shop_safe.get("address", ""))
-
-        offer_doc = col_offers.find_one({"shop_id": shop_id})
-        if not offer_doc: continue
-
-        for off in offer_doc.get("offers", []):
-            if off.get("status") != "approved": continue
-
-            media_path = off.get("media_path")
-            media_type = off.get("media_type")
-            if not media_path or not media_type: continue
-
-            local_slides.append({
-                "shop_id": shop_id,
-                "shop": shop_safe,
-                "city": final_city_safe,
-                "offer_id": off.get("offer_id"),
-                "title": off.get("title"),
-                "percentage": off.get("percentage"),
-                "type": media_type,
-                "path": media_path
-            })
-
-            if len(local_slides) == 3: break
-        if len(local_slides) == 3: break
+    shops = {}
+
+    if city_slides is None:
+        city_slides = read_city_slides(city_id, limit)
+
+    for slide in city_slides:
+        shop_id = slide["shop_id"]
+        if shop_id not in shops:
+            shop_stored = stored_ta(slide["shop"], SHOP_TA_FIELDS)
+            shop_safe = present_shop_images(project_ta(slide["shop"], SHOP_TA_FIELDS, lang), "card", "card")
+            if lang == "ta":
+                for field in ("shop_name", "description", "address"):
+                    if field not in shop_stored:
+                        shop_safe[field] = translate_to_ta_logic(shop_safe.get(field, ""))
+            shops[shop_id] = shop_safe
+
+        local_slides.append({
+            "shop_id": shop_id,
+            "shop": shops[shop_id],
+            "city": final_city_safe,
+            "offer_id": slide.get("offer_id"),
+            "title": (slide.get("title_ta") if lang == "ta" else None) or slide.get("title"),
+            "percentage": slide.get("percentage"),
+            "type": slide.get("type"),
+            "path": sized(slide.get("path"), slide.get("variants"), "full")
+        })
 
     return local_slides, final_city_safe
 
@@ -143,30 +101,26 @@ def get_slides_logic(city_doc, lang):
 )
 def get_offers(
         city: str,
-        lang: str = Query("en")
+        lang: str = Query("en"),
+        limit: int = Query(3, ge=1, le=SLIDES_MAX)
 ):
     # ---------- CITY SEARCH ----------
     raw_city = city.strip()
     search_city = translate_to_en_logic(raw_city) if lang == "ta" else raw_city
 
-    # 1. Try finding the exact city
-    city_list = list(col_city.find({
-        "city_name": {"$regex": f"^{search_city}$", "$options": "i"}
-    }))
+    # 1. Try finding the exact city (reference catalogue, no query)
+    city_list = cities_by_name(search_city)
 
     slides = []
     final_city = None
     is_nearby = False
 
-    # 2. Check shops in the exact city
+    # 2. Check offers in the exact city (cities without shops have no slides)
     if city_list:
         for c in city_list:
-            cid = str(c["_id"])
-            if col_shop.find_one({"city_id": cid}):
-                # Found a valid city with shops
-                slides, final_city = get_slides_logic(c, lang)
-                if slides:
-                    break
+            slides, final_city = get_slides_logic(c, lang, limit)
+            if slides:
+                break
 
     # ---------- FALLBACK: NEARBY CHECK (If no slides found) ----------
     if not slides:
@@ -177,42 +131,30 @@ def get_offers(
             user_lat = city_list[0].get("lat")
             user_lng = city_list[0].get("lng")
 
-        # B. If city NOT in DB -> Get Lat/Lng from Internet (OSM)
+        # B. If city NOT in DB -> Get Lat/Lng from the offline gazetteer
+        #    (Nominatim only as a last resort, see api/gazetteer.py)
         elif not city_list:
-            user_lat, user_lng = get_coordinates_from_osm(search_city)
+            user_lat, user_lng = geocode(raw_city, search_city)
 
         # C. If we have coordinates, find nearest city with offers
         if user_lat and user_lng:
-            # Get all DB cities with coordinates
-            all_cities = list(col_city.find({
-                "lat": {"$exists": True},
-                "lng": {"$exists": True}
-            }))
-
-            cities_dist = []
-            for db_c in all_cities:
-                # Calculate distance
-                d = calculate_distance(user_lat, user_lng, db_c["lat"], db_c["lng"])
-                cities_dist.append((d, db_c))
-
-            # Sort by distance (nearest first)
-            cities_dist.sort(key=lambda x: x[0])
-
-            # Check closest cities within 25km
+            # Cities within 25km, nearest first ($geoNear or one NumPy pass, see api/geo.py)
+            cities_dist = nearest_cities(user_lat, user_lng, NEARBY_MAX_KM)
+
+            # One city_slides read for all candidates; only the nearest
+            # city that has slides is projected / translated
+            by_city = read_slides_for_cities([c["_id"] for _, c in cities_dist], limit)
+
             for dist, nearby_city in cities_dist:
-                if dist > 25.0:  # Strict 25km limit
-                    break
-
-                # Try getting slides for this nearby city
-                n_slides, n_city = get_slides_logic(nearby_city, lang)
-
-                if n_slides:
-                    slides = n_slides
-                    final_city = n_city
-                    is_nearby = True
-                    # Optional: Add distance to response
-                    final_city["distance_km"] = round(dist, 1)
-                    break
+                city_slides = by_city.get(str(nearby_city["_id"]))
+                if not city_slides:
+                    continue
+
+                slides, final_city = get_slides_logic(nearby_city, lang, limit, city_slides)
+                is_nearby = True
+                # Optional: Add distance to response
+                final_city["distance_km"] = round(dist, 1)
+                break
 
     # ---------- FINAL RESPONSE ----------
     if not slides:
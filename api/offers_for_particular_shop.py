@@ -1,6 +1,7 @@
 from fastapi import APIRouter
-from bson import ObjectId
 from api.common_urldb import db
+from api.offer_items import shop_offer_items
+from api.images import sized
 
 router = APIRouter()
 
@@ -14,34 +15,10 @@ col_offers = db["offers"]
 )
 def get_offers_for_shop(shop_id: str):
 
-    # ---------- TRY OBJECT ID ----------
-    try:
-        shop_oid = ObjectId(shop_id)
-    except:
-        shop_oid = None
-
-
-    offers_doc = col_offers.find_one({
-        "$or": [
-            {"shop_id": shop_id},
-            {"shop_id": shop_oid}
-        ]
-    })
-
-    if not offers_doc:
-        return {
-            "status": True,
-            "offers": []
-        }
-
     approved_offers = []
 
-    
-    for offer in offers_doc.get("offers", []):
-
-        if offer.get("status") != "approved":
-            continue
-
+    # offer_items: (shop_id, status, uploaded_at) range scan
+    for offer in shop_offer_items(shop_id, status="approved"):
         approved_offers.append({
             "offer_id": str(offer.get("offer_id")),
             "title": offer.get("title"),
@@ -51,7 +28,7 @@ def get_offers_for_shop(shop_id: str):
 
       
             "media_type": offer.get("media_type"),     # image | video
-            "media_path": offer.get("media_path"),     # media/....
+            "media_path": sized(offer.get("media_path"), offer.get("media_variants"), "full"),     # media/....
 
             "filename": offer.get("filename"),
             "start_date": offer.get("start_date"),
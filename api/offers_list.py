@@ -2,7 +2,10 @@ from fastapi import APIRouter, Query
 from bson import ObjectId
 from api.common_urldb import db
 from api.translator import en_to_ta
-from api.cache import get_cached, set_cache
+from api.catalog import get_city
+from api.offer_items import get_offer_item, shop_offer_items
+from api.images import sized
+from api.tamil_fields import project_ta, SHOP_TA_FIELDS, CITY_TA_FIELDS, OFFER_TA_FIELDS
 
 router = APIRouter()
 
@@ -25,14 +28,9 @@ def safe(doc):
 def translate_to_ta_logic(text: str):
     if not text or not isinstance(text, str):
         return text
-    key = f"en_ta:{text}"
-    cached = get_cached(key)
-    if cached:
-        return cached
+    # en_to_ta is backed by the shared two-tier cache (api/cache.py)
     try:
-        translated = en_to_ta(text)
-        set_cache(key, translated)
-        return translated
+        return en_to_ta(text)
     except:
         return text
 
@@ -47,29 +45,19 @@ def get_offer_details(
     lang: str = Query("en")
 ):
 
-    # 🔍 Find offer document that contains this offer_id
-    offer_doc = col_offers.find_one({
-        "offers.offer_id": offer_id
-    })
+    # 🔍 Find the offer (offer_items, indexed on offer_id)
+    item = get_offer_item(offer_id)
 
-    if not offer_doc:
+    if not item:
         return {
             "status": False,
             "message": translate_to_ta_logic("Offer not found") if lang == "ta" else "Offer not found"
         }
 
-    shop_id = offer_doc.get("shop_id")
+    shop_id = item.get("shop_id")
 
     # 🔍 Fetch shop
-    try:
-        shop = col_shop.find_one({
-            "$or": [
-                {"_id": ObjectId(shop_id)},
-                {"_id": shop_id}
-            ]
-        })
-    except:
-        shop = col_shop.find_one({"_id": shop_id})
+    shop = col_shop.find_one({"_id": ObjectId(shop_id)}) if ObjectId.is_valid(shop_id) else None
 
     if not shop:
         return {
@@ -81,51 +69,50 @@ def get_offer_details(
     city = None
     try:
         if shop.get("city_id"):
-            city = col_city.find_one({"_id": ObjectId(shop.get("city_id"))})
+            city = get_city(shop.get("city_id"))
     except:
         pass
 
     # ---------------- MAIN OFFER ----------------
-    main_offer = None
-    other_offers = []
-
-    for off in offer_doc.get("offers", []):
+    main_offer = {
+        "offer_id": item.get("offer_id"),
+        "title": item.get("title"),
+        "title_ta": item.get("title_ta"),
+        "description_ta": item.get("description_ta"),
+        "percentage": item.get("percentage"),
+        "fee": item.get("fee"),
+        "description": item.get("description"),
+        "start_date": item.get("start_date"),
+        "end_date": item.get("end_date"),
+        "media_type": item.get("media_type"),
+        "media_path": sized(item.get("media_path"), item.get("media_variants"), "full"),
+        "status": item.get("status"),
+        "uploaded_at": item.get("uploaded_at")
+    }
 
+    # Other approved offers of the shop: one (shop_id, status, uploaded_at) range scan
+    other_offers = []
+    for off in shop_offer_items(shop_id, status="approved"):
         if off.get("offer_id") == offer_id:
-            main_offer = {
-                "offer_id": off.get("offer_id"),
-                "title": off.get("title"),
-                "percentage": off.get("percentage"),
-                "fee": off.get("fee"),
-                "description": off.get("description"),
-                "start_date": off.get("start_date"),
-                "end_date": off.get("end_date"),
-                "media_type": off.get("media_type"),
-                "media_path": off.get("media_path"),
-                "status": off.get("status"),
-                "uploaded_at": off.get("uploaded_at")
-            }
-        else:
-            if off.get("status") == "approved":
-                other_offers.append({
-                    "offer_id": off.get("offer_id"),
-                    "title": off.get("title"),
-                    "percentage": off.get("percentage"),
-                    "fee": off.get("fee"),
-                    "start_date": off.get("start_date"),
-                    "end_date": off.get("end_date"),
-                    "media_type": off.get("media_type"),
-                    "media_path": off.get("media_path")
-                })
-
-    if not main_offer:
-        return {
-            "status": False,
-            "message": "Offer not found"
-        }
+            continue
+        other_offers.append({
+            "offer_id": off.get("offer_id"),
+            "title": off.get("title"),
+            "title_ta": off.get("title_ta"),
+            "percentage": off.get("percentage"),
+            "fee": off.get("fee"),
+            "start_date": off.get("start_date"),
+            "end_date": off.get("end_date"),
+            "media_type": off.get("media_type"),
+            "media_path": sized(off.get("media_path"), off.get("media_variants"), "card")
+        })
 
-    shop_safe = safe(shop)
-    city_safe = safe(city)
+    # Stored Tamil renditions first; translate_to_ta_logic only pays for the rest
+    shop_safe = project_ta(safe(shop), SHOP_TA_FIELDS, lang)
+    city_safe = project_ta(safe(city), CITY_TA_FIELDS, lang)
+    project_ta(main_offer, OFFER_TA_FIELDS, lang)
+    for o in other_offers:
+        project_ta(o, OFFER_TA_FIELDS, lang)
 
     # ---------------- TRANSLATION ----------------
     if lang == "ta":
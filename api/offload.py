@@ -0,0 +1,21 @@
+import os
+import asyncio
+import contextvars
+from functools import partial
+from concurrent.futures import ThreadPoolExecutor
+
+# ==================================================
+# BLOCKING I/O OFFLOAD
+# async handlers hand their disk / pymongo work to this bounded pool so the
+# event loop keeps serving other requests meanwhile. The caller's context
+# (e.g. the translation deadline in api/translator.py) goes with the call.
+# ==================================================
+IO_WORKERS = int(os.getenv("IO_WORKERS", "16"))
+
+_io_pool = ThreadPoolExecutor(max_workers=IO_WORKERS, thread_name_prefix="blocking-io")
+
+
+async def run_io(fn, *args, **kwargs):
+    ctx = contextvars.copy_context()
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_io_pool, partial(ctx.run, fn, *args, **kwargs))
@@ -1,17 +1,9 @@
 from fastapi import APIRouter, HTTPException, Form
 from datetime import datetime, timedelta
 import random
-import smtplib
-from email.mime.multipart import MIMEMultipart
-import os
-from datetime import datetime, timedelta
 from api.common_urldb import db
-from api.mail_settings import EMAILADDRESS
 from api.shop_owner_details import hash_password
-from api.mail_settings import EMAILADDRESS  # admin/system mail
-from datetime import datetime, timedelta
-from sendgrid import SendGridAPIClient
-from sendgrid.helpers.mail import Mail  
+from api.email_outbox import enqueue_mail
 
 router = APIRouter()
 col_user = db["user"]
@@ -25,11 +17,6 @@ def generate_otp():
     return str(random.randint(100000, 999999))
 
 def send_otp_email(to_email: str, otp: str):
-    SENDGRID_API_KEY = os.getenv("SENDGRID_API_KEY")
-
-    if not SENDGRID_API_KEY:
-        raise RuntimeError("SENDGRID_API_KEY missing")
-
     subject = "Password Reset OTP – RK Dial"
 
     body = f"""
@@ -56,20 +43,8 @@ def send_otp_email(to_email: str, otp: str):
     </html>
     """
 
-    message = Mail(
-        from_email=EMAILADDRESS,   # ADMIN mail (verified in SendGrid)
-        to_emails=to_email,        # USER mail
-        subject=subject,
-        html_content=body
-    )
-
-    try:
-        sg = SendGridAPIClient(SENDGRID_API_KEY)
-        response = sg.send(message)
-        print("✅ OTP mail accepted by SendGrid:", response.status_code)  # 202
-    except Exception as e:
-        print("❌ OTP SendGrid error:", repr(e))
-        raise
+    # Queued; the outbox dispatcher sends it right away (api/email_outbox.py)
+    enqueue_mail(to_email, subject, body)
 
 
 
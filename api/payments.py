@@ -13,6 +13,9 @@ import hashlib
 from api.plan_expiry_mail import send_payment_success_mail
 from api.plan_config import PLAN_CONFIG
 from api.notifications_setting import send_user_notification
+from api.offload import run_io
+from api.entitlements import get_entitlement, refresh_plan, reserve
+from api.webhook_inbox import record_event, signature_ok, run_once
 
 load_dotenv(override=True)
 
@@ -31,8 +34,6 @@ client = razorpay.Client(
 router = APIRouter()
 
 col_payments = db["payments"]
-col_shop = db["shop"]
-col_offer = db["offers"]
 col_notifications = db["notifications"]
 
 ALLOWED_STATUS = ["success", "failed", "pending"]
@@ -44,18 +45,6 @@ def normalize_user_id(user_id):
     return ObjectId(user_id)
 
 
-def get_active_plan(user_id: str):
-    payment = col_payments.find_one(
-        {
-            "user_id": user_id,
-            "status": "success",
-            "expiry_date": {"$gt": datetime.utcnow()}
-        },
-        sort=[("created_at", -1)]
-    )
-    return payment
-
-
 # PAYMENT API ENDPOINTS
 @router.post("/payment/create-order/")
 def create_order(
@@ -166,6 +155,7 @@ def save_payment(
         },
         upsert=True
     )
+    refresh_plan(user_id)
 
     # Trigger Actions on Success
     if status == "success":
@@ -231,19 +221,27 @@ async def razorpay_webhook(request: Request):
     payload = await request.body()
     received_signature = request.headers.get("X-Razorpay-Signature")
 
-    expected_signature = hmac.new(
-        RAZORPAY_WEBHOOK_SECRET.encode(),
-        payload,
-        hashlib.sha256
-    ).hexdigest()
-
-    if received_signature != expected_signature:
+    if not signature_ok(payload, received_signature, RAZORPAY_WEBHOOK_SECRET):
         raise HTTPException(status_code=400, detail="Invalid webhook signature")
 
-    data = await request.json()
-    event = data.get("event")
+    # Store and acknowledge; the inbox worker applies it (api/webhook_inbox.py).
+    # A redelivered event id is acknowledged without being stored again.
+    try:
+        await run_io(record_event, payload, request.headers.get("X-Razorpay-Event-Id"))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"status": "ok"}
 
 
+def process_webhook_event(data: dict, event_id: str = None):
+    """
+    Apply one Razorpay event. Safe to run again for the same event: expiry
+    dates come from the event's own timestamp, and notifications / mails
+    go out once per event through the inbox (run_once).
+    """
+    event = data.get("event")
+    event_time = datetime.utcfromtimestamp(data["created_at"]) if data.get("created_at") else datetime.utcnow()
+
     if event == "payment.captured":
         payment_entity = data["payload"]["payment"]["entity"]
         payment_id = payment_entity["id"]
@@ -273,13 +271,15 @@ async def razorpay_webhook(request: Request):
             },
             upsert=True
         )
+        if existing and existing.get("user_id"):
+            refresh_plan(existing["user_id"])
 
         # SEND NOTIFICATION & EMAIL IF NOT DONE
         if existing and existing.get("user_id") and not mail_already_sent:
             uid = normalize_user_id(existing["user_id"])
 
             # A) In-App Notification
-            send_user_notification(
+            run_once(event_id, "notify", send_user_notification,
                 user_id=uid,
                 notif_type="payment_success",
                 title="Payment Successful",
@@ -287,21 +287,18 @@ async def razorpay_webhook(request: Request):
                 related_id=payment_id
             )
 
-            # B) Email
-            try:
-                send_payment_success_mail(
-                    user_id=uid,
-                    plan_name=existing.get("plan_name", "Plan"),
-                    amount=amount,
-                    expiry_date=existing.get("expiry_date")
-                )
-                # Mark as sent
-                col_payments.update_one(
-                    {"payment_id": payment_id},
-                    {"$set": {"payment_success_mail_sent": True}}
-                )
-            except Exception as e:
-                print(f"❌ Webhook mail error: {e}")
+            # B) Email; a failed send raises, so the inbox retries the event
+            run_once(event_id, "mail", send_payment_success_mail,
+                user_id=uid,
+                plan_name=existing.get("plan_name", "Plan"),
+                amount=amount,
+                expiry_date=existing.get("expiry_date")
+            )
+            # Mark as sent
+            col_payments.update_one(
+                {"payment_id": payment_id},
+                {"$set": {"payment_success_mail_sent": True}}
+            )
 
 
     elif event == "subscription.activated":
@@ -318,17 +315,18 @@ async def razorpay_webhook(request: Request):
                         "subscription_id": sub["id"],
                         "subscription_status": "active",
                         "plan_name": plan,
-                        "expiry_date": datetime.utcnow() + timedelta(
+                        "expiry_date": event_time + timedelta(
                             days=PLAN_CONFIG[plan]["days"]
                         ),
                         "updated_at": datetime.utcnow()
                     }
                 }
             )
+            refresh_plan(user_id)
 
             # Notification ONLY (Setup event)
             uid = normalize_user_id(user_id)
-            send_user_notification(
+            run_once(event_id, "notify", send_user_notification,
                 user_id=uid,
                 notif_type="subscription_active",
                 title="Autopay Activated",
@@ -346,24 +344,26 @@ async def razorpay_webhook(request: Request):
         if payment:
             plan = payment["plan_name"]
             user_id = payment.get("user_id")
-            new_expiry = datetime.utcnow() + timedelta(days=PLAN_CONFIG[plan]["days"])
+            new_expiry = event_time + timedelta(days=PLAN_CONFIG[plan]["days"])
 
+            # $max: a late or replayed older invoice never shortens the plan
             col_payments.update_one(
                 {"subscription_id": sub_id},
                 {
                     "$set": {
                         "status": "success",
-                        "expiry_date": new_expiry,
                         "updated_at": datetime.utcnow()
-                    }
+                    },
+                    "$max": {"expiry_date": new_expiry}
                 }
             )
 
             if user_id:
+                refresh_plan(user_id)
                 uid = normalize_user_id(user_id)
 
                 # A) In-App Notification
-                send_user_notification(
+                run_once(event_id, "notify", send_user_notification,
                     user_id=uid,
                     notif_type="subscription_renewed",
                     title="Plan Renewed",
@@ -371,16 +371,14 @@ async def razorpay_webhook(request: Request):
                     related_id=invoice["id"]
                 )
 
-                # B) Email (Receipt for renewal)
-                try:
-                    send_payment_success_mail(
-                        user_id=uid,
-                        plan_name=plan,
-                        amount=amount_paid,
-                        expiry_date=new_expiry
-                    )
-                except Exception as e:
-                    print(f"❌ Renewal mail error: {e}")
+                # B) Email (Receipt for renewal); a failed send raises,
+                # so the inbox retries the event
+                run_once(event_id, "mail", send_payment_success_mail,
+                    user_id=uid,
+                    plan_name=plan,
+                    amount=amount_paid,
+                    expiry_date=new_expiry
+                )
 
 
     elif event == "subscription.cancelled":
@@ -400,7 +398,7 @@ async def razorpay_webhook(request: Request):
 
         if payment and payment.get("user_id"):
             uid = normalize_user_id(payment["user_id"])
-            send_user_notification(
+            run_once(event_id, "notify", send_user_notification,
                 user_id=uid,
                 notif_type="subscription_cancelled",
                 title="Autopay Cancelled",
@@ -408,19 +406,17 @@ async def razorpay_webhook(request: Request):
                 related_id=sub["id"]
             )
 
-    return {"status": "ok"}
-
 
 @router.get("/my-plan/")
 def my_plan(user_id: str = Depends(verify_token)):
-    payment = get_active_plan(user_id)
-    if not payment:
+    ent = get_entitlement(user_id)
+    if not ent.get("plan") or not ent.get("expiry_date") or ent["expiry_date"] <= datetime.utcnow():
         return {"status": True, "subscribed": False}
 
-    plan = payment["plan_name"]
+    plan = ent["plan"]
     limits = PLAN_CONFIG[plan]
-    shop_used = col_shop.count_documents({"user_id": user_id})
-    offer_used = col_offer.count_documents({"user_id": user_id})
+    shop_used = ent["shops_used"]
+    offer_used = ent["offers_used"]
 
     return {
         "status": True,
@@ -433,31 +429,21 @@ def my_plan(user_id: str = Depends(verify_token)):
             "shops_left": max(0, limits["shops"] - shop_used),
             "offers_left": max(0, limits["offers"] - offer_used)
         },
-        "expiry_date": payment.get("expiry_date")
+        "expiry_date": ent["expiry_date"]
     }
 
 
 # ==================================================
 # HELPER LIMIT CHECKS
+# Both take the slot(s) atomically (api/entitlements.py); callers give
+# them back with entitlements.release() if the create does not happen.
 # ==================================================
 def check_shop_limit(user_id: str):
-    payment = get_active_plan(user_id)
-    if not payment:
-        raise HTTPException(403, "Please subscribe to add shops")
-    plan = payment["plan_name"]
-    limit = PLAN_CONFIG[plan]["shops"]
-    if col_shop.count_documents({"user_id": user_id}) >= limit:
-        raise HTTPException(403, f"{plan.capitalize()} plan allows only {limit} shops")
-
-
-def check_offer_limit(user_id: str):
-    payment = get_active_plan(user_id)
-    if not payment:
-        raise HTTPException(403, "Please subscribe to add offers")
-    plan = payment["plan_name"]
-    limit = PLAN_CONFIG[plan]["offers"]
-    if col_offer.count_documents({"user_id": user_id}) >= limit:
-        raise HTTPException(403, f"{plan.capitalize()} plan allows only {limit} offers")
+    reserve(user_id, "shops")
+
+
+def check_offer_limit(user_id: str, n: int = 1):
+    reserve(user_id, "offers", n)
 
 
 # ==================================================
@@ -1,13 +1,12 @@
+import time
 from datetime import datetime, timedelta
 from bson import ObjectId
 from api.common_urldb import db
+from api.email_outbox import enqueue_mail, enqueue_many
 
 import smtplib
 from email.mime.text import MIMEText
 
-from sendgrid import SendGridAPIClient
-from sendgrid.helpers.mail import Mail
-import os
 
 from api.mail_settings import EMAILADDRESS, EMAILPASSWORD  # EMAILPASSWORD kept but NOT USED
 
@@ -27,38 +26,23 @@ SMTP_PORT = 587
 
 
 def send_mail(to_email: str, subject: str, body: str):
-    try:
-        SENDGRID_API_KEY = os.environ.get("SENDGRID_API_KEY")
-        # ---- OLD SMTP CODE (KEPT AS COMMENT) ----
-        """
-        msg = MIMEText(body, "html")
-        msg["From"] = FROM_EMAIL
-        msg["To"] = to_email
-        msg["Subject"] = subject
-
-        server = smtplib.SMTP(SMTP_SERVER, SMTP_PORT)
-        server.starttls()
-        server.login(FROM_EMAIL, APP_PASSWORD)
-        server.send_message(msg)
-        server.quit()
-        """
-
-        # ---- NEW SENDGRID API CODE ----
-        message = Mail(
-            from_email=FROM_EMAIL,
-            to_emails=to_email,
-            subject=subject,
-            html_content=body
-        )
-
-        sg = SendGridAPIClient(SENDGRID_API_KEY)
-        sg.send(message)
-
-      
-        print("DEBUG SENDGRID_API_KEY EXISTS =", bool(os.environ.get("SENDGRID_API_KEY")))
+    """Queue one mail; an enqueue failure is raised so the caller can retry."""
+    # ---- OLD SMTP CODE (KEPT AS COMMENT) ----
+    """
+    msg = MIMEText(body, "html")
+    msg["From"] = FROM_EMAIL
+    msg["To"] = to_email
+    msg["Subject"] = subject
+
+    server = smtplib.SMTP(SMTP_SERVER, SMTP_PORT)
+    server.starttls()
+    server.login(FROM_EMAIL, APP_PASSWORD)
+    server.send_message(msg)
+    server.quit()
+    """
 
-    except Exception as e:
-        print("❌ Mail error:", e)
+    # ---- SENDGRID, VIA THE OUTBOX (api/email_outbox.py) ----
+    enqueue_mail(to_email, subject, body)
 
 
 
@@ -124,7 +108,10 @@ def send_payment_success_mail(user_id, plan_name, amount, expiry_date):
 
 
 # EXPIRY MAIL
-def send_expiry_mail(to_email, plan_name, expiry_date, when):
+# One template per reminder; plan and date are SendGrid substitutions, so a
+# sweep's mails share subject + html and the outbox batches them.
+def expiry_mail_template(when):
+    """(subject, html) with -plan- / -expiry- tags."""
     if when == "2days":
         subject = "Your Plan Will Expire in 2 Days"
         line = "will expire in 2 days"
@@ -138,8 +125,8 @@ def send_expiry_mail(to_email, plan_name, expiry_date, when):
         <p>Hello,</p>
 
         <p>
-          Your <b>{plan_name.upper()}</b> plan {line}.<br/>
-          Expiry Date: <b>{expiry_date.strftime('%d-%m-%Y')}</b>
+          Your <b>-plan-</b> plan {line}.<br/>
+          Expiry Date: <b>-expiry-</b>
         </p>
 
         <p>Please renew your plan to continue uninterrupted service.</p>
@@ -148,68 +135,88 @@ def send_expiry_mail(to_email, plan_name, expiry_date, when):
       </body>
     </html>
     """
+    return subject, body
+
+
+def expiry_substitutions(plan_name, expiry_date):
+    return {"-plan-": plan_name.upper(), "-expiry-": expiry_date.strftime('%d-%m-%Y')}
 
-    send_mail(to_email, subject, body)
 
+def send_expiry_mail(to_email, plan_name, expiry_date, when):
+    subject, body = expiry_mail_template(when)
+    enqueue_mail(to_email, subject, body, expiry_substitutions(plan_name, expiry_date))
+
+
+# ==================================================
+# CRON / EXPIRY SWEEP
+# Per reminder: one range query on (status, expiry_date) for the day's
+# window, skipping rows already flagged; one $in user fetch; one
+# insert_many into the email outbox, which sends them as batched, paced
+# SendGrid requests with retries. Each reminder is keyed per payment (so
+# an hourly sweep never queues it twice) and the outbox sets the flag
+# only once SendGrid accepted the mail; a reminder that ran out of
+# retries is queued again by the next sweep.
+# Cost follows the number of plans expiring, not the payment history.
+# ==================================================
+REMINDERS = {
+    # when -> (days ahead, flag)
+    "2days": (2, "expiry_mail_2days_sent"),
+    "today": (0, "expiry_mail_today_sent"),
+}
+
+
+def _day_window(day):
+    start = day.replace(hour=0, minute=0, second=0, microsecond=0)
+    return start, start + timedelta(days=1) - timedelta(microseconds=1)
+
+
+def _as_oid(user_id):
+    try:
+        return ObjectId(user_id) if isinstance(user_id, str) else user_id
+    except Exception:
+        return None
+
+
+def sweep_reminder(when, now) -> dict:
+    days, flag = REMINDERS[when]
+    start, end = _day_window(now + timedelta(days=days))
+
+    rows = list(col_payments.find(
+        {"status": "success", "expiry_date": {"$gte": start, "$lte": end}, flag: {"$ne": True}},
+        {"user_id": 1, "plan_name": 1, "expiry_date": 1}
+    ))
 
-# CRON / EXPIRY CHECK
-def check_plan_expiry_and_send_mail():
+    uids = {_as_oid(r.get("user_id")) for r in rows} - {None}
+    emails = {u["_id"]: u.get("email") for u in col_users.find({"_id": {"$in": list(uids)}}, {"email": 1})}
+
+    subject, body = expiry_mail_template(when)
+    mails = []
+    for r in rows:
+        email = emails.get(_as_oid(r.get("user_id")))
+        if email:
+            mails.append((email, subject, body, expiry_substitutions(r["plan_name"], r["expiry_date"]),
+                          f"{flag}:{r['_id']}", {"collection": "payments", "_id": r["_id"], "set": {flag: True}}))
+
+    queued = enqueue_many(mails)
+    return {"scanned": len(rows), "queued": queued, "in_outbox": len(mails) - queued,
+            "skipped": len(rows) - len(mails)}
+
+
+def check_plan_expiry_and_send_mail() -> dict:
+    """One sweep over both reminders; returns the run summary."""
+    started = time.perf_counter()
     now = datetime.utcnow()
+    summary = {"scanned": 0, "queued": 0, "in_outbox": 0, "skipped": 0}
+
+    for when in REMINDERS:
+        for key, value in sweep_reminder(when, now).items():
+            summary[key] += value
 
-    start_today = now.replace(hour=0, minute=0, second=0, microsecond=0)
-    end_today = now.replace(hour=23, minute=59, second=59, microsecond=999999)
-
-    start_2days = (now + timedelta(days=2)).replace(hour=0, minute=0, second=0, microsecond=0)
-    end_2days = (now + timedelta(days=2)).replace(hour=23, minute=59, second=59, microsecond=999999)
-
-    payments = col_payments.find({"status": "success"})
-
-    for pay in payments:
-        user_id = pay.get("user_id")
-        if not user_id:
-            continue
-
-        try:
-            uid = ObjectId(user_id) if isinstance(user_id, str) else user_id
-        except:
-            continue
-
-        user = col_users.find_one({"_id": uid})
-        if not user or not user.get("email"):
-            continue
-
-        email = user["email"]
-
-        if (
-            start_2days <= pay["expiry_date"] <= end_2days
-            and not pay.get("expiry_mail_2days_sent")
-        ):
-            send_expiry_mail(
-                email,
-                pay["plan_name"],
-                pay["expiry_date"],
-                "2days"
-            )
-
-            col_payments.update_one(
-                {"_id": pay["_id"]},
-                {"$set": {"expiry_mail_2days_sent": True}}
-            )
-
-        if (
-            start_today <= pay["expiry_date"] <= end_today
-            and not pay.get("expiry_mail_today_sent")
-        ):
-            send_expiry_mail(
-                email,
-                pay["plan_name"],
-                pay["expiry_date"],
-                "today"
-            )
-
-            col_payments.update_one(
-                {"_id": pay["_id"]},
-                {"$set": {"expiry_mail_today_sent": True}}
-            )
+    summary["duration_ms"] = round((time.perf_counter() - started) * 1000, 1)
+    print("✅ Plan expiry sweep:", summary)
+    return summary
 
 
+if __name__ == "__main__":
+    # python -m api.plan_expiry_mail
+    check_plan_expiry_and_send_mail()
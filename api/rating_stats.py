@@ -0,0 +1,115 @@
+from bson import ObjectId
+from pymongo import UpdateOne
+from api.common_urldb import db
+
+col_shop = db["shop"]
+col_reviews = db["reviews"]
+
+STARS = (1, 2, 3, 4, 5)
+
+# avg_rating is derived from the counters already on the document, so it is
+# always consistent with the latest $inc even when two reviews race.
+REFRESH_AVG = [{
+    "$set": {
+        "avg_rating": {
+            "$cond": [
+                {"$gt": ["$rating_count", 0]},
+                {"$divide": ["$rating_sum", "$rating_count"]},
+                0
+            ]
+        }
+    }
+}]
+
+
+def shop_filter(shop_id):
+    if ObjectId.is_valid(str(shop_id)):
+        return {"_id": ObjectId(shop_id)}
+    return {"_id": shop_id}
+
+
+# ---------------- INCREMENTAL UPDATE ----------------
+def apply_review_rating(shop_id, rating: int, delta: int = 1):
+    """
+    delta=1 when a review is added, delta=-1 when it is deleted.
+    """
+    inc = {
+        "rating_sum": int(rating) * delta,
+        "rating_count": delta
+    }
+    if rating in STARS:
+        inc[f"rating_hist.{rating}"] = delta
+
+    query = shop_filter(shop_id)
+    col_shop.update_one(query, {"$inc": inc})
+    col_shop.update_one(query, REFRESH_AVG)
+
+
+def rating_summary(shop: dict):
+    count = shop.get("rating_count", 0) or 0
+    hist = shop.get("rating_hist") or {}
+    return {
+        "avg_rating": round(shop.get("avg_rating", 0) or 0, 1),
+        "reviews_count": count,
+        "histogram": {str(s): hist.get(str(s), 0) for s in STARS}
+    }
+
+
+# ---------------- BACKFILL / REBUILD ----------------
+def _empty_stats():
+    return {
+        "rating_sum": 0,
+        "rating_count": 0,
+        "rating_hist": {str(s): 0 for s in STARS},
+        "avg_rating": 0
+    }
+
+
+def rebuild_rating_stats():
+    """
+    Recompute rating_sum / rating_count / rating_hist / avg_rating for every
+    shop from the reviews collection. The aggregates are computed first and
+    each shop gets a single $set, so search never sees a zeroed catalogue;
+    shops without reviews are set to 0.
+    """
+    stats = col_reviews.aggregate([
+        {"$group": {
+            "_id": {"shop_id": "$shop_id", "rating": "$rating"},
+            "count": {"$sum": 1}
+        }},
+        {"$group": {
+            "_id": "$_id.shop_id",
+            "buckets": {"$push": {"rating": "$_id.rating", "count": "$count"}}
+        }}
+    ])
+
+    # Reviews keep shop_id as a string, older data as ObjectId
+    by_shop = {}
+    for row in stats:
+        entry = by_shop.setdefault(str(row["_id"]), _empty_stats())
+        for b in row["buckets"]:
+            rating = b["rating"] or 0
+            entry["rating_sum"] += rating * b["count"]
+            entry["rating_count"] += b["count"]
+            if rating in STARS:
+                entry["rating_hist"][str(rating)] += b["count"]
+
+    ops = []
+    for shop in col_shop.find({}, {"_id": 1}):
+        entry = by_shop.get(str(shop["_id"])) or _empty_stats()
+        count = entry["rating_count"]
+        entry["avg_rating"] = entry["rating_sum"] / count if count else 0
+        ops.append(UpdateOne({"_id": shop["_id"]}, {"$set": entry}))
+
+        if len(ops) >= 500:
+            col_shop.bulk_write(ops, ordered=False)
+            ops = []
+
+    if ops:
+        col_shop.bulk_write(ops, ordered=False)
+
+
+if __name__ == "__main__":
+    # python -m api.rating_stats
+    rebuild_rating_stats()
+    print("✅ Shop rating stats rebuilt")
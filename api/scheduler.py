@@ -0,0 +1,223 @@
+import os
+import time
+import uuid
+import socket
+import threading
+from datetime import datetime, timedelta
+from pymongo.errors import DuplicateKeyError
+from api.common_urldb import db
+
+# ==================================================
+# PERIODIC JOBS
+# Every API process runs this scheduler; a job runs in exactly one of them.
+# scheduler_leases: {_id: job, owner, expires_at} - taken with a conditional
+#   upsert (held lease -> duplicate key), dropped after the run, and
+#   TTL-indexed so a crashed owner's lease disappears by itself.
+# scheduler_jobs: {_id: job, next_run, last_run, last_duration_ms,
+#   last_outcome, last_error, last_result, runs, failures, owner}
+# Schedules: every=<seconds> or cron="m h dom mon dow" (UTC; *, */n, a-b, a,b).
+#   As in standard cron, when both dom and dow are restricted (neither
+#   starts with *) a day matching either one fires.
+# ==================================================
+TICK = 20                   # seconds between due checks
+DEFAULT_LEASE = timedelta(minutes=30)
+OWNER = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:6]}"
+
+col_jobs = db["scheduler_jobs"]
+col_leases = db["scheduler_leases"]
+
+JOBS = {}       # name -> {"fn", "every", "cron", "lease"}
+_runner = None
+
+
+# ---------------- CRON ----------------
+CRON_RANGES = ((0, 59), (0, 23), (1, 31), (1, 12), (0, 6))
+
+
+def _cron_field(field: str, lo: int, hi: int) -> set:
+    values = set()
+    for part in field.split(","):
+        part, _, step = part.partition("/")
+        if part == "*":
+            start, end = lo, hi
+        elif "-" in part:
+            start, end = (int(x) for x in part.split("-"))
+        else:
+            start = end = int(part)
+            if step:
+                end = hi
+        values.update(range(start, end + 1, int(step) if step else 1))
+    if not values or min(values) < lo or max(values) > hi:
+        raise ValueError(f"Bad cron field {field!r}")
+    return values
+
+
+def parse_cron(expr: str):
+    fields = expr.split()
+    if len(fields) != 5:
+        raise ValueError(f"Cron needs 5 fields: {expr!r}")
+    return [_cron_field(f, lo, hi) for f, (lo, hi) in zip(fields, CRON_RANGES)]
+
+
+def cron_next(expr: str, after: datetime) -> datetime:
+    """First minute strictly after `after` matching expr (dow: 0 = Sunday)."""
+    minutes, hours, days, months, weekdays = parse_cron(expr)
+    _, _, dom, _, dow = expr.split()
+    either = not dom.startswith("*") and not dow.startswith("*")
+
+    def day_matches(t):
+        in_dom, in_dow = t.day in days, (t.weekday() + 1) % 7 in weekdays
+        return in_dom or in_dow if either else in_dom and in_dow
+
+    t = after.replace(second=0, microsecond=0) + timedelta(minutes=1)
+    limit = t + timedelta(days=366 * 4)
+    while t < limit:
+        if t.month not in months or not day_matches(t):
+            t = t.replace(hour=0, minute=0) + timedelta(days=1)
+        elif t.hour not in hours:
+            t = t.replace(minute=0) + timedelta(hours=1)
+        elif t.minute not in minutes:
+            t += timedelta(minutes=1)
+        else:
+            return t
+    raise ValueError(f"Cron never fires: {expr!r}")
+
+
+# ---------------- REGISTRY ----------------
+def register(name: str, fn, every: int = None, cron: str = None, lease: timedelta = DEFAULT_LEASE):
+    """`lease` must outlast the job's longest run."""
+    if (every is None) == (cron is None):
+        raise ValueError("Give exactly one of every / cron")
+    if cron:
+        parse_cron(cron)
+    JOBS[name] = {"fn": fn, "every": every, "cron": cron, "lease": lease}
+
+
+def _next_run(job, after: datetime) -> datetime:
+    if job["cron"]:
+        return cron_next(job["cron"], after)
+    return after + timedelta(seconds=job["every"])
+
+
+# ---------------- LEASE ----------------
+def _acquire(name, lease: timedelta) -> bool:
+    now = datetime.utcnow()
+    try:
+        col_leases.update_one(
+            {"_id": name, "expires_at": {"$lt": now}},
+            {"$set": {"owner": OWNER, "expires_at": now + lease}},
+            upsert=True
+        )
+        return True
+    except DuplicateKeyError:
+        return False        # someone else holds it
+
+
+def _release(name):
+    col_leases.delete_one({"_id": name, "owner": OWNER})
+
+
+# ---------------- RUN ----------------
+def run_job(name, force: bool = False) -> bool:
+    """Run `name` here if it is due (or forced) and the lease is free. True if it ran."""
+    job = JOBS[name]
+    now = datetime.utcnow()
+    state = col_jobs.find_one({"_id": name}, {"next_run": 1}) or {}
+    if not force and state.get("next_run") and state["next_run"] > now:
+        return False
+    if not _acquire(name, job["lease"]):
+        return False
+
+    try:
+        # Re-check under the lease: another process may have just finished it
+        state = col_jobs.find_one({"_id": name}, {"next_run": 1}) or {}
+        if not force and state.get("next_run") and state["next_run"] > datetime.utcnow():
+            return False
+
+        started, started_at = time.perf_counter(), datetime.utcnow()
+        outcome, error, result = "success", None, None
+        try:
+            result = job["fn"]()
+        except Exception as e:
+            outcome, error = "error", repr(e)
+            print(f"❌ Scheduled job {name} failed:", e)
+
+        col_jobs.update_one({"_id": name}, {
+            "$set": {
+                "next_run": _next_run(job, started_at),
+                "last_run": started_at,
+                "last_duration_ms": round((time.perf_counter() - started) * 1000, 1),
+                "last_outcome": outcome,
+                "last_error": error,
+                "last_result": result if isinstance(result, (int, float, str, dict, type(None))) else str(result),
+                "owner": OWNER,
+            },
+            "$inc": {"runs": 1, "failures": int(outcome == "error")}
+        }, upsert=True)
+        return True
+    finally:
+        _release(name)
+
+
+def _loop():
+    while True:
+        for name in list(JOBS):
+            try:
+                run_job(name)
+            except Exception as e:
+                # Never let one bad tick end the thread for every job
+                print(f"❌ Scheduler error ({name}):", repr(e))
+        time.sleep(TICK)
+
+
+def start_scheduler():
+    global _runner
+    if _runner is None:
+        # First run of a new job: one schedule step from now
+        now = datetime.utcnow()
+        for name, job in JOBS.items():
+            col_jobs.update_one({"_id": name}, {"$setOnInsert": {"next_run": _next_run(job, now)}}, upsert=True)
+        _runner = threading.Thread(target=_loop, name="scheduler", daemon=True)
+        _runner.start()
+
+
+def scheduler_status():
+    now = datetime.utcnow()
+    states = {d["_id"]: d for d in col_jobs.find({"_id": {"$in": list(JOBS)}})}
+    leases = {d["_id"]: d for d in col_leases.find({"_id": {"$in": list(JOBS)}, "expires_at": {"$gt": now}})}
+    jobs = []
+    for name, job in JOBS.items():
+        state = states.get(name, {})
+        lease = leases.get(name)
+        jobs.append({
+            "name": name,
+            "schedule": job["cron"] or f"every {job['every']}s",
+            "running_on": lease["owner"] if lease else None,
+            **{k: state.get(k) for k in ("next_run", "last_run", "last_duration_ms", "last_outcome",
+                                         "last_error", "last_result", "runs", "failures")},
+        })
+    return {"owner": OWNER, "jobs": jobs}
+
+
+# ---------------- JOBS ----------------
+def _register_defaults():
+    from api.plan_expiry_mail import check_plan_expiry_and_send_mail
+    from api.city_slides import rebuild_all
+    from api.blobs import sweep_blobs
+    from api.offer_items import backfill_offer_items, RESYNC_INTERVAL
+    from api.tamil_fields import backfill_tamil_fields
+
+    # Hourly, so a failed reminder is retried within its day
+    register("plan_expiry_sweep", check_plan_expiry_and_send_mail, cron="5 * * * *")
+    # The per-city slide read model: picks up changes made outside the API
+    register("city_slides_warm", rebuild_all, every=9 * 60, lease=timedelta(minutes=9))
+    # offer_items read model vs offers edited outside the API
+    register("offer_items_resync", backfill_offer_items, every=RESYNC_INTERVAL, lease=timedelta(minutes=10))
+    # Retention: unreferenced media past the grace period
+    register("blob_sweep", sweep_blobs, cron="35 * * * *")
+    # Stored Tamil renditions for documents written without them. Nightly
+    # (02:45 IST): translator calls make it slow (api/tamil_fields.py)
+    register("tamil_backfill", backfill_tamil_fields, cron="15 21 * * *", lease=timedelta(hours=3))
+
+
+_register_defaults()
@@ -1,10 +1,14 @@
-from fastapi import APIRouter, Query
+from fastapi import APIRouter, Query, HTTPException
 from bson import ObjectId
 from api.common_urldb import db
 import re
+import json
+import base64
 
-from api.translator import en_to_ta, ta_to_en
-from api.cache import get_cached, set_cache
+from api.translator import en_to_ta, ta_to_en, en_to_ta_many, collect_strings, map_strings, has_tamil, phonetic_tamil
+from api.tamil_fields import project_ta, stored_ta, ta_key, SHOP_TA_FIELDS, CITY_TA_FIELDS, CATEGORY_TA_FIELDS
+from api.images import present_shop_images
+from api.catalog import get_city, resolve_category, cities_by_name, search_categories
 
 router = APIRouter()
 
@@ -25,33 +29,6 @@ def safe(x):
     return x
 
 
-LETTER_MAP = {
-    "A": "ஏ", "B": "பி", "C": "சி", "D": "டி", "E": "ஈ",
-    "F": "எஃப்", "G": "ஜி", "H": "எச்", "I": "ஐ",
-    "J": "ஜே", "K": "கே", "L": "எல்", "M": "எம்",
-    "N": "என்", "O": "ஓ", "P": "பி", "Q": "க்யூ",
-    "R": "ஆர்", "S": "எஸ்", "T": "டி", "U": "யூ",
-    "V": "வி", "W": "டபிள்யூ", "X": "எக்ஸ்",
-    "Y": "வை", "Z": "ஸெட்"
-}
-
-
-def phonetic_tamil(text: str):
-    if not text:
-        return text
-
-    words = text.split()
-    out = []
-
-    for w in words:
-        if w.isalpha() and len(w) <= 5:
-            out.append(" ".join(LETTER_MAP.get(c.upper(), c) for c in w))
-        else:
-            out.append(w)
-
-    return " ".join(out)
-
-
 # ---------------- TRANSLATION SAFETY ----------------
 def is_base64(text: str) -> bool:
     return len(text) > 200 and re.fullmatch(r"[A-Za-z0-9+/=]+", text) is not None
@@ -76,32 +53,113 @@ def translate_text_en_to_ta(text: str):
     if not should_translate(text):
         return text
 
-    cached = get_cached(text)
-    if cached:
-        return cached
+    # en_to_ta is backed by the shared two-tier cache (api/cache.py)
+    return en_to_ta(text)
 
-    ta = en_to_ta(text)
-    set_cache(text, ta)
-    return ta
 
+DICT_SKIP_KEYS = ("shop_name", "category_image")
 
-def translate_dict(obj):
-    if isinstance(obj, dict):
-        new_obj = {}
-        for k, v in obj.items():
-            if k in ("shop_name", "category_image"):
-                new_obj[k] = v
-            else:
-                new_obj[k] = translate_dict(v)
-        return new_obj
 
-    if isinstance(obj, list):
-        return [translate_dict(i) for i in obj]
+def translate_batch(texts):
+    """{text: tamil} for all translatable texts in one translator call."""
+    return en_to_ta_many([t for t in texts if should_translate(t)])
 
+
+def translate_dict(obj, done=None):
+    """
+    Batched tree translation. `done` lets the caller pass a lookup that
+    already covers the tree (e.g. when it batched extra strings with it).
+    """
     if isinstance(obj, str):
         return translate_text_en_to_ta(obj)
 
-    return obj
+    if done is None:
+        done = translate_batch(collect_strings(obj, DICT_SKIP_KEYS))
+    return map_strings(obj, lambda t: done.get(t, t), DICT_SKIP_KEYS)
+
+
+# ---------------- SEARCH PIPELINE ----------------
+# Cities and categories are resolved from the in-memory reference catalogue
+# (api/catalog.py); ratings come from the aggregates kept on the shop
+# document (api/rating_stats.py). The pipeline itself only touches shop.
+def id_forms(ids):
+    """Shops keep city / category ids as strings, older data as ObjectId."""
+    return list(ids) + [str(x) for x in ids]
+
+
+# By Rating DESC, then Review Count DESC (_id keeps pages stable).
+# Backed by the shop keyset index in api/indexes.py, so the sort streams
+# instead of materialising. Shops without rating fields yet (before
+# python -m api.rating_stats has run) sort as null, after every number.
+SEARCH_SORT = {"avg_rating": -1, "rating_count": -1, "_id": 1}
+
+
+# ---------------- KEYSET CURSOR ----------------
+def encode_cursor(shop: dict) -> str:
+    # The stored values, null included, so the next page resumes exactly
+    # where the sort left off
+    raw = json.dumps([
+        shop.get("avg_rating"),
+        shop.get("rating_count"),
+        str(shop["_id"])
+    ])
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def decode_cursor(cursor: str):
+    try:
+        avg, count, sid = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return avg, count, ObjectId(sid)
+    except Exception:
+        return None
+
+
+def _below(field: str, value) -> dict:
+    """Rows after `value` on a DESC field; null / missing sort below any number."""
+    return {"$or": [{field: {"$lt": value}}, {field: None}]}
+
+
+def after_cursor(avg, count, sid) -> dict:
+    """Rows strictly after (avg, count, _id) in SEARCH_SORT order (None = null)."""
+    branches = []
+    if avg is not None:
+        branches.append(_below("avg_rating", avg))
+    if count is not None:
+        branches.append({"avg_rating": avg, **_below("rating_count", count)})
+    branches.append({"avg_rating": avg, "rating_count": count, "_id": {"$gt": sid}})
+    return {"$or": branches}
+
+
+def build_search_pipeline(name_lower: str, place_lower: str | None, matched_cat_ids: list, after=None):
+    """
+    Match (incl. place filter) + sort on the stored rating fields.
+    Callers append their own paging stages.
+    """
+    match = {
+        "status": "approved",
+        "$or": [
+            {"shop_name": {"$regex": name_lower, "$options": "i"}},
+            {"keywords": {"$regex": name_lower, "$options": "i"}},
+            {"category": {"$in": id_forms(matched_cat_ids)}},
+        ]
+    }
+    clauses = [match]
+
+    # Shops with no city assigned are kept; both branches use the city_id index
+    if place_lower:
+        place_ids = [c["_id"] for c in cities_by_name(place_lower)]
+        clauses.append({"$or": [
+            {"city_id": {"$in": id_forms(place_ids)}},
+            {"city_id": None},
+        ]})
+
+    if after:
+        clauses.append(after_cursor(*after))
+
+    return [
+        {"$match": clauses[0] if len(clauses) == 1 else {"$and": clauses}},
+        {"$sort": SEARCH_SORT},
+    ]
 
 
 # ---------------- SEARCH API ----------------
@@ -111,10 +169,17 @@ def get_static(
         name: str | None = Query(None),
         lang: str = Query("en"),
         page: int = Query(1, ge=1),
-        limit: int = Query(5, ge=1, le=100)
+        limit: int = Query(5, ge=1, le=100),
+        cursor: str | None = Query(None)
 ):
+    """
+    Two paging modes:
+      - page/limit (offset based, kept for old clients)
+      - cursor: pass cursor="" for the first page, then the returned
+        next_cursor. Deep pages cost the same as page 1.
+    """
     if not name:
-        return {"data": [], "page": page, "has_more": False}
+        return {"data": [], "page": page, "has_more": False, "next_cursor": None}
 
     # ---------- INPUT NORMALIZATION ----------
     search_name = name
@@ -128,76 +193,38 @@ def get_static(
     name_lower = search_name.lower()
     place_lower = search_place.lower() if search_place else None
 
-    # ---------- CATEGORY MATCH ----------
-    matched_categories = list(col_category.find({
-        "name": {"$regex": name_lower, "$options": "i"}
-    }))
-    matched_cat_ids = [c["_id"] for c in matched_categories]
-
-    query = {
-        "$and": [
-            {"status": "approved"},
-            {
-                "$or": [
-                    {"shop_name": {"$regex": name_lower, "$options": "i"}},
-                    {"keywords": {"$regex": name_lower, "$options": "i"}},
-                    {"category": {"$in": matched_cat_ids}},
-                    {"category": {"$in": [str(x) for x in matched_cat_ids]}},
-                ]
-            }
-        ]
-    }
-
-    # 1. Fetch ALL Raw Candidates (No Formatting yet)
-    shops = list(col_shop.find(query))
-
-    # 2. Filter & Pre-Calculate Ratings
-    # We do this BEFORE translation to speed up performance significantly
-    valid_candidates = []
-
-    for s in shops:
-        sid = str(s["_id"])
-
-        # Check City Filter First
-        city = None
-        cid = s.get("city_id")
-        if ObjectId.is_valid(str(cid)):
-            city = col_city.find_one({"_id": ObjectId(cid)})
-
-        if place_lower and city:
-            if city.get("city_name", "").lower() != place_lower:
-                continue
-
-        # Get Ratings
-        shop_reviews = list(col_reviews.find({"shop_id": sid}))
-        avg_rating = (
-            sum(r.get("rating", 0) for r in shop_reviews) / len(shop_reviews)
-            if shop_reviews else 0
-        )
-
-        valid_candidates.append({
-            "shop_raw": s,
-            "city_raw": city,
-            "avg_rating": avg_rating,
-            "reviews_count": len(shop_reviews)
+    # ---------- CATEGORY MATCH (in memory) ----------
+    matched_cat_ids = [c["_id"] for c in search_categories(name_lower)]
+
+    # 1-4. MATCH, CITY FILTER, SORT & PAGE in a single aggregation
+    after = decode_cursor(cursor) if cursor else None
+    if cursor and after is None:
+        # Falling back to page 1 would loop a client forever
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    pipeline = build_search_pipeline(name_lower, place_lower, matched_cat_ids, after)
+    if cursor is None:
+        pipeline.append({"$skip": (page - 1) * limit})
+    pipeline.append({"$limit": limit + 1})
+
+    rows = list(col_shop.aggregate(pipeline))
+    has_more = len(rows) > limit
+    next_cursor = encode_cursor(rows[limit - 1]) if has_more else None
+
+    sliced_candidates = []
+    for row in rows[:limit]:
+        cats = row.get("category", [])
+        if not isinstance(cats, list): cats = []
+        sliced_candidates.append({
+            "shop_raw": row,
+            "city_raw": get_city(row.get("city_id")),
+            "categories_raw": [c for c in (resolve_category(x) for x in cats) if c],
+            "avg_rating": row.get("avg_rating", 0) or 0,
+            "reviews_count": row.get("rating_count", 0) or 0
         })
 
-    # 3. SORTING (By Rating DESC, then Review Count DESC)
-    valid_candidates.sort(
-        key=lambda x: (x["avg_rating"], x["reviews_count"]),
-        reverse=True
-    )
-
-    # 4. PAGINATION (Slicing)
-    total_count = len(valid_candidates)
-    start_index = (page - 1) * limit
-    end_index = start_index + limit
-
-    sliced_candidates = valid_candidates[start_index:end_index]
-    has_more = end_index < total_count
-
-    # 5. FINAL PROCESSING (Translation & Formatting only for the viewable slice)
+    # 5. FINAL PROCESSING (Formatting only for the viewable slice)
     final_output = []
+    stored = set()      # stored Tamil renditions swapped in; never re-translated
 
     for item in sliced_candidates:
         s = item["shop_raw"]
@@ -205,49 +232,58 @@ def get_static(
         avg_rating = item["avg_rating"]
         reviews_count = item["reviews_count"]
 
-        # Handle Categories
-        final_categories = []
-        for c in s.get("category", []):
-            if ObjectId.is_valid(str(c)):
-                cat = col_category.find_one({"_id": ObjectId(c)})
-            else:
-                cat = col_category.find_one({"name": c})
-
-            if cat:
-                final_categories.append({
-                    "_id": str(cat["_id"]),
-                    "name": cat.get("name"),
-                    "category_image": cat.get("category_image")
-                })
-
-        # Handle Shop Name
-        shop_name = s.get("shop_name") or ""
+        # Handle Categories (resolved from the catalogue)
+        final_categories = [
+            project_ta({
+                "_id": str(cat["_id"]),
+                "name": cat.get("name"),
+                "name_ta": cat.get("name_ta"),
+                "category_image": cat.get("category_image")
+            }, CATEGORY_TA_FIELDS, lang)
+            for cat in item["categories_raw"]
+        ]
         if lang == "ta":
-            translated = translate_text_en_to_ta(shop_name)
-            shop_name = (
-                phonetic_tamil(shop_name)
-                if translated.strip().lower() == shop_name.strip().lower()
-                else translated
-            )
+            for doc, fields in [(s, SHOP_TA_FIELDS), (city, CITY_TA_FIELDS)] + \
+                    [(cat, CATEGORY_TA_FIELDS) for cat in item["categories_raw"]]:
+                stored.update(doc[ta_key(f)] for f in stored_ta(doc, fields))
 
-        shop_data = safe(s)
-        shop_data["shop_name"] = shop_name
+        # Stored Tamil renditions are swapped in here (lang=ta)
+        shop_data = project_ta(safe(s), SHOP_TA_FIELDS, lang)
+        shop_data["shop_name"] = shop_data.get("shop_name") or ""
+        # Result cards get the 480px derivative, not the uploaded photo
+        present_shop_images(shop_data, "card", "card")
 
-        response_item = {
+        final_output.append({
             "shop": shop_data,
             "categories": final_categories,
-            "city": safe(city) if city else None,
+            "city": project_ta(safe(city), CITY_TA_FIELDS, lang) if city else None,
             "avg_rating": round(avg_rating, 1),
             "reviews_count": reviews_count,
-        }
+        })
 
-        if lang == "ta":
-            response_item = translate_dict(response_item)
+    # 6. TRANSLATION - whatever has no stored rendition, whole page in one
+    # batch (Tamil strings pass through without a translator call)
+    if lang == "ta":
+        names = [item["shop"]["shop_name"] for item in final_output]
+        texts = [t for t in collect_strings(final_output, DICT_SKIP_KEYS) + names if t not in stored]
+        done = translate_batch(texts)
+
+        for item in final_output:
+            shop_name = item["shop"]["shop_name"]
+            if shop_name in stored or has_tamil(shop_name):
+                continue
+            translated = done.get(shop_name, shop_name)
+            item["shop"]["shop_name"] = (
+                phonetic_tamil(shop_name)
+                if translated.strip().lower() == shop_name.strip().lower()
+                else translated
+            )
 
-        final_output.append(response_item)
+        final_output = translate_dict(final_output, done)
 
     return {
         "data": final_output,
         "page": page,
-        "has_more": has_more
+        "has_more": has_more,
+        "next_cursor": next_cursor
     }
@@ -4,8 +4,11 @@ from api.common_urldb import db
 from datetime import datetime
 from api.auth_jwt import verify_token
 
-from api.translator import en_to_ta, ta_to_en
-from api.cache import get_cached, set_cache
+from api.translator import en_to_ta, ta_to_en, en_to_ta_many, collect_strings, map_strings
+from api.tamil_fields import project_ta, CATEGORY_TA_FIELDS
+from api.images import present_shop_images
+from api.catalog import all_categories
+from api.rating_stats import apply_review_rating, rating_summary, STARS
 
 router = APIRouter()
 
@@ -36,32 +39,21 @@ def translate_text(text: str):
     if not should_translate(text):
         return text
 
-    cached = get_cached(text)
-    if cached:
-        return cached
+    # en_to_ta is backed by the shared two-tier cache (api/cache.py)
+    return en_to_ta(text)
 
-    ta = en_to_ta(text)
-    set_cache(text, ta)
-    return ta
 
+DICT_SKIP_KEYS = ("_id", "category_image", "path", "date", "rating", "shop_id")
 
-def translate_dict(obj):
-    if isinstance(obj, dict):
-        new = {}
-        for k, v in obj.items():
-            if k in ("_id", "category_image", "path", "date", "rating", "shop_id"):
-                new[k] = v
-            else:
-                new[k] = translate_dict(v)
-        return new
-
-    if isinstance(obj, list):
-        return [translate_dict(i) for i in obj]
 
+def translate_dict(obj):
+    """Batched: every translatable leaf goes to the translator in one call."""
     if isinstance(obj, str):
         return translate_text(obj)
 
-    return obj
+    texts = [t for t in collect_strings(obj, DICT_SKIP_KEYS) if should_translate(t)]
+    done = en_to_ta_many(texts)
+    return map_strings(obj, lambda t: done.get(t, t), DICT_SKIP_KEYS)
 
 
 # ==================================================
@@ -69,8 +61,8 @@ def translate_dict(obj):
 # ==================================================
 @router.get("/category/list/", operation_id="getCategoryList")
 def get_categories(lang: str = Query("en")):
-    data = list(col_category.find())
-    data = [serialize(c) for c in data]
+    data = all_categories()
+    data = [project_ta(serialize(c), CATEGORY_TA_FIELDS, lang) for c in data]
 
     if lang == "ta":
         data = translate_dict(data)
@@ -134,6 +126,8 @@ def get_shop_photos(shop_id: str):
     if not shop:
         return {"status": False, "message": "Shop not found"}
 
+    # Gallery size (1280px) derivatives where they exist
+    present_shop_images(shop, "full", "full")
     media = shop.get("media", [])
 
     valid_media = [
@@ -146,7 +140,8 @@ def get_shop_photos(shop_id: str):
         "status": True,
         "media": valid_media,
         "main_image": shop.get("main_image"),
-        "views": shop.get("views", 0)
+        "views": shop.get("views", 0),
+        "rating": rating_summary(shop)
     }
 
 
@@ -179,6 +174,9 @@ def add_review_api(
     if not user:
         return {"status": False}
 
+    if int(rating) not in STARS:
+        return {"status": False, "message": "Rating must be between 1 and 5"}
+
     review_en = ta_to_en(review)
 
     data = {
@@ -193,6 +191,9 @@ def add_review_api(
     res = col_reviews.insert_one(data)
     data["_id"] = str(res.inserted_id)
 
+    # ✅ KEEP SHOP RATING AGGREGATES IN SYNC
+    apply_review_rating(shop_id, data["rating"], 1)
+
     return {"status": True, "data": data}
 
 
@@ -208,5 +209,6 @@ def delete_review(
     if not review or review.get("user_id") != user_id:
         return {"status": False}
 
-    col_reviews.delete_one({"_id": oid})
+    if col_reviews.delete_one({"_id": oid}).deleted_count:
+        apply_review_rating(review["shop_id"], review.get("rating", 0), -1)
     return {"status": True}
@@ -1,8 +1,9 @@
 from fastapi import APIRouter, Form, UploadFile, File, Query, HTTPException, Depends, Body, BackgroundTasks
 from bson import ObjectId
+from pymongo import ReturnDocument
 from datetime import datetime
-import hashlib, base64
-import os, uuid
+import hashlib, base64, time
+import os
 from pydantic import BaseModel
 from api.common_urldb import db
 
@@ -16,10 +17,25 @@ from api.auth_jwt import (
     verify_refresh_token,
 )
 from api.payments import check_shop_limit, check_offer_limit
+from api.entitlements import release as release_entitlement
+from api.catalog import (
+    get_city, get_category, category_by_name, search_categories, search_cities,
+)
+from api.tamil_fields import (
+    tamil_variants, apply_tamil_update, project_ta,
+    SHOP_TA_FIELDS, OFFER_TA_FIELDS, JOB_TA_FIELDS, CITY_TA_FIELDS, CATEGORY_TA_FIELDS,
+)
+from api.city_slides import refresh_cities, refresh_shops
+from api.offer_items import sync_offer, remove_offers_doc, shop_id_match
+from api.uploads import UploadRejected
+from api.blobs import store_upload, release, release_many
+from api.images import enqueue_derivatives, image_target, sized
+from api.offload import run_io
+from api.cache import get_cached, set_cache, get_version, bump_version
 
 # --- TRANSLATOR SYSTEM HELPERS ---
-from api.translator import ta_to_en, en_to_ta
-from api.cache import get_cached, set_cache
+# ta_to_en / en_to_ta are backed by the shared two-tier cache (api/cache.py)
+from api.translator import ta_to_en, en_to_ta, en_to_ta_many, collect_strings, map_strings
 
 
 router = APIRouter()
@@ -96,49 +112,67 @@ def translate_to_en_logic(text: str) -> str:
         return text
     if text.replace(" ", "").isdigit():
         return text
-    cached = get_cached(text)
-    if cached: return cached
     try:
         translated = ta_to_en(text)
         if translated:
-            set_cache(text, translated)
             return translated
     except:
         pass
     return text
 
 
-def translate_to_ta_logic(text: str) -> str:
+def is_ta_candidate(text) -> bool:
     if not text or not isinstance(text, str) or text.strip() == "":
-        return text
+        return False
     if text.replace(" ", "").isdigit():
+        return False
+    return True
+
+
+def is_phonetic_only(text: str) -> bool:
+    return len(text) <= 3 and text.isalpha()
+
+
+def pick_ta(text: str, translated) -> str:
+    if translated and translated.lower() != text.lower():
+        return translated
+    return apply_phonetic_fallback(text)
+
+
+def translate_to_ta_logic(text: str) -> str:
+    if not is_ta_candidate(text):
         return text
-    cached = get_cached(text)
-    if cached: return cached
-    if len(text) <= 3 and text.isalpha():
+    if is_phonetic_only(text):
         return apply_phonetic_fallback(text)
     try:
-        translated = en_to_ta(text)
-        if translated and translated.lower() != text.lower():
-            set_cache(text, translated)
-            return translated
+        return pick_ta(text, en_to_ta(text))
     except:
         pass
     return apply_phonetic_fallback(text)
 
 
 def translate_response_data(data, lang: str):
+    """
+    Batched: every translatable dict value in the tree (lists of plain
+    strings are left as-is) is sent to the translator in one call.
+    """
     if lang != "ta": return data
-    if isinstance(data, list):
-        return [translate_response_data(item, lang) for item in data]
-    if isinstance(data, dict):
-        return {
-            k: (v if k in SKIP_KEYS else translate_response_data(v, lang))
-            if not isinstance(v, str)
-            else (v if k in SKIP_KEYS else translate_to_ta_logic(v))
-            for k, v in data.items()
-        }
-    return data
+    if not isinstance(data, (dict, list)): return data
+
+    texts = [
+        t for t in collect_strings(data, SKIP_KEYS, list_items=False)
+        if is_ta_candidate(t) and not is_phonetic_only(t)
+    ]
+    done = en_to_ta_many(texts)
+
+    def finish(text):
+        if not is_ta_candidate(text):
+            return text
+        if is_phonetic_only(text):
+            return apply_phonetic_fallback(text)
+        return pick_ta(text, done.get(text))
+
+    return map_strings(data, finish, SKIP_KEYS, list_items=False)
 
 
 def hash_password(pwd): return hashlib.sha256(pwd.encode()).hexdigest()
@@ -200,7 +234,8 @@ def login(emailorphone: str = Form(...), password: str = Form(...)):
             "user_id": u_id,
             "firstname": user.get("firstname", ""),
             "lastname": user.get("lastname", ""),
-            "profile_image": user.get("profile_image", ""),
+            # Avatar-sized derivative once rendered (api/images.py)
+            "profile_image": sized(user.get("profile_image", ""), user.get("profile_image_variants"), "thumb"),
             "login_method": "email" if user.get("email") == identifier else "phone",
             "value": identifier
         }
@@ -224,31 +259,24 @@ def upload_profile_image(
         file: UploadFile = File(...),
         user_id: str = Depends(verify_token)
 ):
-    if not file.content_type.startswith("image/"):
-        raise HTTPException(status_code=400, detail="Only image files allowed")
-
     user = col_user.find_one({"_id": ObjectId(user_id)})
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
 
-    old_image = user.get("profile_image")
-    if old_image and os.path.exists(old_image):
-        try:
-            os.remove(old_image)
-        except Exception:
-            pass
-
-    ext = file.filename.split(".")[-1].lower()
-    filename = f"{user_id}.{ext}"
-    path = os.path.join(UPLOAD_DIR, filename)
+    try:
+        saved = store_upload(file, allowed=("image",))
+    except UploadRejected as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    path = saved["path"]
 
-    with open(path, "wb") as f:
-        f.write(file.file.read())
+    release(user.get("profile_image"))
 
     col_user.update_one(
         {"_id": ObjectId(user_id)},
-        {"$set": {"profile_image": path}}
+        {"$set": {"profile_image": path}, "$unset": {"profile_image_variants": ""}}
     )
+    enqueue_derivatives(path, image_target(
+        "user", {"_id": ObjectId(user_id), "profile_image": path}, "profile_image_variants"))
 
     return {"success": True, "profile_image": path}
 
@@ -258,10 +286,10 @@ def upload_profile_image(
 @router.get("/category/search/", operation_id="searchCategory")
 def search_category(category: str = Query(""), lang: str = Query("en")):
     search_term = translate_to_en_logic(category) if lang == "ta" else category
-    data = list(col_category.find({"name": {"$regex": search_term, "$options": "i"}}))
+    data = search_categories(search_term)
     results = []
     for item in data:
-        item_data = {**item, "_id": oid(item["_id"])}
+        item_data = project_ta({**item, "_id": oid(item["_id"])}, CATEGORY_TA_FIELDS, lang)
         if lang == "ta": item_data["name"] = translate_to_ta_logic(item_data.get("name", ""))
         results.append(item_data)
     msg = translate_to_ta_logic("category searched successfully") if lang == "ta" else "category searched successfully"
@@ -271,10 +299,10 @@ def search_category(category: str = Query(""), lang: str = Query("en")):
 @router.get("/city/search/", operation_id="searchCity")
 def search_city(city_name: str = Query(""), lang: str = Query("en")):
     search_term = translate_to_en_logic(city_name) if lang == "ta" else city_name
-    data = list(col_city.find({"city_name": {"$regex": search_term, "$options": "i"}}).limit(20))
+    data = search_cities(search_term, limit=20)
     results = []
     for item in data:
-        item_data = {**item, "_id": oid(item["_id"])}
+        item_data = project_ta({**item, "_id": oid(item["_id"])}, CITY_TA_FIELDS, lang)
         if lang == "ta":
             item_data["city_name"] = translate_to_ta_logic(item_data.get("city_name", ""))
             item_data["district"] = translate_to_ta_logic(item_data.get("district", ""))
@@ -290,6 +318,38 @@ def search_city(city_name: str = Query(""), lang: str = Query("en")):
 MEDIA_BASE = "media/shop"
 
 
+# ---------------- IMAGE DERIVATIVES (api/images.py) ----------------
+# The recorded variants are part of the owner's /myshop/ response, so every
+# completion also invalidates that owner's dashboard cache.
+def enqueue_shop_images(shop_id, user_id, main_image=None, media_items=(), then=None):
+    soid = ObjectId(shop_id)
+
+    def done():
+        invalidate_dashboard(user_id)
+        if then:
+            then()
+
+    if main_image:
+        enqueue_derivatives(main_image, image_target(
+            "shop", {"_id": soid, "main_image": main_image}, "main_image_variants", then=done))
+    for m in media_items:
+        if m.get("type") == "image":
+            enqueue_derivatives(m["path"], image_target(
+                "shop", {"_id": soid}, "media.$[m].variants", [{"m.path": m["path"]}], then=done))
+
+
+def offer_image_target(shop_id, user_id, offer_id, media_path):
+    def then():
+        sync_offer(shop_id, offer_id)
+        refresh_shops(shop_id)
+        invalidate_dashboard(user_id)
+
+    return image_target(
+        "offers", {"shop_id": shop_id_match(shop_id)}, "offers.$[o].media_variants",
+        [{"o.offer_id": offer_id, "o.media_path": media_path}], then=then
+    )
+
+
 @router.post("/shop/add/", operation_id="addShop")
 def add_shop(
         background_tasks: BackgroundTasks,  # <--- REQUIRED FOR ASYNC EMAIL
@@ -307,14 +367,8 @@ def add_shop(
         keywords: str = Form(...),
         lang: str = Query("en")
 ):
-    # 1. LIMIT CHECK
-    try:
-        check_shop_limit(user_id)
-    except HTTPException as e:
-        msg = e.detail
-        return {"status": "error", "message": en_to_ta(msg) if lang == "ta" else msg}
-
-    # 2. TRANSLATION & VALIDATION
+    # 1. TRANSLATION & VALIDATION
+    raw_input = {"shop_name": shop_name, "description": description, "address": address, "landmark": landmark}
     if lang == "ta":
         shop_name = ta_to_en(shop_name)
         description = ta_to_en(description)
@@ -327,7 +381,7 @@ def add_shop(
     except:
         return {"status": "error", "message": "Invalid city ID"}
 
-    if not col_city.find_one({"_id": city_oid}, {"_id": 1}):
+    if not get_city(city_oid):
         return {"status": "error", "message": "City not found"}
 
     cat_ids = []
@@ -335,58 +389,80 @@ def add_shop(
         name = raw.strip()
         if not name: continue
         db_name = ta_to_en(name) if lang == "ta" else name
-        cat = col_category.find_one({"name": {"$regex": f"^{db_name}$", "$options": "i"}}, {"_id": 1})
+        cat = category_by_name(db_name)
         if not cat: return {"status": "error", "message": f"Category '{name}' not found"}
         cat_ids.append(str(cat["_id"]))
 
+    # Main image up front: a rejected file is reported like in update_shop
+    # and nothing has been created yet
+    main_path = None
+    if main_image:
+        try:
+            main_path = store_upload(main_image, allowed=("image",))["path"]
+        except UploadRejected as e:
+            return {"status": "error", "message": str(e)}
+
+    # 2. LIMIT CHECK (takes the slot; given back if the insert fails)
+    try:
+        check_shop_limit(user_id)
+    except HTTPException as e:
+        release(main_path)
+        msg = e.detail
+        return {"status": "error", "message": en_to_ta(msg) if lang == "ta" else msg}
+
     # 3. INSERT SHOP
-    inserted = col_shop.insert_one({
-        "shop_name": shop_name,
-        "description": description,
-        "address": address,
-        "phone_number": phone_number,
-        "email": email,
-        "landmark": landmark,
-        "category": cat_ids,
-        "city_id": str(city_oid),
-        "media": [],
-        "main_image": None,
-        "keywords": [k.strip() for k in keywords.split(",") if k.strip()],
-        "user_id": user_id,
-        "created_at": datetime.utcnow(),
-        "status": "pending"
-    })
+    try:
+        inserted = col_shop.insert_one({
+            "shop_name": shop_name,
+            "description": description,
+            "address": address,
+            "phone_number": phone_number,
+            "email": email,
+            "landmark": landmark,
+            "category": cat_ids,
+            "city_id": str(city_oid),
+            "media": [],
+            "main_image": None,
+            "keywords": [k.strip() for k in keywords.split(",") if k.strip()],
+            "user_id": user_id,
+            "created_at": datetime.utcnow(),
+            "status": "pending",
+            # Rating aggregates (see api/rating_stats.py) - keeps search keyset sort total
+            "rating_sum": 0,
+            "rating_count": 0,
+            "avg_rating": 0,
+            # Stored Tamil renditions (see api/tamil_fields.py)
+            **tamil_variants(
+                {"shop_name": shop_name, "description": description, "address": address, "landmark": landmark},
+                raw_input if lang == "ta" else None
+            )
+        })
+    except Exception:
+        release_entitlement(user_id, "shops")
+        release(main_path)
+        raise
     shop_id = str(inserted.inserted_id)
 
     # 4. HANDLE IMAGES
     update_data = {}
-    if main_image:
-        main_dir = os.path.join(MEDIA_BASE, shop_id, "main")
-        os.makedirs(main_dir, exist_ok=True)
-        ext = main_image.filename.split(".")[-1]
-        fname = f"{uuid.uuid4()}.{ext}"
-        full_path = os.path.join(main_dir, fname)
-        with open(full_path, "wb") as f:
-            f.write(main_image.file.read())
-        update_data["main_image"] = f"{MEDIA_BASE}/{shop_id}/main/{fname}"
+    if main_path:
+        update_data["main_image"] = main_path
 
     media_items = []
     if media:
-        img_dir = os.path.join(MEDIA_BASE, shop_id, "images")
-        os.makedirs(img_dir, exist_ok=True)
         for f in media:
-            if not f.content_type.startswith("image"): continue
-            ext = f.filename.split(".")[-1]
-            fname = f"{uuid.uuid4()}.{ext}"
-            full_path = os.path.join(img_dir, fname)
-            with open(full_path, "wb") as img:
-                img.write(f.file.read())
-            media_items.append({"type": "image", "path": f"{MEDIA_BASE}/{shop_id}/images/{fname}"})
+            try:
+                saved = store_upload(f, allowed=("image",))
+            except UploadRejected:
+                continue
+            media_items.append({"type": "image", "path": saved["path"]})
 
     if media_items: update_data["media"] = media_items
     if update_data: col_shop.update_one({"_id": ObjectId(shop_id)}, {"$set": update_data})
+    enqueue_shop_images(shop_id, user_id, update_data.get("main_image"), media_items)
 
     # 5. CREATE NOTIFICATION
+    invalidate_dashboard(user_id)
     create_notification(
         user_id=user_id,
         notif_type="shop_created",
@@ -484,61 +560,59 @@ def update_shop(
         k = ta_to_en(keywords) if lang == "ta" else keywords
         update["keywords"] = [i.strip() for i in k.split(",") if i.strip()]
 
+    raw_input = {"shop_name": shop_name, "description": description, "address": address, "landmark": landmark}
+    stale_ta = apply_tamil_update(update, SHOP_TA_FIELDS, raw_input if lang == "ta" else None)
+
+    # Blobs the shop stops pointing at are released only once the write
+    # went through; new blobs are given back if it did not
+    replaced, stored = [], []
+
     if main_image:
-        img_dir = os.path.join(MEDIA_BASE, shop_id, "main")
-        os.makedirs(img_dir, exist_ok=True)
-        old = shop.get("main_image")
-        if old:
-            try:
-                os.remove(old)
-            except:
-                pass
-        ext = main_image.filename.split(".")[-1]
-        fname = f"{uuid.uuid4()}.{ext}"
-        full_path = os.path.join(img_dir, fname)
-        with open(full_path, "wb") as f:
-            f.write(main_image.file.read())
-        update["main_image"] = f"{MEDIA_BASE}/{shop_id}/main/{fname}"
+        try:
+            update["main_image"] = store_upload(main_image, allowed=("image",))["path"]
+        except UploadRejected as e:
+            return {"status": "error", "message": str(e)}
+        stored.append(update["main_image"])
+        replaced.append(shop.get("main_image"))
 
     if delete_media:
         delete_paths = [p.strip() for p in delete_media.split(",") if p.strip()]
         remaining = []
         for m in shop.get("media", []):
             if m["path"] in delete_paths:
-                try:
-                    os.remove(m["path"])
-                except:
-                    pass
+                replaced.append(m["path"])
             else:
                 remaining.append(m)
         update["media"] = remaining
 
-    if media:
-        img_dir = os.path.join(MEDIA_BASE, shop_id, "images")
-        vid_dir = os.path.join(MEDIA_BASE, shop_id, "videos")
-        os.makedirs(img_dir, exist_ok=True)
-        os.makedirs(vid_dir, exist_ok=True)
-        current = update.get("media", shop.get("media", []))
-        for f in media:
-            ext = f.filename.split(".")[-1]
-            fname = f"{uuid.uuid4()}.{ext}"
-            if f.content_type.startswith("image"):
-                full = os.path.join(img_dir, fname)
-                dbp = f"{MEDIA_BASE}/{shop_id}/images/{fname}"
-                typ = "image"
-            elif f.content_type.startswith("video"):
-                full = os.path.join(vid_dir, fname)
-                dbp = f"{MEDIA_BASE}/{shop_id}/videos/{fname}"
-                typ = "video"
-            else:
-                continue
-            with open(full, "wb") as file:
-                file.write(f.file.read())
-            current.append({"type": typ, "path": dbp})
-        update["media"] = current
+    try:
+        if media:
+            current = update.get("media", shop.get("media", []))
+            for f in media:
+                try:
+                    saved = store_upload(f)
+                except UploadRejected:
+                    continue
+                stored.append(saved["path"])
+                current.append({"type": saved["kind"], "path": saved["path"]})
+            update["media"] = current
+
+        if update:
+            ops = {"$set": update}
+            if stale_ta: ops["$unset"] = stale_ta
+            if "main_image" in update: ops.setdefault("$unset", {})["main_image_variants"] = ""
+            col_shop.update_one({"_id": soid}, ops)
+    except BaseException:
+        release_many(stored)
+        raise
+    release_many(replaced)
 
     if update:
-        col_shop.update_one({"_id": soid}, {"$set": update})
+        refresh_cities(shop.get("city_id"), update.get("city_id"))
+        enqueue_shop_images(shop_id, user_id, update.get("main_image"),
+                            [m for m in update.get("media", []) if "variants" not in m],
+                            then=lambda: refresh_cities(shop.get("city_id")))
+        invalidate_dashboard(user_id)
         create_notification(user_id, "shop_updated", "Shop Updated", f"Shop '{shop.get('shop_name')}' updated.",
                             shop_id)
 
@@ -548,8 +622,13 @@ def update_shop(
 @router.delete("/shop/delete/{shop_id}/", operation_id="deleteShop")
 def delete_shop(shop_id: str, user_id: str = Depends(verify_token), lang: str = Query("en")):
     try:
-        res = col_shop.delete_one({"_id": ObjectId(shop_id)})
-        if res.deleted_count == 0: return {"status": "error", "message": "Shop not found"}
+        shop = col_shop.find_one_and_delete({"_id": ObjectId(shop_id)},
+                                            {"user_id": 1, "city_id": 1, "main_image": 1, "media": 1})
+        if not shop: return {"status": "error", "message": "Shop not found"}
+        release_entitlement(shop.get("user_id"), "shops")
+        release_many([shop.get("main_image")] + [m.get("path") for m in shop.get("media", [])])
+        refresh_cities(shop.get("city_id"))
+        invalidate_dashboard(user_id)
         create_notification(user_id, "shop_deleted", "Shop Deleted", "Shop deleted successfully.", None)
         msg = "Shop deleted successfully"
         return {"status": "success", "message": translate_to_ta_logic(msg) if lang == "ta" else msg}
@@ -557,26 +636,50 @@ def delete_shop(shop_id: str, user_id: str = Depends(verify_token), lang: str =
         return {"status": "error", "message": "Invalid ID"}
 
 
+# ---------------- OWNER DASHBOARD CACHE ----------------
+# /myshop/ responses per (owner, lang) in the shared cache (api/cache.py),
+# keyed by a per-owner version that every owner-side write bumps.
+DASHBOARD_TTL = 600     # seconds
+
+
+def dashboard_key(user_id, lang):
+    version = get_version(f"dash:{user_id}")
+    return None if version is None else f"dash:{user_id}:{version}:{lang}"
+
+
+def invalidate_dashboard(user_id):
+    bump_version(f"dash:{user_id}")
+
+
 # GET MY SHOP (ROBUST & FIXED)
 @router.get("/myshop/", operation_id="getMyShop")
 def get_my_shop(
         user_id: str = Depends(verify_token),
         lang: str = Query("en")
 ):
-    try:
-        # Search for BOTH String and ObjectId to be safe
-        user_queries = [{"user_id": user_id}, {"user_id": ObjectId(user_id)}]
-    except:
-        user_queries = [{"user_id": user_id}]
+    cache_key = dashboard_key(user_id, lang)
+    cached = get_cached(cache_key) if cache_key else None
+    if cached and time.time() - cached["at"] < DASHBOARD_TTL:
+        return cached["response"]
+
+    # Search for BOTH String and ObjectId to be safe
+    owner_ids = [user_id, ObjectId(user_id)] if ObjectId.is_valid(user_id) else [user_id]
+    shops = list(col_shop.find({"user_id": {"$in": owner_ids}}))
+
+    # All offer documents of all the owner's shops in one query
+    shop_keys = [str(s["_id"]) for s in shops] + [s["_id"] for s in shops]
+    offers_by_shop = {}
+    for doc in col_offers.find({"shop_id": {"$in": shop_keys}}) if shops else []:
+        offers_by_shop.setdefault(str(doc["shop_id"]), []).append(doc)
 
-    shops = list(col_shop.find({"$or": user_queries}))
     final = []
 
     for s in shops:
-        s_clean = safe(s)
+        # Stored Tamil renditions first; translate_response_data only pays for the rest
+        s_clean = project_ta(safe(s), SHOP_TA_FIELDS, lang)
         shop_id_str = s_clean["_id"]
-        shop_oid = s["_id"]
 
+        # Categories and city come from the in-memory catalogue (no query)
         categories = []
         cat_list = s.get("category", [])
         if isinstance(cat_list, str): cat_list = cat_list.split(",")
@@ -584,8 +687,8 @@ def get_my_shop(
             try:
                 cid_str = str(cid).strip()
                 if len(cid_str) == 24:
-                    cat = col_category.find_one({"_id": ObjectId(cid_str)})
-                    if cat: categories.append(safe(cat))
+                    cat = get_category(cid_str)
+                    if cat: categories.append(project_ta(safe(cat), CATEGORY_TA_FIELDS, lang))
             except:
                 continue
 
@@ -593,18 +696,15 @@ def get_my_shop(
         city_id = s.get("city_id")
         if city_id:
             try:
-                c_oid = ObjectId(city_id) if ObjectId.is_valid(str(city_id)) else city_id
-                city = col_city.find_one({"_id": c_oid})
-                if city: city_doc = safe(city)
+                city = get_city(city_id)
+                if city: city_doc = project_ta(safe(city), CITY_TA_FIELDS, lang)
             except:
                 pass
 
         offers = []
-        offer_query = {"$or": [{"shop_id": shop_id_str}, {"shop_id": shop_oid}]}
-        offer_docs = list(col_offers.find(offer_query))
-        for doc in offer_docs:
+        for doc in offers_by_shop.get(shop_id_str, []):
             for o in doc.get("offers", []):
-                offers.append(safe(o))
+                offers.append(project_ta(safe(o), OFFER_TA_FIELDS, lang))
 
         final.append({
             "shop": {**s_clean, "main_image": s_clean.get("main_image"), "media": s_clean.get("media", [])},
@@ -613,17 +713,22 @@ def get_my_shop(
             "offers": offers
         })
 
-    return {
+    response = {
         "status": "success",
         "message": translate_to_ta_logic("shop get successfully") if lang == "ta" else "shop get successfully",
         "data": translate_response_data(safe(final), lang)
     }
+    if cache_key:
+        set_cache(cache_key, {"at": time.time(), "response": response}, ttl=DASHBOARD_TTL)
+    return response
 
 
 # ==========================================
 #        OFFER MODULE
 # ==========================================
 
+# The offer handlers stay async but do all their disk / Mongo work in
+# *_logic on the bounded I/O pool (api/offload.py), off the event loop.
 @router.post("/offer/add/", operation_id="addOffer")
 async def add_offer_api(
         background_tasks: BackgroundTasks,  # <--- REQUIRED
@@ -638,55 +743,85 @@ async def add_offer_api(
         file: UploadFile = File(...),
         lang: str = Query("en")
 ):
-    try:
-        check_offer_limit(user_id)
-    except HTTPException as e:
-        return {"status": False, "message": translate_to_ta_logic(e.detail) if lang == "ta" else e.detail}
+    return await run_io(
+        add_offer_logic, background_tasks, user_id, target_shop_id, title, fee, start_date, end_date,
+        percentage, description, file, lang
+    )
+
 
+def add_offer_to_shop(shop_id, user_id, offer_id, saved, fields) -> int:
+    """Push one offer into a shop's offers document. 1 if that created the document."""
+    offer_obj = {
+        "offer_id": offer_id,
+        "media_type": saved["kind"],
+        "media_path": saved["path"],
+        "filename": saved["filename"],
+        **fields,
+        "uploaded_at": datetime.utcnow(), "status": "pending", "version": 1
+    }
+
+    # One round trip; creates the per-shop offers document on first use
+    res = col_offers.update_one(
+        {"shop_id": shop_id},
+        {"$push": {"offers": offer_obj},
+         "$setOnInsert": {"user_id": user_id, "status": "pending", "created_at": datetime.utcnow()}},
+        upsert=True
+    )
+    sync_offer(shop_id, offer_id)
+    return int(res.upserted_id is not None)
+
+
+def add_offer_logic(background_tasks, user_id, target_shop_id, title, fee, start_date, end_date,
+                    percentage, description, file, lang):
+    raw_input = {"title": title, "description": description}
     if lang == "ta":
         title = translate_to_en_logic(title)
         description = translate_to_en_logic(description)
+    offer_ta = tamil_variants({"title": title, "description": description}, raw_input if lang == "ta" else None)
 
     u_oid = ObjectId(user_id)
     shop_ids = [str(s["_id"]) for s in col_shop.find({"user_id": u_oid}, {"_id": 1})] if target_shop_id == "ALL" else [
         target_shop_id]
     if not shop_ids: return {"status": False, "message": "No shops found"}
 
-    if file.content_type.startswith("image"):
-        media_type, folder = "image", "images"
-    elif file.content_type.startswith("video"):
-        media_type, folder = "video", "videos"
-    else:
-        return {"status": False, "message": "Invalid file type"}
+    # One offer slot per offers document: one taken per shop up front (a
+    # single conditional increment, no count), and trued up below to the
+    # documents the upserts actually created
+    reserved = len(shop_ids)
+    try:
+        check_offer_limit(user_id, reserved)
+    except HTTPException as e:
+        return {"status": False, "message": translate_to_ta_logic(e.detail) if lang == "ta" else e.detail}
 
-    offer_id = str(ObjectId())
-    file_content = await file.read()
-
-    for shop_id in shop_ids:
-        save_dir = os.path.join(MEDIA_BASE, shop_id, "offers", folder)
-        os.makedirs(save_dir, exist_ok=True)
-        ext = file.filename.split(".")[-1]
-        filename = f"{offer_id}.{ext}"
-        full_path = os.path.join(save_dir, filename)
-        with open(full_path, "wb") as f:
-            f.write(file_content)
-
-        offer_obj = {
-            "offer_id": offer_id,
-            "media_type": media_type,
-            "media_path": f"{MEDIA_BASE}/{shop_id}/offers/{folder}/{filename}",
-            "filename": filename,
-            "title": title, "fee": fee, "start_date": start_date, "end_date": end_date,
-            "percentage": percentage, "description": description,
-            "uploaded_at": datetime.utcnow(), "status": "pending"
-        }
+    # Stored once whatever the number of shops; one blob ref per shop
+    try:
+        saved = store_upload(file, refs=len(shop_ids))
+    except UploadRejected as e:
+        release_entitlement(user_id, "offers", reserved)
+        return {"status": False, "message": str(e)}
 
-        if col_offers.find_one({"shop_id": shop_id}, {"_id": 1}):
-            col_offers.update_one({"shop_id": shop_id}, {"$push": {"offers": offer_obj}})
-        else:
-            col_offers.insert_one({"shop_id": shop_id, "user_id": user_id, "offers": [offer_obj], "status": "pending",
-                                   "created_at": datetime.utcnow()})
+    offer_id = str(ObjectId())
+    created = placed = 0
 
+    try:
+        for shop_id in shop_ids:
+            created += add_offer_to_shop(shop_id, user_id, offer_id, saved, {
+                "title": title, "fee": fee, "start_date": start_date, "end_date": end_date,
+                "percentage": percentage, "description": description, **offer_ta,
+            })
+            placed += 1
+    finally:
+        # Slots for documents that were not created (the shop already had
+        # one, a failed shop, or another request got there first); blob
+        # refs of unplaced shops
+        release_entitlement(user_id, "offers", reserved - created)
+        if placed < len(shop_ids):
+            release(saved["path"], len(shop_ids) - placed)
+
+    refresh_shops(*shop_ids)
+    if saved["kind"] == "image":
+        enqueue_derivatives(saved["path"], *[offer_image_target(sid, user_id, offer_id, saved["path"]) for sid in shop_ids])
+    invalidate_dashboard(user_id)
     create_notification(user_id, "offer_created", "Offer Created", f"Offer '{title}' added.", offer_id)
 
     # EMAIL IN BACKGROUND
@@ -707,70 +842,121 @@ async def update_offer_api(
         end_date: str = Form(""),
         percentage: str = Form(""),
         description: str = Form(""),
+        version: int = Form(None),
         file: UploadFile = File(None),
         lang: str = Query("en")
 ):
+    return await run_io(
+        update_offer_logic, user_id, offer_id, shop_id, title, fee, start_date, end_date,
+        percentage, description, version, file, lang
+    )
+
+
+def update_offer_logic(user_id, offer_id, shop_id, title, fee, start_date, end_date,
+                       percentage, description, version, file, lang):
+    raw_input = {"title": title, "description": description}
     if lang == "ta":
         title = translate_to_en_logic(title)
         description = translate_to_en_logic(description)
 
-    doc = col_offers.find_one({"shop_id": shop_id})
+    # Only the target element is read ($elemMatch projection)
+    doc = col_offers.find_one({"shop_id": shop_id_match(shop_id), "offers.offer_id": offer_id},
+                              {"offers": {"$elemMatch": {"offer_id": offer_id}}})
     if not doc: return {"status": False, "message": "Offer not found"}
-    offers = doc.get("offers", [])
-    target = next((o for o in offers if o["offer_id"] == offer_id), None)
-    if not target: return {"status": False, "message": "Offer not found"}
+    target = doc["offers"][0]
 
-    target.update({"title": title, "fee": fee, "start_date": start_date, "end_date": end_date, "percentage": percentage,
-                   "description": description})
+    update = {"title": title, "fee": fee, "start_date": start_date, "end_date": end_date, "percentage": percentage,
+              "description": description}
+    stale_ta = apply_tamil_update(update, OFFER_TA_FIELDS, raw_input if lang == "ta" else None)
 
+    saved = None
     if file:
-        old_path = target.get("media_path")
-        if old_path and os.path.exists(old_path):
-            try:
-                os.remove(old_path)
-            except:
-                pass
-        if file.content_type.startswith("image"):
-            folder, media_type = "images", "image"
-        elif file.content_type.startswith("video"):
-            folder, media_type = "videos", "video"
-        else:
-            return {"status": False, "message": "Invalid file type"}
-
-        ext = file.filename.split(".")[-1]
-        filename = f"{offer_id}.{ext}"
-        save_dir = os.path.join(MEDIA_BASE, shop_id, "offers", folder)
-        os.makedirs(save_dir, exist_ok=True)
-        with open(os.path.join(save_dir, filename), "wb") as f:
-            f.write(await file.read())
-
-        target.update({
-            "media_type": media_type,
-            "media_path": f"{MEDIA_BASE}/{shop_id}/offers/{folder}/{filename}",
-            "filename": filename,
+        try:
+            saved = store_upload(file)
+        except UploadRejected as e:
+            return {"status": False, "message": str(e)}
+
+        update.update({
+            "media_type": saved["kind"],
+            "media_path": saved["path"],
+            "filename": saved["filename"],
             "uploaded_at": datetime.utcnow()
         })
 
-    col_offers.update_one({"shop_id": shop_id}, {"$set": {"offers": offers}})
+    # Positional update of this one offer; with `version` the write only
+    # applies if nobody changed the offer since the client read it
+    elem = {"offer_id": offer_id}
+    if version is not None:
+        elem["version"] = version if version else {"$in": [None, 0]}
+    if saved:
+        # The old file is released below: it must still be the one we read
+        elem["media_path"] = target.get("media_path")
+
+    ops = {
+        "$set": {f"offers.$[o].{k}": v for k, v in update.items()},
+        "$inc": {"offers.$[o].version": 1}
+    }
+    if saved: stale_ta = {**stale_ta, "media_variants": ""}
+    if stale_ta: ops["$unset"] = {f"offers.$[o].{k}": "" for k in stale_ta}
+
+    updated = col_offers.find_one_and_update(
+        {"shop_id": shop_id_match(shop_id), "offers": {"$elemMatch": elem}},
+        ops,
+        projection={"offers": {"$elemMatch": {"offer_id": offer_id}}},
+        array_filters=[{"o.offer_id": offer_id}],
+        return_document=ReturnDocument.AFTER
+    )
+    if not updated:
+        if saved:
+            release(saved["path"])
+        if not col_offers.find_one({"shop_id": shop_id_match(shop_id), "offers.offer_id": offer_id}, {"_id": 1}):
+            msg = "Offer not found"
+            return {"status": False, "message": translate_to_ta_logic(msg) if lang == "ta" else msg}
+        msg = "Offer was changed by someone else, please reload and try again"
+        return {"status": False, "conflict": True,
+                "message": translate_to_ta_logic(msg) if lang == "ta" else msg}
+
+    if saved:
+        release(target.get("media_path"))
+        if saved["kind"] == "image":
+            enqueue_derivatives(saved["path"], offer_image_target(shop_id, user_id, offer_id, saved["path"]))
+
+    sync_offer(shop_id, offer_id)
+    refresh_shops(shop_id)
+    invalidate_dashboard(user_id)
     create_notification(user_id, "offer_updated", "Offer Updated", f"Offer '{title}' updated.", offer_id)
 
-    return {"status": True, "message": translate_to_ta_logic(
+    return {"status": True, "version": updated["offers"][0].get("version"), "message": translate_to_ta_logic(
         "Offer updated successfully") if lang == "ta" else "Offer updated successfully"}
 
 
 @router.delete("/delete/offer/", operation_id="deleteOffer")
 def delete_offer(user_id: str = Depends(verify_token), offer_id: str = Query(...), lang: str = Query("en")):
     try:
-        if col_offers.delete_one({"_id": ObjectId(offer_id)}).deleted_count > 0:
+        doc = col_offers.find_one_and_delete({"_id": ObjectId(offer_id)},
+                                             {"user_id": 1, "shop_id": 1, "offers.media_path": 1})
+        if doc:
+            release_many([o.get("media_path") for o in doc.get("offers", [])])
+            release_entitlement(doc.get("user_id"), "offers")
+            remove_offers_doc(doc["_id"])
+            refresh_shops(doc.get("shop_id"))
+            invalidate_dashboard(user_id)
             create_notification(user_id, "offer_deleted", "Offer Deleted", "Offer removed.", None)
             return {"status": "success",
                     "message": translate_to_ta_logic("Offer removed") if lang == "ta" else "Offer removed"}
     except:
         pass
 
-    doc = col_offers.find_one({"offers.offer_id": offer_id}, {"_id": 1})
+    doc = col_offers.find_one_and_update(
+        {"offers.offer_id": offer_id},
+        {"$pull": {"offers": {"offer_id": offer_id}}},
+        projection={"user_id": 1, "shop_id": 1, "offers.$": 1}
+    )
     if doc:
-        col_offers.update_one({"_id": doc["_id"]}, {"$pull": {"offers": {"offer_id": offer_id}}})
+        release_many([o.get("media_path") for o in doc.get("offers", [])])
+        sync_offer(doc.get("shop_id"), offer_id)
+        refresh_shops(doc.get("shop_id"))
+        invalidate_dashboard(user_id)
         create_notification(user_id, "offer_deleted", "Offer Deleted", "Offer removed.", None)
         return {"status": "success",
                 "message": translate_to_ta_logic("Offer removed") if lang == "ta" else "Offer removed"}
@@ -798,12 +984,13 @@ def add_job(
 ):
     try:
         city_oid = ObjectId(city_id)
-        city = col_city.find_one({"_id": city_oid})
+        city = get_city(city_oid)
         if not city: raise HTTPException(status_code=404, detail="City not found")
         u_oid = ObjectId(user_id)
     except:
         raise HTTPException(status_code=400, detail="Invalid data")
 
+    raw_input = {"job_title": job_title, "job_description": job_description, "shop_name": shop_name, "address": address}
     if lang == "ta":
         job_title = translate_to_en_logic(job_title)
         job_description = translate_to_en_logic(job_description)
@@ -812,11 +999,18 @@ def add_job(
         work_start_time = translate_to_en_logic(work_start_time)
         work_end_time = translate_to_en_logic(work_end_time)
 
+    city_name = translate_to_en_logic(city.get("city_name"))
+    job_ta = tamil_variants(
+        {"job_title": job_title, "job_description": job_description, "shop_name": shop_name, "address": address,
+         "city_name": city_name},
+        {**raw_input, "city_name": city.get("city_name_ta")} if lang == "ta" else {"city_name": city.get("city_name_ta")}
+    )
+
     job_insert = col_jobs.insert_one({
         "user_id": u_oid, "job_title": job_title, "job_description": job_description, "salary": salary,
         "shop_name": shop_name, "phone_number": phone_number, "email": email, "address": address,
         "work_start_time": work_start_time, "work_end_time": work_end_time,
-        "city_id": city_oid, "city_name": translate_to_en_logic(city.get("city_name")),
+        "city_id": city_oid, "city_name": city_name, **job_ta,
         "created_at": datetime.utcnow(), "updated_at": datetime.utcnow()
     })
 
@@ -865,15 +1059,22 @@ def update_job(
     if city_id:
         try:
             c_oid = ObjectId(city_id)
-            city = col_city.find_one({"_id": c_oid})
+            city = get_city(c_oid)
             if city:
                 update["city_id"] = c_oid
                 update["city_name"] = translate_to_en_logic(city.get("city_name"))
+                if city.get("city_name_ta"):
+                    update["city_name_ta"] = city["city_name_ta"]
         except:
             pass
 
+    raw_input = {"job_title": job_title, "job_description": job_description, "shop_name": shop_name, "address": address}
+    stale_ta = apply_tamil_update(update, JOB_TA_FIELDS, raw_input if lang == "ta" else None)
+
     update["updated_at"] = datetime.utcnow()
-    col_jobs.update_one({"_id": j_oid}, {"$set": update})
+    ops = {"$set": update}
+    if stale_ta: ops["$unset"] = stale_ta
+    col_jobs.update_one({"_id": j_oid}, ops)
     create_notification(u_oid, "job_updated", "Job Updated", "Job details updated.", job_id)
 
     return {"status": True, "message": translate_to_ta_logic(
@@ -900,7 +1101,7 @@ def get_my_jobs(user_id: str = Depends(verify_token), lang: str = Query("en")):
     except:
         raise HTTPException(status_code=400, detail="Invalid user id")
 
-    jobs = list(col_jobs.find({"user_id": u_oid}).sort("created_at", -1))
+    jobs = [project_ta(safe(j), JOB_TA_FIELDS, lang) for j in col_jobs.find({"user_id": u_oid}).sort("created_at", -1)]
     return {
         "status": True,
         "message": translate_to_ta_logic("Jobs fetched successfully") if lang == "ta" else "Jobs fetched successfully",
@@ -7,12 +7,7 @@ from api.common_urldb import db
 router = APIRouter()
 
 col_views = db["shopviews"]
-
-# UNIQUE: one document per shop per month
-col_views.create_index(
-    [("shop_id", 1), ("year", 1), ("month", 1)],
-    unique=True
-)
+# UNIQUE (shop_id, year, month) index lives in api/indexes.py
 
 # REDIS
 r = redis.Redis(host="localhost", port=6379, decode_responses=True)
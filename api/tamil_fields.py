@@ -0,0 +1,165 @@
+from pymongo import UpdateOne
+from api.common_urldb import db
+from api.translator import en_to_ta_many, has_tamil
+
+# ==================================================
+# STORED TAMIL RENDITIONS
+# English stays the canonical value; "<field>_ta" is written next to it so
+# lang=ta reads are a field swap instead of a translator call.
+# ==================================================
+SHOP_TA_FIELDS = ("shop_name", "description", "address", "landmark")
+OFFER_TA_FIELDS = ("title", "description")
+JOB_TA_FIELDS = ("job_title", "job_description", "shop_name", "address", "city_name")
+CITY_TA_FIELDS = ("city_name", "district", "state")
+CATEGORY_TA_FIELDS = ("name",)
+
+BATCH_SIZE = 100
+
+
+def ta_key(field: str) -> str:
+    return f"{field}_ta"
+
+
+def tamil_variants(values: dict, tamil_input: dict | None = None) -> dict:
+    """
+    {"<field>_ta": tamil} for the English `values`.
+    Tamil the user typed (lang=ta writes) is stored as-is; everything else
+    is translated in one batch. Fields the translator could not render are
+    left out, so reads fall back to runtime translation for them.
+    """
+    tamil_input = tamil_input or {}
+    out = {}
+    pending = {}
+
+    for field, value in values.items():
+        if not value or not isinstance(value, str):
+            continue
+        given = tamil_input.get(field)
+        if isinstance(given, str) and has_tamil(given):
+            out[ta_key(field)] = given
+        elif has_tamil(value):
+            out[ta_key(field)] = value
+        else:
+            pending[field] = value
+
+    done = en_to_ta_many(list(pending.values()))
+    for field, value in pending.items():
+        ta = done.get(value)
+        if ta and ta != value:
+            out[ta_key(field)] = ta
+
+    return out
+
+
+def apply_tamil_update(update: dict, fields, tamil_input: dict | None = None) -> dict:
+    """
+    Add *_ta for the fields changed in a $set payload. Returns the $unset
+    payload for renditions that went stale (new value not translatable).
+    """
+    changed = {f: update[f] for f in fields if f in update and ta_key(f) not in update}
+    update.update(tamil_variants(changed, tamil_input))
+    return {ta_key(f): "" for f in changed if ta_key(f) not in update}
+
+
+def stored_ta(doc: dict, fields) -> set:
+    """Fields of `doc` that carry a stored Tamil rendition (check before project_ta)."""
+    return {f for f in fields if doc and doc.get(ta_key(f))}
+
+
+def project_ta(doc: dict, fields, lang: str):
+    """
+    Drop the stored *_ta keys from a response doc; for lang=ta swap them
+    in place of the English value first.
+    """
+    if not doc:
+        return doc
+    for field in fields:
+        ta = doc.pop(ta_key(field), None)
+        if lang == "ta" and ta:
+            doc[field] = ta
+    return doc
+
+
+# ==================================================
+# BACKFILL (existing documents)
+# ==================================================
+def _missing_query(fields):
+    return {"$or": [
+        {field: {"$type": "string", "$ne": ""}, ta_key(field): {"$exists": False}}
+        for field in fields
+    ]}
+
+
+def _pending_values(doc, fields):
+    return {
+        f: doc.get(f) for f in fields
+        if isinstance(doc.get(f), str) and not doc.get(ta_key(f))
+    }
+
+
+def _backfill_collection(name, fields):
+    col = db[name]
+    projection = {f: 1 for f in fields} | {ta_key(f): 1 for f in fields}
+    updated = 0
+
+    batch = []
+    for doc in col.find(_missing_query(fields), projection):
+        batch.append(doc)
+        if len(batch) >= BATCH_SIZE:
+            updated += _flush_docs(col, batch, fields)
+            batch = []
+    if batch:
+        updated += _flush_docs(col, batch, fields)
+    return updated
+
+
+def _flush_docs(col, docs, fields):
+    # One translator call for the whole batch; per-doc lookups then hit cache
+    en_to_ta_many([v for d in docs for v in _pending_values(d, fields).values()])
+
+    ops = []
+    for doc in docs:
+        variants = tamil_variants(_pending_values(doc, fields))
+        if variants:
+            ops.append(UpdateOne({"_id": doc["_id"]}, {"$set": variants}))
+    if ops:
+        col.bulk_write(ops, ordered=False)
+    return len(ops)
+
+
+def _backfill_offers():
+    col = db["offers"]
+    updated = 0
+
+    for doc in col.find({"offers": {"$elemMatch": _missing_query(OFFER_TA_FIELDS)}}, {"offers": 1}):
+        offers = [o for o in doc.get("offers", []) if _pending_values(o, OFFER_TA_FIELDS)]
+        en_to_ta_many([v for o in offers for v in _pending_values(o, OFFER_TA_FIELDS).values()])
+
+        for o in offers:
+            variants = tamil_variants(_pending_values(o, OFFER_TA_FIELDS))
+            if not variants:
+                continue
+            col.update_one(
+                {"_id": doc["_id"]},
+                {"$set": {f"offers.$[o].{k}": v for k, v in variants.items()}},
+                array_filters=[{"o.offer_id": o.get("offer_id")}]
+            )
+            updated += 1
+    return updated
+
+
+def backfill_tamil_fields():
+    """Fill *_ta for documents written before they were stored. Idempotent."""
+    summary = {
+        "shop": _backfill_collection("shop", SHOP_TA_FIELDS),
+        "city": _backfill_collection("city", CITY_TA_FIELDS),
+        "category": _backfill_collection("category", CATEGORY_TA_FIELDS),
+        "jobs": _backfill_collection("jobs", JOB_TA_FIELDS),
+        "offers": _backfill_offers(),
+    }
+    return summary
+
+
+if __name__ == "__main__":
+    # python -m api.tamil_fields
+    print("✅ Tamil fields backfilled:", backfill_tamil_fields())
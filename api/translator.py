@@ -1,11 +1,171 @@
+import time
+import threading
+from contextvars import ContextVar
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
 from deep_translator import GoogleTranslator
-from cachetools import TTLCache
+from api.cache import get_translation, set_translation, get_translations, set_translations
 
 TA_EN_TRANSLATOR = GoogleTranslator(source="ta", target="en")
 EN_TA_TRANSLATOR = GoogleTranslator(source="en", target="ta")
 
 
-cache = TTLCache(maxsize=10000, ttl=86400)
+# =============================
+# Deadline + circuit breaker
+# =============================
+CALL_TIMEOUT = 2.0          # seconds per upstream call
+REQUEST_BUDGET = 4.0        # translator seconds per HTTP request
+BREAKER_THRESHOLD = 5       # consecutive failures before opening
+BREAKER_COOLDOWN = 30.0     # seconds open before one trial call
+
+# deep-translator has no timeout of its own; calls run here so the caller
+# can stop waiting. A stuck call only holds one of these threads.
+_pool = ThreadPoolExecutor(max_workers=8, thread_name_prefix="translator")
+_deadline = ContextVar("translation_deadline", default=None)
+
+translator_counters = {
+    "calls": 0, "timeouts": 0, "errors": 0,
+    "short_circuited": 0, "budget_exhausted": 0,
+    "breaker_opened": 0, "open_seconds": 0.0
+}
+
+
+class TranslatorUnavailable(Exception):
+    pass
+
+
+class CircuitBreaker:
+    def __init__(self, threshold: int, cooldown: float):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.failures = 0
+        self.open_since = None      # first opened (for open_seconds)
+        self.retry_at = 0.0         # next trial call allowed
+        self.lock = threading.Lock()
+
+    def allow(self) -> bool:
+        with self.lock:
+            if self.open_since is None:
+                return True
+            now = time.monotonic()
+            if now >= self.retry_at:
+                # half-open: let this call through, hold the rest back
+                self.retry_at = now + self.cooldown
+                return True
+            return False
+
+    def success(self):
+        with self.lock:
+            self.failures = 0
+            if self.open_since is not None:
+                translator_counters["open_seconds"] += time.monotonic() - self.open_since
+                self.open_since = None
+
+    def failure(self):
+        with self.lock:
+            self.failures += 1
+            if self.failures >= self.threshold and self.open_since is None:
+                self.open_since = time.monotonic()
+                self.retry_at = self.open_since + self.cooldown
+                translator_counters["breaker_opened"] += 1
+
+    def is_open(self) -> bool:
+        return self.open_since is not None
+
+
+breaker = CircuitBreaker(BREAKER_THRESHOLD, BREAKER_COOLDOWN)
+
+
+def start_request_budget(seconds: float = REQUEST_BUDGET):
+    return _deadline.set(time.monotonic() + seconds)
+
+
+def end_request_budget(token):
+    _deadline.reset(token)
+
+
+def guarded_translate(translator: GoogleTranslator, text: str) -> str:
+    """
+    translator.translate bounded by CALL_TIMEOUT and the request budget.
+    Raises TranslatorUnavailable instead of blocking or propagating errors.
+    """
+    if not breaker.allow():
+        translator_counters["short_circuited"] += 1
+        raise TranslatorUnavailable("circuit open")
+
+    timeout = CALL_TIMEOUT
+    deadline = _deadline.get()
+    if deadline is not None:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            translator_counters["budget_exhausted"] += 1
+            raise TranslatorUnavailable("request translation budget spent")
+        timeout = min(timeout, remaining)
+
+    translator_counters["calls"] += 1
+    future = _pool.submit(translator.translate, text)
+    try:
+        result = future.result(timeout=timeout)
+    except FutureTimeout:
+        translator_counters["timeouts"] += 1
+        breaker.failure()
+        raise TranslatorUnavailable("timeout")
+    except Exception as e:
+        translator_counters["errors"] += 1
+        breaker.failure()
+        raise TranslatorUnavailable(str(e))
+
+    breaker.success()
+    return result
+
+
+def translator_stats():
+    stats = dict(translator_counters)
+    if breaker.open_since is not None:
+        stats["open_seconds"] += time.monotonic() - breaker.open_since
+    stats["open_seconds"] = round(stats["open_seconds"], 1)
+    stats["breaker_open"] = breaker.is_open()
+    return stats
+
+
+# =============================
+# Phonetic fallback (short names)
+# =============================
+LETTER_MAP = {
+    "A": "ஏ", "B": "பி", "C": "சி", "D": "டி", "E": "ஈ",
+    "F": "எஃப்", "G": "ஜி", "H": "எச்", "I": "ஐ",
+    "J": "ஜே", "K": "கே", "L": "எல்", "M": "எம்",
+    "N": "என்", "O": "ஓ", "P": "பி", "Q": "க்யூ",
+    "R": "ஆர்", "S": "எஸ்", "T": "டி", "U": "யூ",
+    "V": "வி", "W": "டபிள்யூ", "X": "எக்ஸ்",
+    "Y": "வை", "Z": "ஸெட்"
+}
+
+
+def phonetic_tamil(text: str):
+    if not text:
+        return text
+
+    words = text.split()
+    out = []
+
+    for w in words:
+        if w.isalpha() and len(w) <= 5:
+            out.append(" ".join(LETTER_MAP.get(c.upper(), c) for c in w))
+        else:
+            out.append(w)
+
+    return " ".join(out)
+
+
+def en_fallback(text: str) -> str:
+    """What en_to_ta serves while the translator is unavailable."""
+    return phonetic_tamil(text) if len(text.split()) <= 3 else text
+
+
+def has_tamil(text: str) -> bool:
+    """Already Tamil (Unicode block U+0B80-U+0BFF) - nothing to translate."""
+    return any("\u0b80" <= ch <= "\u0bff" for ch in text)
+
 
 def should_translate(text: str):
     if not text:
@@ -25,13 +185,16 @@ def ta_to_en(text: str) -> str:
     if not should_translate(text):
         return text
 
-    key = f"ta_en:{text.strip().lower()}"
-    cached = cache.get(key)
+    cached = get_translation("ta_en", text)
     if cached:
         return cached
 
-    translated = TA_EN_TRANSLATOR.translate(text)
-    cache[key] = translated
+    try:
+        translated = guarded_translate(TA_EN_TRANSLATOR, text)
+    except TranslatorUnavailable:
+        return text
+
+    set_translation("ta_en", text, translated)
     return translated
 
 
@@ -39,14 +202,129 @@ def ta_to_en(text: str) -> str:
 # English → Tamil (API response)
 # =============================
 def en_to_ta(text: str) -> str:
-    if not text or text.isdigit():
+    if not text or text.isdigit() or has_tamil(text):
         return text
 
-    key = f"en_ta:{text.strip().lower()}"
-    cached = cache.get(key)
+    cached = get_translation("en_ta", text)
     if cached:
         return cached
 
-    translated = EN_TA_TRANSLATOR.translate(text)
-    cache[key] = translated
+    try:
+        translated = guarded_translate(EN_TA_TRANSLATOR, text)
+    except TranslatorUnavailable:
+        return en_fallback(text)
+
+    set_translation("en_ta", text, translated)
     return translated
+
+
+# =============================
+# English → Tamil (batched)
+# =============================
+# GoogleTranslator.translate_batch still issues one request per string, so
+# misses are joined with newlines into chunks under Google's 5000 char limit
+# and split back after a single request per chunk.
+BATCH_SEP = "\n"
+BATCH_MAX_CHARS = 4500
+
+
+def _batch_chunks(texts):
+    chunk, size = [], 0
+    for t in texts:
+        if BATCH_SEP in t:
+            yield [t]
+            continue
+        if chunk and size + len(t) + 1 > BATCH_MAX_CHARS:
+            yield chunk
+            chunk, size = [], 0
+        chunk.append(t)
+        size += len(t) + 1
+    if chunk:
+        yield chunk
+
+
+def _translate_chunk(chunk):
+    if len(chunk) == 1:
+        return [guarded_translate(EN_TA_TRANSLATOR, chunk[0])]
+
+    joined = guarded_translate(EN_TA_TRANSLATOR, BATCH_SEP.join(chunk)) or ""
+    parts = joined.split(BATCH_SEP)
+    if len(parts) == len(chunk):
+        return [p.strip() for p in parts]
+
+    # Separator got merged by the backend - translate one by one
+    return [guarded_translate(EN_TA_TRANSLATOR, t) for t in chunk]
+
+
+def en_to_ta_many(texts) -> dict:
+    """
+    {text: tamil} for every text. Duplicates are translated once, cache hits
+    are resolved in one lookup and misses cost one backend call per chunk.
+    On backend errors / open circuit the source text is returned (and not
+    cached), so callers apply their own fallbacks.
+    """
+    unique = [t for t in dict.fromkeys(texts) if isinstance(t, str)]
+    out = {t: t for t in unique if not t or t.isdigit() or has_tamil(t)}
+    pending = [t for t in unique if t not in out]
+
+    out.update(get_translations("en_ta", pending))
+    misses = [t for t in pending if t not in out]
+
+    fresh = {}
+    for chunk in _batch_chunks(misses):
+        try:
+            results = _translate_chunk(chunk)
+        except TranslatorUnavailable as e:
+            print("❌ Batch translation error:", e)
+            results = [None] * len(chunk)
+
+        for src, dst in zip(chunk, results):
+            if dst:
+                fresh[src] = dst
+            out[src] = dst or src
+
+    set_translations("en_ta", fresh)
+    return out
+
+
+# =============================
+# Response tree helpers
+# =============================
+def collect_strings(obj, skip_keys=(), list_items=True, out=None):
+    """Every string leaf of obj, ignoring values under skip_keys."""
+    if out is None:
+        out = []
+    if isinstance(obj, dict):
+        for k, v in obj.items():
+            if k in skip_keys:
+                continue
+            if isinstance(v, str):
+                out.append(v)
+            else:
+                collect_strings(v, skip_keys, list_items, out)
+    elif isinstance(obj, list):
+        for i in obj:
+            if isinstance(i, str):
+                if list_items:
+                    out.append(i)
+            else:
+                collect_strings(i, skip_keys, list_items, out)
+    return out
+
+
+def map_strings(obj, fn, skip_keys=(), list_items=True):
+    """Copy of obj with fn applied to the same leaves collect_strings visits."""
+    if isinstance(obj, dict):
+        return {
+            k: v if k in skip_keys
+            else fn(v) if isinstance(v, str)
+            else map_strings(v, fn, skip_keys, list_items)
+            for k, v in obj.items()
+        }
+    if isinstance(obj, list):
+        return [
+            (fn(i) if list_items else i) if isinstance(i, str)
+            else map_strings(i, fn, skip_keys, list_items)
+            for i in obj
+        ]
+    return obj
@@ -0,0 +1,200 @@
+import os
+import uuid
+import hashlib
+import tempfile
+
+# ==================================================
+# UPLOAD PIPELINE
+# One pass over the upload in CHUNK_SIZE pieces: sniff the magic bytes of
+# the first chunk, enforce the per-kind size limit, hash, and write to a
+# temp file in the destination directory that is renamed into place at
+# the end. Memory per upload is one chunk whatever the file size.
+# Starlette spools a multipart body to disk before any of this runs, so
+# BodyLimit (below) caps the request itself at MAX_REQUEST_BYTES.
+# ==================================================
+CHUNK_SIZE = 1024 * 1024      # 1 MiB
+
+MAX_BYTES = {
+    "image": 10 * 1024 * 1024,     # 10 MiB
+    "video": 100 * 1024 * 1024,    # 100 MiB
+}
+
+
+# Largest file plus room for the other form fields / a few images
+MAX_REQUEST_BYTES = int(os.getenv("MAX_REQUEST_BYTES", 110 * 1024 * 1024))
+
+
+class UploadRejected(Exception):
+    """Bad upload: unknown / disallowed type or too large. str(e) is user-facing."""
+
+
+# ---------------- MAGIC BYTES ----------------
+MP4_BRANDS = (b"isom", b"iso2", b"mp41", b"mp42", b"avc1", b"dash", b"M4V ")
+
+
+def sniff(head: bytes):
+    """(kind, ext) from the first bytes of a file, or (None, None)."""
+    if head.startswith(b"\xff\xd8\xff"):
+        return "image", "jpg"
+    if head.startswith(b"\x89PNG\r\n\x1a\n"):
+        return "image", "png"
+    if head[:6] in (b"GIF87a", b"GIF89a"):
+        return "image", "gif"
+    if head[:4] == b"RIFF" and head[8:12] == b"WEBP":
+        return "image", "webp"
+    if head[4:8] == b"ftyp":
+        brand = head[8:12]
+        if brand in (b"heic", b"heix", b"mif1", b"msf1"):
+            return "image", "heic"
+        if brand == b"qt  ":
+            return "video", "mov"
+        # AVIF, M4A audio and other ISO-BMFF brands are not offer videos
+        if brand in MP4_BRANDS:
+            return "video", "mp4"
+        return None, None
+    if head.startswith(b"\x1a\x45\xdf\xa3"):
+        return "video", "webm"
+    if head[:4] == b"RIFF" and head[8:12] == b"AVI ":
+        return "video", "avi"
+    return None, None
+
+
+# ---------------- INSPECT ----------------
+def inspect_upload(upload, allowed=("image", "video")) -> dict:
+    """
+    Read-only pass: {"kind", "ext", "size", "sha256"} without writing
+    anything (lets the blob store skip the write for content it has).
+    """
+    src = upload.file
+    src.seek(0)
+    chunk = src.read(CHUNK_SIZE)
+
+    kind, ext = sniff(chunk)
+    if kind not in allowed:
+        raise UploadRejected("Invalid file type")
+    limit = MAX_BYTES[kind]
+
+    digest = hashlib.sha256()
+    size = 0
+    while chunk:
+        size += len(chunk)
+        if size > limit:
+            raise UploadRejected(f"File too large (max {limit // (1024 * 1024)} MB for {kind})")
+        digest.update(chunk)
+        chunk = src.read(CHUNK_SIZE)
+
+    return {"kind": kind, "ext": ext, "size": size, "sha256": digest.hexdigest()}
+
+
+# ---------------- SAVE ----------------
+def save_upload(upload, dest_dir: str, name: str | None = None, allowed=("image", "video")) -> dict:
+    """
+    Stream `upload` (a FastAPI UploadFile) to dest_dir/<name>.<ext>.
+    Returns {"path", "filename", "kind", "ext", "size", "sha256"};
+    raises UploadRejected before anything is left on disk.
+    """
+    src = upload.file
+    src.seek(0)
+    head = src.read(CHUNK_SIZE)
+
+    kind, ext = sniff(head)
+    if kind not in allowed:
+        raise UploadRejected("Invalid file type")
+    limit = MAX_BYTES[kind]
+
+    os.makedirs(dest_dir, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=dest_dir, suffix=".part")
+    digest = hashlib.sha256()
+    size = 0
+
+    try:
+        with os.fdopen(fd, "wb") as out:
+            chunk = head
+            while chunk:
+                size += len(chunk)
+                if size > limit:
+                    raise UploadRejected(f"File too large (max {limit // (1024 * 1024)} MB for {kind})")
+                digest.update(chunk)
+                out.write(chunk)
+                chunk = src.read(CHUNK_SIZE)
+
+        filename = f"{name or uuid.uuid4()}.{ext}"
+        path = os.path.join(dest_dir, filename)
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
+
+    return {
+        "path": path,
+        "filename": filename,
+        "kind": kind,
+        "ext": ext,
+        "size": size,
+        "sha256": digest.hexdigest(),
+    }
+
+
+# ---------------- REQUEST LIMIT ----------------
+class BodyLimit:
+    """
+    ASGI middleware: 413 for a request body over `limit` bytes. A declared
+    Content-Length is refused before anything is read; a chunked body is
+    counted as it streams and ends at the limit (the app sees a disconnect,
+    and whatever it answers is replaced by the 413).
+    """
+
+    def __init__(self, app, limit: int = MAX_REQUEST_BYTES):
+        self.app = app
+        self.limit = limit
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        declared = dict(scope.get("headers") or []).get(b"content-length")
+        if declared and declared.isdigit() and int(declared) > self.limit:
+            return await self._reject(send)
+
+        received = 0
+        over = False
+        rejected = False
+
+        async def limited_receive():
+            nonlocal received, over
+            if over:
+                return {"type": "http.disconnect"}
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > self.limit:
+                    over = True
+                    return {"type": "http.disconnect"}
+            return message
+
+        async def limited_send(message):
+            nonlocal rejected
+            if not over:
+                return await send(message)
+            if not rejected:
+                rejected = True
+                await self._reject(send)
+
+        try:
+            await self.app(scope, limited_receive, limited_send)
+        except Exception:
+            if not over:
+                raise
+            if not rejected:
+                await self._reject(send)
+
+    async def _reject(self, send):
+        body = ('{"status": "error", "message": "Request too large (max %d MB)"}'
+                % (self.limit // (1024 * 1024))).encode()
+        await send({"type": "http.response.start", "status": 413,
+                    "headers": [(b"content-type", b"application/json"),
+                                (b"content-length", str(len(body)).encode())]})
+        await send({"type": "http.response.body", "body": body})
@@ -0,0 +1,261 @@
+import os
+import sys
+import hmac
+import json
+import time
+import uuid
+import hashlib
+import threading
+from datetime import datetime, timedelta
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError, PyMongoError
+from api.common_urldb import db
+
+# ==================================================
+# RAZORPAY WEBHOOK INBOX
+# The webhook route only verifies the signature and stores the raw event
+# here, keyed by Razorpay's event id (_id, so a retried delivery is a
+# no-op), then answers. A worker thread drains the inbox in batches and
+# applies each event with payments.process_webhook_event.
+# webhook_inbox: {_id: event_id, event, body, status, attempts, due_at,
+#                 lease_until, received_at, processed_at, error, steps}
+# status: pending -> processing -> done | failed (after MAX_ATTEMPTS)
+# ==================================================
+BATCH_SIZE = 50
+POLL_INTERVAL = 5           # seconds; a new delivery wakes the worker at once
+LEASE = timedelta(minutes=2)
+MAX_ATTEMPTS = 8
+RETRY_BASE = 30             # seconds, doubled per attempt
+
+col_inbox = db["webhook_inbox"]
+
+_wake = threading.Event()
+_worker = None
+_stats_lock = threading.Lock()
+_stats = {}     # event -> counters
+
+
+# ---------------- SIGNATURE ----------------
+def sign(payload: bytes, secret: str | None = None) -> str:
+    secret = secret or os.getenv("RAZORPAY_WEBHOOK_SECRET") or ""
+    return hmac.new(secret.encode(), payload, hashlib.sha256).hexdigest()
+
+
+def signature_ok(payload: bytes, signature, secret: str | None = None) -> bool:
+    return bool(signature) and hmac.compare_digest(sign(payload, secret), signature)
+
+
+# ---------------- RECEIVE ----------------
+def record_event(payload: bytes, event_id: str | None = None) -> bool:
+    """
+    Store a verified delivery. False if this event id was already stored.
+    Without Razorpay's x-razorpay-event-id header the payload hash is the id.
+    Raises ValueError for a body that is not a JSON object (never stored:
+    the worker could only fail on it).
+    """
+    try:
+        body = payload.decode()
+        data = json.loads(body)
+    except ValueError:
+        raise ValueError("Malformed webhook body")
+    if not isinstance(data, dict):
+        raise ValueError("Malformed webhook body")
+
+    event_id = event_id or hashlib.sha256(payload).hexdigest()
+    now = datetime.utcnow()
+    try:
+        col_inbox.insert_one({
+            "_id": event_id,
+            "event": data.get("event"),
+            "body": body,
+            "status": "pending",
+            "attempts": 0,
+            "due_at": now,
+            "received_at": now,
+            "steps": [],
+        })
+    except DuplicateKeyError:
+        return False
+    _wake.set()
+    return True
+
+
+def run_once(event_id, step: str, fn, *args, **kwargs):
+    """
+    fn(*args, **kwargs) unless `step` (a notification, a mail) already ran
+    for this event, so a retried or replayed event never repeats it. The
+    step is claimed before the call and given back if the call raises, so
+    a failed send is tried again with the event. Direct calls without an
+    inbox event always run.
+    """
+    if not event_id:
+        return fn(*args, **kwargs)
+    res = col_inbox.update_one({"_id": event_id, "steps": {"$ne": step}},
+                               {"$addToSet": {"steps": step}})
+    if res.modified_count != 1:
+        return None
+    try:
+        return fn(*args, **kwargs)
+    except BaseException:
+        col_inbox.update_one({"_id": event_id}, {"$pull": {"steps": step}})
+        raise
+
+
+# ---------------- PROCESS ----------------
+def _claim(now):
+    return col_inbox.find_one_and_update(
+        {"$or": [{"status": "pending", "due_at": {"$lte": now}},
+                 {"status": "processing", "lease_until": {"$lt": now}}]},
+        {"$set": {"status": "processing", "lease_until": now + LEASE}, "$inc": {"attempts": 1}},
+        sort=[("received_at", 1)],
+        return_document=ReturnDocument.AFTER
+    )
+
+
+def _record_stats(event, seconds, lag, ok):
+    with _stats_lock:
+        s = _stats.setdefault(event or "unknown", {
+            "processed": 0, "errors": 0, "total_ms": 0.0, "max_ms": 0.0, "total_lag_ms": 0.0, "max_lag_ms": 0.0
+        })
+        if not ok:
+            s["errors"] += 1
+            return
+        s["processed"] += 1
+        s["total_ms"] += seconds * 1000
+        s["max_ms"] = max(s["max_ms"], seconds * 1000)
+        s["total_lag_ms"] += lag * 1000
+        s["max_lag_ms"] = max(s["max_lag_ms"], lag * 1000)
+
+
+def process_one(doc) -> bool:
+    from api.payments import process_webhook_event
+
+    started = time.perf_counter()
+    try:
+        process_webhook_event(json.loads(doc["body"]), event_id=doc["_id"])
+    except Exception as e:
+        print("❌ Webhook event error:", doc["_id"], doc.get("event"), e)
+        failed = doc["attempts"] >= MAX_ATTEMPTS
+        col_inbox.update_one({"_id": doc["_id"]}, {"$set": {
+            "status": "failed" if failed else "pending",
+            "due_at": datetime.utcnow() + timedelta(seconds=RETRY_BASE * 2 ** (doc["attempts"] - 1)),
+            "error": str(e),
+        }})
+        _record_stats(doc.get("event"), 0, 0, ok=False)
+        return False
+
+    now = datetime.utcnow()
+    col_inbox.update_one({"_id": doc["_id"]},
+                         {"$set": {"status": "done", "processed_at": now, "error": None}})
+    _record_stats(doc.get("event"), time.perf_counter() - started,
+                  (now - doc["received_at"]).total_seconds(), ok=True)
+    return True
+
+
+def drain(batch: int = BATCH_SIZE) -> int:
+    """Apply up to `batch` due events, oldest first. Safe to run in several processes."""
+    done = 0
+    for _ in range(batch):
+        doc = _claim(datetime.utcnow())
+        if not doc:
+            break
+        done += process_one(doc)
+    return done
+
+
+def _drain_loop():
+    while True:
+        _wake.wait(POLL_INTERVAL)
+        _wake.clear()
+        try:
+            while drain() == BATCH_SIZE:
+                pass
+        except PyMongoError as e:
+            print("❌ Webhook inbox drain error:", e)
+
+
+def start_webhook_worker():
+    global _worker
+    if _worker is None:
+        _worker = threading.Thread(target=_drain_loop, name="webhook-inbox", daemon=True)
+        _worker.start()
+
+
+# ---------------- REPLAY / STATS ----------------
+def replay(*event_ids, failed=False) -> int:
+    """Queue events again. Steps already done (notifications, mails) are not repeated."""
+    query = {"_id": {"$in": list(event_ids)}} if event_ids else {"status": "failed"} if failed else None
+    if query is None:
+        return 0
+    res = col_inbox.update_many(query, {"$set": {"status": "pending", "attempts": 0,
+                                                 "due_at": datetime.utcnow(), "error": None}})
+    _wake.set()
+    return res.modified_count
+
+
+def inbox_stats():
+    with _stats_lock:
+        per_event = {}
+        for event, s in _stats.items():
+            n = s["processed"] or 1
+            per_event[event] = {
+                "processed": s["processed"],
+                "errors": s["errors"],
+                "avg_ms": round(s["total_ms"] / n, 1),
+                "max_ms": round(s["max_ms"], 1),
+                "avg_lag_ms": round(s["total_lag_ms"] / n, 1),
+                "max_lag_ms": round(s["max_lag_ms"], 1),
+            }
+    backlog = {row["_id"]: row["n"] for row in col_inbox.aggregate([
+        {"$match": {"status": {"$in": ["pending", "processing", "failed"]}}},
+        {"$group": {"_id": "$status", "n": {"$sum": 1}}}
+    ])}
+    return {"events": per_event, "backlog": backlog}
+
+
+# ---------------- FAKE PAYLOADS (local testing) ----------------
+def fake_event(event: str, secret: str | None = None, **notes) -> tuple[bytes, dict]:
+    """
+    A Razorpay-shaped delivery for `event` with a valid signature:
+    (body, headers) ready to POST to /payment/webhook/ or pass to record_event.
+    notes: user_id, plan, payment_id, order_id, subscription_id, amount (rupees).
+    """
+    sub_id = notes.get("subscription_id") or f"sub_{uuid.uuid4().hex[:14]}"
+    amount = int(notes.get("amount", 499)) * 100
+    entities = {
+        "payment.captured": {"payment": {"entity": {
+            "id": notes.get("payment_id") or f"pay_{uuid.uuid4().hex[:14]}",
+            "order_id": notes.get("order_id") or f"order_{uuid.uuid4().hex[:14]}",
+            "amount": amount, "currency": "INR", "status": "captured"}}},
+        "subscription.activated": {"subscription": {"entity": {
+            "id": sub_id, "status": "active",
+            "notes": {"user_id": notes.get("user_id"), "plan": notes.get("plan", "silver")}}}},
+        "invoice.paid": {"invoice": {"entity": {
+            "id": f"inv_{uuid.uuid4().hex[:14]}", "subscription_id": sub_id, "amount_paid": amount}}},
+        "subscription.cancelled": {"subscription": {"entity": {"id": sub_id, "status": "cancelled"}}},
+    }
+    if event not in entities:
+        raise ValueError(f"Unknown event {event}")
+
+    body = json.dumps({"entity": "event", "event": event, "payload": entities[event],
+                       "created_at": int(time.time())}).encode()
+    headers = {"X-Razorpay-Signature": sign(body, secret),
+               "X-Razorpay-Event-Id": f"evt_{uuid.uuid4().hex[:14]}",
+               "Content-Type": "application/json"}
+    return body, headers
+
+
+if __name__ == "__main__":
+    # python -m api.webhook_inbox drain
+    # python -m api.webhook_inbox replay --failed | EVENT_ID [EVENT_ID ...]
+    # python -m api.webhook_inbox fake EVENT [key=value ...]
+    cmd, args = sys.argv[1:2], sys.argv[2:]
+    if cmd == ["drain"]:
+        print("✅ Events applied:", drain())
+    elif cmd == ["replay"] and args:
+        print("✅ Events queued:", replay(failed=True) if args == ["--failed"] else replay(*args))
+    elif cmd == ["fake"] and args:
+        body, headers = fake_event(args[0], **dict(a.split("=", 1) for a in args[1:]))
+        print(json.dumps({"headers": headers, "body": body.decode()}, indent=2))
+    else:
+        print("usage: python -m api.webhook_inbox drain | replay --failed | replay EVENT_ID ... | fake EVENT [k=v ...]")
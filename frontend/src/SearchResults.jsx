@@ -269,6 +269,7 @@ export default function SearchResults() {
   const [loadingMore, setLoadingMore] = useState(false); // Scroll load
   const [page, setPage] = useState(1);
   const [hasMore, setHasMore] = useState(true);
+  const [nextCursor, setNextCursor] = useState("");
 
   // --- Fetch Function ---
   const fetchResults = async (pageNum, isInitial = false) => {
@@ -276,12 +277,15 @@ export default function SearchResults() {
     else setLoadingMore(true);
 
     try {
+      // Keyset paging: first page sends an empty cursor, later pages send next_cursor
+      const cursor = isInitial ? "" : nextCursor;
       const res = await fetch(
-        `${BACKEND_URL}/shop/search/?name=${encodeURIComponent(category)}&place=${encodeURIComponent(city)}&lang=${lang}&page=${pageNum}`
+        `${BACKEND_URL}/shop/search/?name=${encodeURIComponent(category)}&place=${encodeURIComponent(city)}&lang=${lang}&cursor=${encodeURIComponent(cursor)}`
       );
       const json = await res.json();
       const newData = json.data || [];
       const backendHasMore = json.has_more;
+      setNextCursor(json.next_cursor || "");
 
       if (isInitial) {
         setResults(newData);
@@ -310,6 +314,7 @@ export default function SearchResults() {
   useEffect(() => {
     setPage(1);
     setHasMore(true);
+    setNextCursor("");
     setResults([]);
     fetchResults(1, true);
     // eslint-disable-next-line react-hooks/exhaustive-deps
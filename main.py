@@ -1,7 +1,8 @@
-from fastapi import FastAPI
+from fastapi import FastAPI, Request, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
 import os
+from pathlib import Path
 # Import Routers
 from api.search_shops import router as search_router
 from api.shop_owner_details import router as owner_router
@@ -17,6 +18,15 @@ from api.otp_mail import router as otp_router
 from api.notifications_setting import router as notification_settings_router
 from api.shop_views import router as shop_views_router
 from api.register_automatic import router as register_auto
+from api.media_serving import router as media_router
+from api.uploads import BodyLimit
+from api.indexes import ensure_indexes
+from api.catalog import start_catalog
+from api.webhook_inbox import start_webhook_worker, inbox_stats
+from api.scheduler import start_scheduler, scheduler_status
+from api.email_outbox import start_email_dispatcher, outbox_stats
+from api.translator import start_request_budget, end_request_budget, translator_stats
+from api.cache import cache_stats
 app = FastAPI(
     title="RK-DIAL API",
     description="API endpoints for RK-Dial Application",
@@ -30,7 +40,21 @@ MEDIA_DIR = "media"
 if not os.path.exists(MEDIA_DIR):
     os.makedirs(MEDIA_DIR)
 
-app.mount("/media", StaticFiles(directory=MEDIA_DIR), name="media")
+# /media/... with ETags, ranges and immutable caching (api/media_serving.py)
+app.include_router(media_router)
+
+# Translation time budget per request (see api/translator.py)
+@app.middleware("http")
+async def translation_budget(request: Request, call_next):
+    token = start_request_budget()
+    try:
+        return await call_next(request)
+    finally:
+        end_request_budget(token)
+
+
+# Request size cap, before Starlette spools a multipart body (api/uploads.py)
+app.add_middleware(BodyLimit)
 
 # CORS
 app.add_middleware(
@@ -39,6 +63,7 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+PROJECT_ROOT = Path(__file__).resolve().parent
 DOWNLOAD_DIR = PROJECT_ROOT / "downloads"
 DOWNLOAD_DIR.mkdir(exist_ok=True)
 
@@ -64,6 +89,58 @@ app.include_router(otp_router)
 app.include_router(notification_settings_router)
 app.include_router(shop_views_router)
 app.include_router(register_auto)
+
+
+@app.on_event("startup")
+def startup_indexes():
+    ensure_indexes()
+
+
+@app.on_event("startup")
+def startup_catalog():
+    start_catalog()
+
+
+@app.on_event("startup")
+def startup_webhook_worker():
+    start_webhook_worker()
+
+
+@app.on_event("startup")
+def startup_scheduler():
+    start_scheduler()
+
+
+@app.on_event("startup")
+def startup_email_dispatcher():
+    start_email_dispatcher()
+
+
+@app.get("/stats/translation/")
+def translation_stats():
+    return {"translator": translator_stats(), "cache": cache_stats()}
+
+
+@app.get("/stats/webhooks/")
+def webhook_stats():
+    return inbox_stats()
+
+
+@app.get("/stats/outbox/")
+def email_outbox_stats():
+    return outbox_stats()
+
+
+# Periodic jobs: schedule, last run / duration / outcome, current lease holder.
+# Needs the X-Admin-Token header to match ADMIN_TOKEN; closed while it is unset.
+@app.get("/admin/scheduler/")
+def admin_scheduler(request: Request):
+    token = os.getenv("ADMIN_TOKEN")
+    if not token or request.headers.get("x-admin-token") != token:
+        raise HTTPException(status_code=403, detail="Forbidden")
+    return scheduler_status()
+
+
 # Root
 @app.get("/")
 def root():
@@ -0,0 +1,42 @@
+import sys
+import json
+from http.server import BaseHTTPRequestHandler, HTTPServer
+
+# ==================================================
+# LOCAL SENDGRID STAND-IN
+# For the outbox tests, or by hand against a dev server:
+#   python tests/sendgrid_stub.py [PORT]
+#   SENDGRID_API_URL=http://127.0.0.1:PORT/v3/mail/send
+# ==================================================
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    """
+    Accepts /v3/mail/send like SendGrid (202) and prints what it got.
+    statuses: answers to give first (e.g. [429, 503]); reject: addresses
+    that get a 400 whenever they are in the request; received: bodies.
+    """
+    statuses = []
+    reject = set()
+    received = []
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+        to = [p["to"][0]["email"] for p in body.get("personalizations", [])]
+        self.received.append(body)
+        print(f"📨 {body.get('subject')!r} -> {to}")
+        status = self.statuses.pop(0) if self.statuses else 400 if self.reject & set(to) else 202
+        self.send_response(status)
+        self.end_headers()
+
+    def log_message(self, *args):
+        pass
+
+
+def run_stub(port: int = 8025):
+    print(f"ℹ️ SendGrid stand-in on http://127.0.0.1:{port}/v3/mail/send")
+    HTTPServer(("127.0.0.1", port), StubHandler).serve_forever()
+
+
+if __name__ == "__main__":
+    run_stub(int(sys.argv[1]) if sys.argv[1:] else 8025)
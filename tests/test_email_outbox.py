@@ -0,0 +1,197 @@
+import os
+import uuid
+import threading
+from datetime import datetime, timedelta
+from http.server import HTTPServer
+import pytest
+
+pymongo = pytest.importorskip("pymongo")
+pytest.importorskip("requests")
+
+from api import email_outbox as outbox
+from sendgrid_stub import StubHandler
+
+# A scratch database per test, dropped afterwards
+MONGO_URL = os.getenv("TEST_MONGO_URL") or os.getenv("MONGO_URL") or "mongodb://localhost:27017"
+
+TEMPLATE = ("Your Plan Expires Today", "<p>Your <b>-plan-</b> plan expires -expiry-.</p>")
+
+
+@pytest.fixture
+def stub(monkeypatch):
+    """StubHandler on an ephemeral port, with its own answer / request lists."""
+    handler = type("Stub", (StubHandler,), {"statuses": [], "reject": set(), "received": []})
+    server = HTTPServer(("127.0.0.1", 0), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    monkeypatch.setattr(outbox, "SENDGRID_API_URL", f"http://127.0.0.1:{server.server_port}/v3/mail/send")
+    yield handler
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def col(monkeypatch):
+    client = pymongo.MongoClient(MONGO_URL, serverSelectionTimeoutMS=500)
+    try:
+        client.admin.command("ping")
+    except pymongo.errors.PyMongoError:
+        pytest.skip("MongoDB not reachable")
+
+    test_db = client[f"outbox_test_{uuid.uuid4().hex[:8]}"]
+    monkeypatch.setattr(outbox, "db", test_db)
+    monkeypatch.setattr(outbox, "col_outbox", test_db["email_outbox"])
+    monkeypatch.setattr(outbox, "MAIL_RATE", 0)
+    yield test_db["email_outbox"]
+    client.drop_database(test_db.name)
+
+
+def _mail(to, plan="silver", template=TEMPLATE):
+    return (to, *template, {"-plan-": plan.upper(), "-expiry-": "17-10-2026"})
+
+
+def _make_due(col):
+    col.update_many({"status": "pending"}, {"$set": {"due_at": datetime.utcnow()}})
+
+
+def _statuses(col):
+    return {d["to"]: d["status"] for d in col.find()}
+
+
+def test_same_template_goes_out_as_one_request(stub, col):
+    outbox.enqueue_many([_mail("a@x.in"), _mail("b@x.in", "gold"), _mail("c@x.in"),
+                         _mail("d@x.in", template=("Payment Successful", "<p>Thanks</p>"))])
+
+    summary = outbox.dispatch()
+
+    assert summary == {"claimed": 4, "sent": 4, "retry": 0, "failed": 0, "requests": 2}
+    batched = next(b for b in stub.received if b["subject"] == TEMPLATE[0])
+    assert [p["to"][0]["email"] for p in batched["personalizations"]] == ["a@x.in", "b@x.in", "c@x.in"]
+    assert batched["personalizations"][1]["substitutions"] == {"-plan-": "GOLD", "-expiry-": "17-10-2026"}
+    assert batched["content"][0]["value"] == TEMPLATE[1]
+    assert set(_statuses(col).values()) == {"sent"}
+
+
+@pytest.mark.parametrize("status", [429, 503])
+def test_transient_errors_back_off_then_send(stub, col, status):
+    outbox.enqueue_many([_mail("a@x.in"), _mail("b@x.in")])
+
+    stub.statuses[:] = [status]
+    before = datetime.utcnow()
+    assert outbox.dispatch()["retry"] == 2
+    for d in col.find():
+        assert (d["status"], d["attempts"]) == ("pending", 1)
+        assert timedelta(seconds=outbox.RETRY_BASE - 1) < d["due_at"] - before < timedelta(seconds=outbox.RETRY_BASE + 5)
+
+    # Not due yet: nothing is claimed
+    assert outbox.dispatch()["claimed"] == 0
+
+    stub.statuses[:] = [status]
+    _make_due(col)
+    before = datetime.utcnow()
+    outbox.dispatch()
+    for d in col.find():
+        assert d["attempts"] == 2
+        assert d["due_at"] - before > timedelta(seconds=2 * outbox.RETRY_BASE - 1)
+
+    _make_due(col)
+    assert outbox.dispatch()["sent"] == 2
+    assert set(_statuses(col).values()) == {"sent"}
+
+
+def test_failed_after_max_attempts(stub, col, monkeypatch):
+    monkeypatch.setattr(outbox, "MAX_ATTEMPTS", 3)
+    stub.statuses[:] = [500] * 10
+    outbox.enqueue_many([_mail("a@x.in")])
+
+    for _ in range(outbox.MAX_ATTEMPTS):
+        _make_due(col)
+        outbox.dispatch()
+
+    doc = col.find_one()
+    assert (doc["status"], doc["attempts"], doc["retryable"]) == ("failed", 3, True)
+    assert doc["error"].startswith("500")
+    _make_due(col)
+    assert outbox.dispatch()["claimed"] == 0
+
+
+def test_rejected_address_fails_alone(stub, col):
+    stub.reject = {"bad@x.in"}
+    outbox.enqueue_many([_mail("a@x.in"), _mail("b@x.in"), _mail("bad@x.in"), _mail("c@x.in")])
+
+    summary = outbox.dispatch()
+
+    # [a b bad c] -> [a b] ok, [bad c] -> [bad] rejected, [c] ok
+    assert summary == {"claimed": 4, "sent": 3, "retry": 0, "failed": 1, "requests": 5}
+    assert _statuses(col) == {"a@x.in": "sent", "b@x.in": "sent", "bad@x.in": "failed", "c@x.in": "sent"}
+    assert col.find_one({"to": "bad@x.in"})["retryable"] is False
+
+
+def test_keyed_mail_flags_on_sent_and_is_not_queued_twice(stub, col):
+    payments = outbox.db["payments"]
+    payments.insert_one({"_id": "pay_1"})
+    hook = {"collection": "payments", "_id": "pay_1", "set": {"expiry_mail_today_sent": True}}
+    mail = (*_mail("a@x.in"), "expiry_mail_today_sent:pay_1", hook)
+
+    stub.statuses[:] = [503]
+    assert outbox.enqueue_many([mail]) == 1
+    outbox.dispatch()
+    assert "expiry_mail_today_sent" not in payments.find_one({"_id": "pay_1"})
+    assert outbox.enqueue_many([mail]) == 0
+
+    _make_due(col)
+    outbox.dispatch()
+    assert payments.find_one({"_id": "pay_1"})["expiry_mail_today_sent"] is True
+    assert outbox.enqueue_many([mail]) == 0
+    assert col.count_documents({}) == 1
+
+
+# ---------------- WITHOUT A LIVE MONGO ----------------
+def test_rejected_batch_is_halved_down_to_the_bad_address(monkeypatch):
+    requests_made = []
+
+    def fake_post(subject, html, mails):
+        to = [m["to"] for m in mails]
+        requests_made.append(to)
+        return (False, "400 Bad Request") if "bad@x.in" in to else None
+
+    monkeypatch.setattr(outbox, "_post", fake_post)
+    mails = [{"to": to} for to in ("a@x.in", "b@x.in", "bad@x.in", "c@x.in")]
+    summary = {"requests": 0}
+
+    results = outbox._deliver(*TEMPLATE, mails, summary)
+
+    assert requests_made == [["a@x.in", "b@x.in", "bad@x.in", "c@x.in"], ["a@x.in", "b@x.in"],
+                             ["bad@x.in", "c@x.in"], ["bad@x.in"], ["c@x.in"]]
+    assert summary["requests"] == 5
+    assert [([m["to"] for m in sent], outcome) for sent, outcome in results] == [
+        (["a@x.in", "b@x.in"], None), (["bad@x.in"], (False, "400 Bad Request")), (["c@x.in"], None)]
+
+
+@pytest.mark.parametrize("status", [429, 503])
+def test_transient_rejection_is_not_split(monkeypatch, status):
+    monkeypatch.setattr(outbox, "_post", lambda subject, html, mails: (True, f"{status}"))
+    summary = {"requests": 0}
+
+    results = outbox._deliver(*TEMPLATE, [{"to": "a@x.in"}, {"to": "b@x.in"}], summary)
+
+    assert summary["requests"] == 1
+    assert len(results) == 1
+
+
+def test_mark_sent_applies_on_sent_flags(monkeypatch):
+    mongomock = pytest.importorskip("mongomock")
+    test_db = mongomock.MongoClient().db
+    monkeypatch.setattr(outbox, "db", test_db)
+    monkeypatch.setattr(outbox, "col_outbox", test_db["email_outbox"])
+
+    test_db["payments"].insert_many([{"_id": "pay_1"}, {"_id": "pay_2"}, {"_id": "pay_3"}])
+    hook = lambda pid: {"collection": "payments", "_id": pid, "set": {"expiry_mail_today_sent": True}}
+    outbox.enqueue_many([(*_mail("a@x.in"), "today:pay_1", hook("pay_1")),
+                         (*_mail("b@x.in"), "today:pay_2", hook("pay_2")),
+                         _mail("c@x.in")])
+
+    outbox._mark_sent(list(test_db["email_outbox"].find({"to": {"$in": ["a@x.in", "c@x.in"]}})))
+
+    flags = {d["_id"]: d.get("expiry_mail_today_sent") for d in test_db["payments"].find()}
+    assert flags == {"pay_1": True, "pay_2": None, "pay_3": None}
+    assert _statuses(test_db["email_outbox"]) == {"a@x.in": "sent", "b@x.in": "pending", "c@x.in": "sent"}
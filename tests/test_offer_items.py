@@ -0,0 +1,88 @@
+import os
+import uuid
+import pytest
+
+pymongo = pytest.importorskip("pymongo")
+pytest.importorskip("multipart")
+
+from bson import ObjectId
+import api.offer_items as offer_items
+import api.shop_owner_details as owner
+import api.tamil_fields as tamil_fields
+
+# A scratch database per test, dropped afterwards
+MONGO_URL = os.getenv("TEST_MONGO_URL") or os.getenv("MONGO_URL") or "mongodb://localhost:27017"
+
+
+def _wire(monkeypatch, test_db):
+    monkeypatch.setattr(owner, "col_offers", test_db["offers"])
+    monkeypatch.setattr(offer_items, "col_offers", test_db["offers"])
+    monkeypatch.setattr(offer_items, "col_offer_items", test_db["offer_items"])
+    # Keep the translator, slides, dashboard and notifications out of it
+    monkeypatch.setattr(tamil_fields, "en_to_ta_many", lambda texts: {t: t for t in texts})
+    monkeypatch.setattr(owner, "refresh_shops", lambda *shop_ids: None)
+    monkeypatch.setattr(owner, "invalidate_dashboard", lambda user_id: None)
+    monkeypatch.setattr(owner, "create_notification", lambda *args, **kwargs: None)
+    return test_db
+
+
+@pytest.fixture
+def live_db(monkeypatch):
+    """update_offer_logic uses arrayFilters, which mongomock does not implement."""
+    client = pymongo.MongoClient(MONGO_URL, serverSelectionTimeoutMS=500)
+    try:
+        client.admin.command("ping")
+    except pymongo.errors.PyMongoError:
+        pytest.skip("MongoDB not reachable")
+
+    test_db = client[f"offer_items_test_{uuid.uuid4().hex[:8]}"]
+    yield _wire(monkeypatch, test_db)
+    client.drop_database(test_db.name)
+
+
+@pytest.fixture
+def mock_db(monkeypatch):
+    mongomock = pytest.importorskip("mongomock")
+    return _wire(monkeypatch, mongomock.MongoClient().db)
+
+
+def _objectid_keyed_offer(test_db):
+    shop_oid = ObjectId()
+    test_db["offers"].insert_one({
+        "shop_id": shop_oid,                # older data: ObjectId, not string
+        "user_id": "user-1",
+        "offers": [{"offer_id": "o1", "title": "Old", "status": "approved", "version": 1}],
+    })
+    offer_items.sync_offer(str(shop_oid), "o1")
+    return shop_oid
+
+
+def test_update_keeps_the_item_of_an_objectid_keyed_offers_document(live_db):
+    shop_oid = _objectid_keyed_offer(live_db)
+
+    res = owner.update_offer_logic("user-1", "o1", str(shop_oid), "New", "", "", "", "", "", 1, None, "en")
+
+    assert res["status"] is True
+    assert res["version"] == 2
+    item = offer_items.get_offer_item("o1", str(shop_oid))
+    assert (item["title"], item["version"]) == ("New", 2)
+
+
+def test_sync_offer_finds_an_objectid_keyed_offers_document(mock_db):
+    shop_oid = _objectid_keyed_offer(mock_db)
+    assert offer_items.get_offer_item("o1", str(shop_oid))["title"] == "Old"
+
+    # What an edit by offer_id alone (update, image derivatives) leaves behind
+    mock_db["offers"].update_one({"offers.offer_id": "o1"}, {"$set": {"offers.$.title": "New"}})
+    offer_items.sync_offer(str(shop_oid), "o1")
+
+    assert offer_items.get_offer_item("o1", str(shop_oid))["title"] == "New"
+
+
+def test_sync_offer_removes_the_item_once_the_offer_is_gone(mock_db):
+    shop_oid = _objectid_keyed_offer(mock_db)
+
+    mock_db["offers"].update_one({"shop_id": shop_oid}, {"$pull": {"offers": {"offer_id": "o1"}}})
+    offer_items.sync_offer(shop_oid, "o1")
+
+    assert offer_items.get_offer_item("o1", str(shop_oid)) is None
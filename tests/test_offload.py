@@ -0,0 +1,144 @@
+import os
+import time
+import json
+import asyncio
+import pytest
+
+pytest.importorskip("pymongo")
+pytest.importorskip("multipart")
+fastapi = pytest.importorskip("fastapi")
+httpx = pytest.importorskip("httpx")
+
+import api.shop_owner_details as owner
+import api.webhook_inbox as inbox
+from api.auth_jwt import verify_token
+from api.uploads import save_upload
+
+UPLOAD_BYTES = 60 * 1024 * 1024         # mp4 sized, well past one chunk
+SLOW_LOGIC = 1.0                        # seconds the offloaded work holds a thread
+PROBE_BOUND = 0.3                       # a GET meanwhile must answer within this
+
+
+class BlockingCollection:
+    """Stands in for a pymongo collection whose calls take SLOW_LOGIC seconds."""
+
+    def __init__(self, result=None):
+        self.result = result
+        self.calls = []
+
+    def __getattr__(self, name):
+        def call(*args, **kwargs):
+            self.calls.append(name)
+            time.sleep(SLOW_LOGIC)
+            return self.result
+        return call
+
+
+def _app(*routers):
+    app = fastapi.FastAPI()
+    for router in routers:
+        app.include_router(router)
+    app.dependency_overrides[verify_token] = lambda: "user-1"
+
+    @app.get("/ping/")
+    async def ping():
+        return {"status": "ok"}
+
+    return app
+
+
+def _probe_during(app, request, started=None):
+    """Fire `request(client)`, GET /ping/ while it runs; (probe, probe_time, done_before, res)."""
+    async def scenario():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test", timeout=60) as client:
+            task = asyncio.create_task(request(client))
+            # Let the request reach the offloaded part
+            while not task.done() and not (started() if started else False):
+                await asyncio.sleep(0.01)
+
+            t0 = time.perf_counter()
+            probe = await client.get("/ping/")
+            probe_time = time.perf_counter() - t0
+            done_before = task.done()
+
+            res = await task
+            return probe, probe_time, done_before, res
+
+    return asyncio.run(scenario())
+
+
+def _mp4(size):
+    head = b"\x00\x00\x00\x18ftypmp42"
+    return head + b"\x00" * (size - len(head))
+
+
+def test_upload_does_not_block_other_requests(tmp_path, monkeypatch):
+    def slow_add_offer_logic(background_tasks, user_id, target_shop_id, *rest):
+        file = rest[-2]
+        saved = save_upload(file, str(tmp_path), allowed=("video",))
+        time.sleep(SLOW_LOGIC)
+        return {"status": "success", "size": saved["size"]}
+
+    # run_io looks the function up at call time
+    monkeypatch.setattr(owner, "add_offer_logic", slow_add_offer_logic)
+
+    probe, probe_time, done_before, res = _probe_during(
+        _app(owner.router),
+        lambda client: client.post(
+            "/offer/add/",
+            data={"target_shop_id": "s1", "title": "t"},
+            files={"file": ("big.mp4", _mp4(UPLOAD_BYTES), "video/mp4")},
+        ),
+        started=lambda: any(p.suffix in (".mp4", ".part") for p in tmp_path.iterdir()),
+    )
+
+    assert probe.status_code == 200
+    assert probe_time < PROBE_BOUND
+    assert not done_before
+    assert res.status_code == 200
+    assert res.json() == {"status": "success", "size": UPLOAD_BYTES}
+
+
+def test_offer_update_mongo_reads_run_off_the_loop(monkeypatch):
+    # The real handler and update_offer_logic; only the collection is slow
+    offers = BlockingCollection(result=None)
+    monkeypatch.setattr(owner, "col_offers", offers)
+
+    probe, probe_time, done_before, res = _probe_during(
+        _app(owner.router),
+        lambda client: client.post("/offer/update/", data={"offer_id": "o1", "shop_id": "s1", "title": "t"}),
+        started=lambda: bool(offers.calls),
+    )
+
+    assert offers.calls == ["find_one"]
+    assert probe.status_code == 200
+    assert probe_time < PROBE_BOUND
+    assert not done_before
+    assert res.json() == {"status": False, "message": "Offer not found"}
+
+
+def test_webhook_store_runs_off_the_loop(monkeypatch):
+    monkeypatch.setenv("RAZORPAY_KEY_ID", os.getenv("RAZORPAY_KEY_ID") or "rzp_test")
+    monkeypatch.setenv("RAZORPAY_KEY_SECRET", os.getenv("RAZORPAY_KEY_SECRET") or "secret")
+    pytest.importorskip("razorpay")
+    import api.payments as payments
+
+    stored = BlockingCollection()
+    monkeypatch.setattr(inbox, "col_inbox", stored)
+    monkeypatch.setattr(payments, "RAZORPAY_WEBHOOK_SECRET", "whsec")
+
+    payload = json.dumps({"event": "payment.captured"}).encode()
+    headers = {"X-Razorpay-Signature": inbox.sign(payload, "whsec"), "X-Razorpay-Event-Id": "evt_1"}
+
+    probe, probe_time, done_before, res = _probe_during(
+        _app(payments.router),
+        lambda client: client.post("/payment/webhook/", content=payload, headers=headers),
+        started=lambda: bool(stored.calls),
+    )
+
+    assert stored.calls == ["insert_one"]
+    assert probe.status_code == 200
+    assert probe_time < PROBE_BOUND
+    assert not done_before
+    assert res.json() == {"status": "ok"}
@@ -0,0 +1,35 @@
+from datetime import datetime
+import pytest
+
+pytest.importorskip("pymongo")
+
+from api.scheduler import cron_next
+
+# 2026-10-01 is a Thursday
+START = datetime(2026, 10, 1, 10, 0)
+
+
+def _runs(expr, n, after=START):
+    out = []
+    for _ in range(n):
+        after = cron_next(expr, after)
+        out.append(after)
+    return out
+
+
+def test_dom_and_dow_both_restricted_fire_on_either():
+    # The 1st of the month and every Monday, as in standard cron
+    assert [t.date().isoformat() for t in _runs("0 9 1 * 1", 6)] == [
+        "2026-10-05", "2026-10-12", "2026-10-19", "2026-10-26", "2026-11-01", "2026-11-02"]
+
+
+def test_one_restricted_day_field_alone_decides():
+    assert [t.date().isoformat() for t in _runs("0 9 1 * *", 2)] == ["2026-11-01", "2026-12-01"]
+    assert [t.date().isoformat() for t in _runs("0 9 * * 1", 2)] == ["2026-10-05", "2026-10-12"]
+    # A day field starting with * (e.g. */10) is not "restricted": both must match, as in cron
+    assert all(t.day in (1, 11, 21, 31) and t.weekday() == 0 for t in _runs("0 9 */10 * 1", 3))
+
+
+def test_minutes_and_hours():
+    assert _runs("*/15 10 * * *", 3) == [datetime(2026, 10, 1, 10, 15), datetime(2026, 10, 1, 10, 30),
+                                        datetime(2026, 10, 1, 10, 45)]
@@ -0,0 +1,69 @@
+import os
+import pytest
+
+mongomock = pytest.importorskip("mongomock")
+pytest.importorskip("razorpay")
+
+from bson import ObjectId
+import api.webhook_inbox as inbox
+
+os.environ.setdefault("RAZORPAY_KEY_ID", "rzp_test")
+os.environ.setdefault("RAZORPAY_KEY_SECRET", "secret")
+import api.payments as payments
+
+
+@pytest.fixture
+def world(monkeypatch):
+    test_db = mongomock.MongoClient().db
+    monkeypatch.setattr(inbox, "col_inbox", test_db["webhook_inbox"])
+    monkeypatch.setattr(payments, "col_payments", test_db["payments"])
+    monkeypatch.setattr(payments, "refresh_plan", lambda user_id: None)
+
+    calls = {"notify": 0, "mail": 0, "mail_failures": 1}
+
+    def notify(**kwargs):
+        calls["notify"] += 1
+
+    def mail(**kwargs):
+        if calls["mail_failures"]:
+            calls["mail_failures"] -= 1
+            raise RuntimeError("outbox unavailable")
+        calls["mail"] += 1
+
+    monkeypatch.setattr(payments, "send_user_notification", notify)
+    monkeypatch.setattr(payments, "send_payment_success_mail", mail)
+    return test_db, calls
+
+
+def test_duplicate_delivery_and_failed_step_each_run_once(world):
+    test_db, calls = world
+    test_db["payments"].insert_one({"subscription_id": "sub_1", "plan_name": "silver",
+                                    "user_id": str(ObjectId()), "status": "success"})
+    body, headers = inbox.fake_event("invoice.paid", secret="whsec", subscription_id="sub_1")
+    event_id = headers["X-Razorpay-Event-Id"]
+    assert inbox.signature_ok(body, headers["X-Razorpay-Signature"], "whsec")
+
+    # Redelivered by Razorpay: stored once
+    assert inbox.record_event(body, event_id) is True
+    assert inbox.record_event(body, event_id) is False
+    assert test_db["webhook_inbox"].count_documents({}) == 1
+
+    # The mail step raises: it is given back and the event waits for a retry
+    assert inbox.drain() == 0
+    doc = test_db["webhook_inbox"].find_one({"_id": event_id})
+    assert (doc["status"], doc["attempts"], doc["steps"]) == ("pending", 1, ["notify"])
+    assert "outbox unavailable" in doc["error"]
+    assert inbox.drain() == 0       # backing off, nothing due
+
+    assert inbox.replay(event_id) == 1
+    assert inbox.drain() == 1
+
+    doc = test_db["webhook_inbox"].find_one({"_id": event_id})
+    assert doc["status"] == "done"
+    assert sorted(doc["steps"]) == ["mail", "notify"]
+    assert (calls["notify"], calls["mail"]) == (1, 1)
+
+    # A replay of a finished event repeats neither step
+    inbox.replay(event_id)
+    assert inbox.drain() == 1
+    assert (calls["notify"], calls["mail"]) == (1, 1)